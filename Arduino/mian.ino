@@ -32,9 +32,27 @@ const char* ssid = "...";
 const char* password = "12345678";
 const char* mqtt_server = "192.168.103.253";
 const int mqtt_port = 1883;
+// Send readings as the 15-byte binary v1 record (see MQTT/payload.py)
+// instead of JSON; the bridge accepts both
+const bool BINARY_PAYLOAD = true;
+const uint8_t PAYLOAD_V1 = 0xB1;
 WiFiClient espClient;
 PubSubClient client(espClient);
 
+// Per-device topics: elder_band/<MAC>/data|medication|cmd|status
+String dataTopic;
+String medicationTopic;
+String cmdTopic;
+String statusTopic;
+
+void buildDeviceTopics() {
+  String base = "elder_band/" + WiFi.macAddress() + "/";
+  dataTopic = base + "data";
+  medicationTopic = base + "medication";
+  cmdTopic = base + "cmd";
+  statusTopic = base + "status";
+}
+
 // -----------------------------
 // Global Objects
 // -----------------------------
@@ -115,7 +133,7 @@ void onMqttMessage(char* topic, byte* payload, unsigned int length) {
   Serial.printf("Received MQTT message on topic '%s': %s\n", topic, message.c_str());
   
   // Handle medication reminder
-  if (String(topic) == "elder_band/medication") {
+  if (medicationTopic == topic) {
     if (message == "true" || message == "1") {
       medicationReminder = true;
       medicationReminderStartTime = millis();
@@ -129,7 +147,7 @@ void onMqttMessage(char* topic, byte* payload, unsigned int length) {
   }
   
   // Handle other commands if needed
-  if (String(topic) == "elder_band/cmd") {
+  if (cmdTopic == topic) {
     // Add other command handling here if needed
     Serial.printf("Command received: %s\n", message.c_str());
   }
@@ -166,12 +184,14 @@ void reconnectMQTT() {
       Serial.println("MQTT connected successfully!");
       mqttConnected = true;
       
-      // Subscribe to topics
-      client.subscribe("elder_band/cmd");
-      client.subscribe("elder_band/medication"); // Subscribe to medication topic
+      // Subscribe to this band's own command topics only, so commands
+      // addressed to other bands never wake this one
+      buildDeviceTopics();
+      client.subscribe(cmdTopic.c_str());
+      client.subscribe(medicationTopic.c_str());
       
       // Send a connection message
-      client.publish("elder_band/status", "Device connected", true);
+      client.publish(statusTopic.c_str(), "Device connected", true);
       break;
     } else {
       Serial.print("MQTT handshake failed, rc=");
@@ -217,25 +237,49 @@ void sendToMQTT() {
   
   if (client.connected()) {
     char msg[512];
+    bool published;
     int currentHR = validHeartRate && heartRate > 0 && heartRate < 200 ? heartRate : beatAvg;
     int currentSpO2 = validSPO2 && spo2 > 0 && spo2 <= 100 ? spo2 : 98; // Default reasonable value
     
     // Only report fall as true if it's detected AND not canceled
     bool reportFall = fallDetected && !fallCanceled;
     
-    snprintf(msg, sizeof(msg), 
-             "{\"deviceId\":\"%s\",\"heartRate\":%d,\"spo2\":%d,\"temperature\":%.2f,\"fall\":%s,\"emergency\":%s,\"fingerDetected\":%s,\"call\":%s,\"medicationReminder\":%s,\"timestamp\":%lu,\"freeHeap\":%d}",
-             WiFi.macAddress().c_str(),
-             currentHR, currentSpO2, temperatureC,
-             reportFall ? "true" : "false", 
-             emergency ? "true" : "false",
-             fingerDetected ? "true" : "false",
-             callInitiated ? "true" : "false",
-             medicationReminder ? "true" : "false",
-             millis(),
-             ESP.getFreeHeap());
+    if (BINARY_PAYLOAD) {
+      // Little-endian fixed layout; the device id is in the topic
+      uint8_t record[15];
+      uint8_t flags = (reportFall ? 1 : 0) | (emergency ? 2 : 0) | (fingerDetected ? 4 : 0) |
+                      (callInitiated ? 8 : 0) | (medicationReminder ? 16 : 0);
+      int16_t hr = currentHR;
+      int16_t tempCenti = (int16_t)lroundf(temperatureC * 100);
+      uint32_t ts = millis();
+      uint32_t heap = ESP.getFreeHeap();
+      record[0] = PAYLOAD_V1;
+      record[1] = flags;
+      memcpy(record + 2, &hr, 2);
+      record[4] = (uint8_t)currentSpO2;
+      memcpy(record + 5, &tempCenti, 2);
+      memcpy(record + 7, &ts, 4);
+      memcpy(record + 11, &heap, 4);
+      snprintf(msg, sizeof(msg), "[binary] hr=%d spo2=%d temp=%.2f flags=0x%02X",
+               currentHR, currentSpO2, temperatureC, flags);
+      // Not retained: a reconnecting bridge must not replay stale readings
+      published = client.publish(dataTopic.c_str(), record, sizeof(record), false);
+    } else {
+      snprintf(msg, sizeof(msg), 
+               "{\"deviceId\":\"%s\",\"heartRate\":%d,\"spo2\":%d,\"temperature\":%.2f,\"fall\":%s,\"emergency\":%s,\"fingerDetected\":%s,\"call\":%s,\"medicationReminder\":%s,\"timestamp\":%lu,\"freeHeap\":%d}",
+               WiFi.macAddress().c_str(),
+               currentHR, currentSpO2, temperatureC,
+               reportFall ? "true" : "false", 
+               emergency ? "true" : "false",
+               fingerDetected ? "true" : "false",
+               callInitiated ? "true" : "false",
+               medicationReminder ? "true" : "false",
+               millis(),
+               ESP.getFreeHeap());
              
-    bool published = client.publish("elder_band/data", msg, true); // Retain message
+      // Not retained: a reconnecting bridge must not replay stale readings
+      published = client.publish(dataTopic.c_str(), msg, false);
+    }
     
     if (published) {
       Serial.println("✓ MQTT message sent:");
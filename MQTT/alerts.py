@@ -0,0 +1,114 @@
+"""
+High-priority dispatch for emergency, call-button and fall messages.
+
+on_message classifies a reading before doing any telemetry work and hands
+alerts to AlertDispatcher, whose dedicated worker thread runs the handler
+(profile lookup + GSM serial command) without waiting behind window
+buffering, inference or backend uploads. Alerts are served SOS first, then
+calls, then falls. Handlers only queue work and never wait on the serial
+port, so one slow alert does not hold up the next. Each alert carries the
+perf_counter() timestamp taken when the MQTT message arrived; it travels
+with the GSM command and the serial link reports the actual write, which is
+recorded with record_latency() so slow writes are measured too.
+"""
+
+import itertools
+import queue
+import threading
+import time
+import logging
+from collections import deque
+
+from metrics import registry
+
+log = logging.getLogger(__name__)
+
+ALERT_LATENCY = registry.histogram(
+    'bridge_alert_latency_seconds', 'MQTT receive to serial write, per alert kind', ['kind'])
+
+# Lower value is served first
+PRIORITIES = {'sos': 0, 'call': 1, 'fall': 2}
+
+
+class Alert:
+    """One alert waiting for (or being handled by) the dispatcher"""
+
+    __slots__ = ('kind', 'device_id', 'data', 'received')
+
+    def __init__(self, kind, device_id, data, received):
+        self.kind = kind
+        self.device_id = device_id
+        self.data = data
+        self.received = received
+
+
+class AlertDispatcher:
+    """Priority queue + dedicated worker thread for alert handlers"""
+
+    def __init__(self, handlers, history=1000):
+        # kind -> handler(alert)
+        self.handlers = handlers
+        self._queue = queue.PriorityQueue()
+        self._seq = itertools.count()
+        self._stop = threading.Event()
+        self._thread = None
+        self._lock = threading.Lock()
+        self._history = history
+        self._latencies = {kind: deque(maxlen=history) for kind in handlers}
+
+        self.dispatched = 0
+        self.failed = 0
+
+    def start(self):
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name='alert-dispatcher', daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout=5):
+        self._stop.set()
+        if self._thread:
+            self._thread.join(timeout)
+
+    def submit(self, kind, device_id, data, received=None):
+        """Queue an alert; `received` is perf_counter() at MQTT receive"""
+        alert = Alert(kind, device_id, data, received or time.perf_counter())
+        self._queue.put((PRIORITIES[kind], next(self._seq), alert))
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                _, _, alert = self._queue.get(timeout=0.5)
+            except queue.Empty:
+                continue
+            try:
+                self.handlers[alert.kind](alert)
+                self.dispatched += 1
+            except Exception as e:
+                self.failed += 1
+                log.error("Alert handler failed for %s on %s: %s", alert.kind, alert.device_id, e,
+                          extra={'device_id': alert.device_id})
+
+    def record_latency(self, kind, latency_ms):
+        """Record one receive -> serial write latency; returns it"""
+        ALERT_LATENCY.labels(kind).observe(latency_ms / 1000)
+        with self._lock:
+            self._latencies.setdefault(kind, deque(maxlen=self._history)).append(latency_ms)
+        return latency_ms
+
+    def stats(self):
+        """Dispatch counters and receive -> serial latency percentiles per kind"""
+        result = {'dispatched': self.dispatched, 'failed': self.failed, 'pending': self._queue.qsize()}
+        with self._lock:
+            for kind, samples in self._latencies.items():
+                if not samples:
+                    continue
+                ordered = sorted(samples)
+                result[kind] = {
+                    'count': len(ordered),
+                    'p50_ms': ordered[len(ordered) // 2],
+                    'p99_ms': ordered[min(len(ordered) - 1, int(len(ordered) * 0.99))],
+                    'max_ms': ordered[-1],
+                }
+        return result
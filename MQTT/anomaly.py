@@ -0,0 +1,171 @@
+"""
+Streaming per-device anomaly detection on vitals.
+
+Each DeviceSession owns a VitalsDetector holding one Signal per vital:
+heart rate, SpO2 and temperature from every reading, and systolic BP from
+every prediction. A Signal is a few floats, so memory per device is
+constant and an update is O(1) with no history from Django:
+
+- `level` is a fast EWMA of the stream, which smooths single-sample
+  sensor noise.
+- `mean`/`var` form an exponentially weighted Welford baseline of the
+  device's normal values (a plain running mean during warm-up). The
+  temperature baseline forgets over hours rather than minutes, so a fever
+  building gradually is still measured against the afebrile level. After
+  warm-up it only learns from samples within z standard deviations of
+  itself, and it is frozen while an anomaly is active, so an excursion is
+  not learned as the new normal.
+
+A reading is abnormal when the level crosses an absolute limit (e.g. HR
+>= 100). After warm-up, it is also abnormal when the level moves away from
+the baseline by both a clinical margin and a z-score. Raising and clearing
+use a leaky counter: abnormal updates add one and normal ones take one
+away. The anomaly is raised when the count reaches `sustain`. Once raised,
+the count runs the other way and the anomaly clears at `clear`. One noisy
+sample never alerts, and one noisy sample cannot reset a real excursion
+either.
+
+Readings are published about every 3 s, so sustain=10 is about 30 s.
+"""
+
+import math
+
+# Fast EWMA weight for `level`, and the baseline's forgetting factor (~100 samples)
+LEVEL_ALPHA = 0.3
+BASELINE_ALPHA = 0.01
+
+
+class Rule:
+    """Limits for one vital; None disables a check"""
+
+    __slots__ = ('kind', 'high', 'low', 'rise', 'drop', 'z', 'min_std',
+                 'warmup', 'sustain', 'clear', 'level_alpha', 'baseline_alpha')
+
+    def __init__(self, kind, high=None, low=None, rise=None, drop=None, z=3.0, min_std=1.0,
+                 warmup=30, sustain=10, clear=10, level_alpha=LEVEL_ALPHA, baseline_alpha=BASELINE_ALPHA):
+        self.kind = kind
+        self.high = high
+        self.low = low
+        self.rise = rise
+        self.drop = drop
+        self.z = z
+        self.min_std = min_std
+        self.warmup = warmup
+        self.sustain = sustain
+        self.clear = clear
+        self.level_alpha = level_alpha
+        self.baseline_alpha = baseline_alpha
+
+
+TACHYCARDIA = Rule('tachycardia', high=100, rise=25, min_std=3.0)
+DESATURATION = Rule('desaturation', low=92, drop=4, min_std=1.0)
+# Fever builds over tens of minutes: a baseline forgetting over ~2000 readings
+# (~1.5 h) still holds the afebrile level when a slow rise reaches `rise`
+FEVER = Rule('fever', high=38.0, rise=0.8, min_std=0.2, warmup=200, sustain=20, clear=20,
+             baseline_alpha=0.0005)
+# One SBP value per five-reading window (already averaged): faster level and baseline
+SBP_EXCURSION = Rule('sbp_excursion', high=160, low=90, rise=25, drop=25, min_std=5.0,
+                     warmup=10, sustain=3, clear=3, level_alpha=0.5, baseline_alpha=0.05)
+
+
+class Signal:
+    """EWMA level, weighted Welford baseline and raise/clear state for one vital"""
+
+    __slots__ = ('rule', 'level', 'mean', 'var', 'n', 'streak', 'active')
+
+    def __init__(self, rule):
+        self.rule = rule
+        self.level = None
+        self.mean = 0.0
+        self.var = 0.0
+        self.n = 0
+        self.streak = 0     # leaky count towards raising (inactive) or clearing (active)
+        self.active = False
+
+    def update(self, x):
+        """Feed one value; returns 'raised', 'cleared' or None"""
+        rule = self.rule
+        if self.level is None:
+            self.level = self.mean = x
+            self.n = 1
+            return None
+        self.level += rule.level_alpha * (x - self.level)
+
+        abnormal = self._abnormal()
+        delta = x - self.mean
+        if not self.active and not abnormal and (
+                self.n < rule.warmup or abs(delta) <= rule.z * max(math.sqrt(self.var), rule.min_std)):
+            # Plain running mean during warm-up, so a slow baseline starts from
+            # the device's average rather than its first value
+            alpha = 1.0 / (self.n + 1) if self.n < rule.warmup else rule.baseline_alpha
+            self.mean += alpha * delta
+            self.var = (1 - alpha) * (self.var + alpha * delta * delta)
+            self.n += 1
+
+        if abnormal != self.active:
+            self.streak += 1
+        elif self.streak:
+            self.streak -= 1
+
+        if not self.active and self.streak >= rule.sustain:
+            self.active, self.streak = True, 0
+            return 'raised'
+        if self.active and self.streak >= rule.clear:
+            self.active, self.streak = False, 0
+            return 'cleared'
+        return None
+
+    def _abnormal(self):
+        rule, level = self.rule, self.level
+        if rule.high is not None and level >= rule.high:
+            return True
+        if rule.low is not None and level <= rule.low:
+            return True
+        if self.n < rule.warmup:
+            return False
+        deviation = level - self.mean
+        z = deviation / max(math.sqrt(self.var), rule.min_std)
+        if rule.rise is not None and deviation >= rule.rise and z >= rule.z:
+            return True
+        if rule.drop is not None and -deviation >= rule.drop and -z >= rule.z:
+            return True
+        return False
+
+
+class VitalsDetector:
+    """Per-device detectors; update() returns [(kind, state, level, baseline)] transitions"""
+
+    __slots__ = ('hr', 'spo2', 'temp', 'sbp')
+
+    def __init__(self):
+        self.hr = Signal(TACHYCARDIA)
+        self.spo2 = Signal(DESATURATION)
+        self.temp = Signal(FEVER)
+        self.sbp = Signal(SBP_EXCURSION)
+
+    def update(self, data):
+        """Feed one reading (JSON dict or payload.Reading)"""
+        events = []
+        # Zeros mean no finger on the sensor, not a reading
+        if data.get('fingerDetected', True):
+            hr, spo2 = data.get('heartRate', 0), data.get('spo2', 0)
+            if hr and hr > 0:
+                self._feed(self.hr, hr, events)
+            if spo2 and spo2 > 0:
+                self._feed(self.spo2, spo2, events)
+        temp = data.get('temperature', 0)
+        if temp and temp > 0:
+            self._feed(self.temp, temp, events)
+        return events
+
+    def update_sbp(self, sbp):
+        """Feed one predicted systolic pressure"""
+        events = []
+        self._feed(self.sbp, sbp, events)
+        return events
+
+    @staticmethod
+    def _feed(signal, value, events):
+        state = signal.update(value)
+        if state:
+            events.append((signal.rule.kind, state, signal.level, signal.mean))
@@ -0,0 +1,328 @@
+"""
+End-to-end load test: simulated bands -> bridge pipeline -> Django ingest.
+
+Simulates thousands of ESP32 bands publishing realistic readings (a slow
+random walk around a per-band baseline, occasional falls and emergency
+episodes) and pushes them through main.on_message exactly as paho would:
+one delivery thread, per-device order preserved. By default the messages go
+through an in-process fake broker. With --broker they go through a real
+broker (e.g. a local mosquitto), and the bridge side subscribes with its
+own paho client.
+
+The Django backend is served in-process over real HTTP (wsgiref) on a
+scratch SQLite database, so the uploader, bulk endpoint and ORM are all
+exercised. The Arduino gateway is a fake that acknowledges commands like
+Arduino/gsm.ino.
+
+Reports bridge throughput (messages/sec), p50/p99 receive-to-DB latency of
+the averaged readings, and p50/p99 emergency-to-serial latency.
+
+    python bench_e2e.py --devices 2000 --messages 10
+    python bench_e2e.py --format binary --broker localhost
+"""
+
+import argparse
+import os
+import queue
+import random
+import shutil
+import socketserver
+import sys
+import tempfile
+import threading
+import time
+from wsgiref.simple_server import WSGIRequestHandler, WSGIServer, make_server
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(HERE, '..', 'backend'))
+
+
+def percentile(samples, pct):
+    if not samples:
+        return float('nan')
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
+
+
+# ---------------------------------------------------------------- backend
+
+class _ThreadingWSGIServer(socketserver.ThreadingMixIn, WSGIServer):
+    daemon_threads = True
+
+
+class _QuietHandler(WSGIRequestHandler):
+    def log_message(self, *args):
+        pass
+
+
+def start_backend():
+    """Migrate a scratch SQLite DB and serve the Django app on a free port"""
+    scratch = tempfile.mkdtemp(prefix='bench-e2e-')
+    os.environ['DB_ENGINE'] = 'sqlite'
+    os.environ['DB_NAME'] = os.path.join(scratch, 'db.sqlite3')
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'backend.settings')
+
+    import django
+    from django.conf import settings
+    django.setup()
+    settings.DEBUG = False
+    settings.ALLOWED_HOSTS = ['127.0.0.1', 'localhost']
+
+    from django.core.management import call_command
+    from django.core.wsgi import get_wsgi_application
+    call_command('migrate', verbosity=0)
+
+    server = make_server('127.0.0.1', 0, get_wsgi_application(),
+                         server_class=_ThreadingWSGIServer, handler_class=_QuietHandler)
+    threading.Thread(target=server.serve_forever, name='django-wsgi', daemon=True).start()
+    return f'http://127.0.0.1:{server.server_port}/api', scratch
+
+
+# ---------------------------------------------------------------- transports
+
+class Message:
+    """Just enough of paho's MQTTMessage for on_message"""
+
+    __slots__ = ('topic', 'payload')
+
+    def __init__(self, topic, payload):
+        self.topic = topic
+        self.payload = payload
+
+
+class FakeBroker:
+    """Single delivery thread into on_message, like paho's network loop"""
+
+    def __init__(self, on_message):
+        self.on_message = on_message
+        self._queue = queue.Queue()
+        self._thread = threading.Thread(target=self._run, name='fake-broker', daemon=True)
+        self._thread.start()
+
+    def publish(self, topic, payload):
+        self._queue.put(Message(topic, payload))
+
+    def _run(self):
+        while True:
+            self.on_message(None, None, self._queue.get())
+            self._queue.task_done()
+
+    def drain(self):
+        self._queue.join()
+
+
+class PahoTransport:
+    """Publisher and bridge-side subscriber through a real broker"""
+
+    def __init__(self, host, port, on_message, topics):
+        import paho.mqtt.client as mqtt
+
+        self._delivered = 0
+        self._published = 0
+        self._lock = threading.Lock()
+
+        def deliver(client, userdata, msg):
+            on_message(client, userdata, msg)
+            with self._lock:
+                self._delivered += 1
+
+        self.subscriber = mqtt.Client()
+        self.subscriber.on_message = deliver
+        self.subscriber.connect(host, port)
+        for topic in topics:
+            self.subscriber.subscribe(topic, qos=1)
+        self.subscriber.loop_start()
+        self.publisher = mqtt.Client()
+        self.publisher.connect(host, port)
+        self.publisher.loop_start()
+        time.sleep(0.5)  # let the subscriptions settle
+
+    def publish(self, topic, payload):
+        self.publisher.publish(topic, payload, qos=1).wait_for_publish()
+        self._published += 1
+
+    def drain(self, timeout=60):
+        deadline = time.monotonic() + timeout
+        while self._delivered < self._published and time.monotonic() < deadline:
+            time.sleep(0.05)
+
+
+class FakeGateway:
+    """Serial port stand-in that answers like Arduino/gsm.ino"""
+
+    def __init__(self, delay=0.002):
+        self.delay = delay
+        self._out = queue.Queue()
+
+    def write(self, data):
+        command = data.decode().strip()
+        self._out.put(f'Received: {command}')
+        time.sleep(self.delay)
+        if command.startswith('SOS:'):
+            self._out.put('Emergency call initiated - audio active through GSM speaker/mic')
+        elif command.startswith('CALL:'):
+            self._out.put('Call initiated - waiting for connection...')
+        else:
+            self._out.put('SOS active: NO')
+
+    def flush(self):
+        pass
+
+    def readline(self):
+        try:
+            return (self._out.get(timeout=0.2) + '\r\n').encode()
+        except queue.Empty:
+            return b''
+
+    def close(self):
+        pass
+
+
+# ---------------------------------------------------------------- simulated bands
+
+class Band:
+    """One simulated ESP32 band"""
+
+    def __init__(self, index, rng):
+        self.device_id = f'SIM:{index:02X}:{rng.randrange(16 ** 6):06X}'
+        self.rng = rng
+        self.hr = rng.gauss(75, 8)
+        self.spo2 = rng.uniform(95, 99)
+        self.temp = rng.uniform(36.3, 37.1)
+        self.emergency_left = 0
+        self.millis = rng.randrange(10 ** 6)
+
+    def reading(self, fall_rate, emergency_rate):
+        rng = self.rng
+        self.hr = min(180, max(40, self.hr + rng.gauss(0, 1.5)))
+        self.spo2 = min(100, max(85, self.spo2 + rng.gauss(0, 0.3)))
+        self.temp = min(40, max(35, self.temp + rng.gauss(0, 0.02)))
+        self.millis += 1000
+        fall = rng.random() < fall_rate
+        if self.emergency_left == 0 and (fall or rng.random() < emergency_rate):
+            self.emergency_left = 3  # three in a row trips the SOS threshold
+        emergency = self.emergency_left > 0
+        self.emergency_left = max(0, self.emergency_left - 1)
+        return {
+            'heartRate': int(self.hr), 'spo2': int(self.spo2), 'temperature': round(self.temp, 2),
+            'fall': fall, 'emergency': emergency, 'fingerDetected': True, 'call': False,
+            'medicationReminder': False, 'timestamp': self.millis, 'freeHeap': 180000,
+        }
+
+
+def encode(reading, device_id, fmt):
+    if fmt == 'binary':
+        from payload import encode_reading
+        return encode_reading(**reading)
+    import json
+    return json.dumps(dict(reading, deviceId=device_id)).encode()
+
+
+# ---------------------------------------------------------------- run
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--devices', type=int, default=1000)
+    parser.add_argument('--messages', type=int, default=10, help='readings per device')
+    parser.add_argument('--format', choices=['json', 'binary'], default='json')
+    parser.add_argument('--fall-rate', type=float, default=0.0005)
+    parser.add_argument('--emergency-rate', type=float, default=0.001)
+    parser.add_argument('--broker', metavar='HOST[:PORT]', help='use a real MQTT broker instead of the fake')
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--verbose', action='store_true', help="log the bridge's per-message lines (DEBUG)")
+    args = parser.parse_args()
+
+    os.chdir(HERE)  # model files are resolved relative to the bridge directory
+    backend_url, scratch = start_backend()
+    print(f'Backend on {backend_url} (scratch DB in {scratch})')
+
+    import logs
+    import main as bridge
+    logs.configure('DEBUG' if args.verbose else 'ERROR')
+    from uploader import BackendUploader
+    from api.models import HealthData
+
+    # Point the bridge at the in-process backend and the fake gateway
+    bridge.BACKEND_URL = backend_url
+    bridge.uploader = BackendUploader(f'{backend_url}/health-data/', bulk_url=f'{backend_url}/health-data/bulk/',
+                                      max_queue=bridge.UPLOAD_QUEUE_SIZE, max_batch=bridge.UPLOAD_BATCH_SIZE)
+    bridge.link.attach(FakeGateway())
+
+    rng = random.Random(args.seed)
+    bands = [Band(i, rng) for i in range(args.devices)]
+    # Profiles are seeded so SOS has a number to dial without N profile fetches
+    for band in bands:
+        bridge.profiles._entries[band.device_id] = (
+            dict(bridge.DEFAULT_PATIENT_INFO, device_id=band.device_id, age=rng.randint(60, 95),
+                 emergency_contact_phone='15550100'), time.monotonic() + 3600)
+
+    # Pre-generate every payload so the generator isn't what's being measured
+    schedule, window_done = [], {}
+    for step in range(args.messages):
+        for band in bands:
+            reading = band.reading(args.fall_rate, args.emergency_rate)
+            topic = f'elder_band/{band.device_id}/data'
+            schedule.append((band.device_id, topic, encode(reading, band.device_id, args.format),
+                             (step + 1) % bridge.WINDOW_SIZE == 0))
+
+    bridge.alerts.start()
+    bridge.uploader.start()
+    bridge.inference.start()
+    bridge.inference.set_model(bridge.load_model())
+
+    if args.broker:
+        host, _, port = args.broker.partition(':')
+        transport = PahoTransport(host, int(port or 1883), bridge.on_message, [bridge.DATA_TOPIC])
+    else:
+        transport = FakeBroker(bridge.on_message)
+
+    started = time.perf_counter()
+    for device_id, topic, payload, completes_window in schedule:
+        if completes_window:
+            window_done.setdefault(device_id, []).append(time.time())
+        transport.publish(topic, payload)
+    transport.drain()
+    bridge_seconds = time.perf_counter() - started
+
+    # Wait for inference and uploads to land in the database
+    expected = sum(len(times) for times in window_done.values())
+    deadline = time.monotonic() + 120
+    while time.monotonic() < deadline:
+        stats = bridge.uploader.stats()
+        stored = HealthData.objects.filter(blood_pressure__isnull=False).count()
+        if stored >= expected and stats['queue_depth'] == 0:
+            break
+        time.sleep(0.1)
+    end_to_end_seconds = time.perf_counter() - started
+    time.sleep(0.5)  # let queued SOS commands reach the gateway
+
+    # Receive -> DB: nth averaged row per device vs. the nth window-completing publish
+    latencies = []
+    rows = (HealthData.objects.filter(blood_pressure__isnull=False)
+            .order_by('pk').values_list('device__device_id', 'timestamp'))
+    seen = {}
+    for device_id, stored_at in rows.iterator():
+        n = seen.get(device_id, 0)
+        seen[device_id] = n + 1
+        published = window_done.get(device_id, [])
+        if n < len(published):
+            latencies.append((stored_at.timestamp() - published[n]) * 1000)
+
+    total = len(schedule)
+    alert_stats = bridge.alerts.stats()
+    sos = alert_stats.get('sos', {})
+    print(f'{args.devices} devices x {args.messages} readings ({args.format}, '
+          f'{"broker " + args.broker if args.broker else "in-process broker"})')
+    print(f'  bridge          {total / bridge_seconds:>9.0f} msg/s  ({total} messages in {bridge_seconds:.2f}s)')
+    print(f'  end to end      {total / end_to_end_seconds:>9.0f} msg/s  '
+          f'({len(latencies)}/{expected} averaged rows stored)')
+    print(f'  receive -> DB   p50 {percentile(latencies, 50):8.1f} ms  p99 {percentile(latencies, 99):8.1f} ms')
+    print(f'  SOS -> serial   p50 {sos.get("p50_ms", float("nan")):8.2f} ms  '
+          f'p99 {sos.get("p99_ms", float("nan")):8.2f} ms  ({sos.get("count", 0)} SOS)')
+    print(f'  uploader {bridge.uploader.stats()}')
+    print(f'  serial link {bridge.link.stats()}')
+    shutil.rmtree(scratch, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,40 @@
+import json
+import sys
+import time
+
+from payload import decode_payload, encode_reading
+
+# Compare the JSON and binary v1 telemetry formats: bytes on the wire and bridge decode cost
+ITERATIONS = int(sys.argv[1]) if len(sys.argv) > 1 else 200000
+
+reading = {
+    'heartRate': 78, 'spo2': 97, 'temperature': 36.62, 'fall': False, 'emergency': False,
+    'fingerDetected': True, 'call': False, 'medicationReminder': False,
+    'timestamp': 123456789, 'freeHeap': 182340,
+}
+# What mian.ino publishes today (deviceId is part of the JSON body)
+as_json = json.dumps(dict(reading, deviceId='AA:BB:CC:DD:EE:FF'), separators=(',', ':')).encode()
+as_binary = encode_reading(**reading)
+
+
+# Decode plus the field reads on_message/session.push do for every message
+def consume(payload):
+    data = decode_payload(payload)
+    return (data.get('heartRate', 70), data.get('spo2', 98), data.get('temperature', 36.5),
+            data.get('fall', False), data.get('emergency', False), data.get('call', False),
+            data.get('medicationReminder', False))
+
+
+assert consume(as_json) == consume(as_binary), 'formats decode differently'
+
+results = {}
+for name, payload in (('json', as_json), ('binary v1', as_binary)):
+    start = time.perf_counter()
+    for _ in range(ITERATIONS):
+        consume(payload)
+    results[name] = (time.perf_counter() - start) / ITERATIONS * 1e6
+
+for name, payload in (('json', as_json), ('binary v1', as_binary)):
+    print(f'{name:<10} {len(payload):>4} bytes  {results[name]:.2f} us/message')
+print(f'binary is {len(as_json) / len(as_binary):.1f}x smaller and '
+      f'{results["json"] / results["binary v1"]:.1f}x faster to decode')
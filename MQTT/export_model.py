@@ -0,0 +1,47 @@
+import sys
+import time
+
+import joblib
+import numpy as np
+
+from flat_forest import FlatForest
+
+# Flatten the trained forest from model.py into arrays the bridge can load without sklearn
+SOURCE = sys.argv[1] if len(sys.argv) > 1 else 'sbp_rf_model_realdata.joblib'
+TARGET = sys.argv[2] if len(sys.argv) > 2 else 'sbp_rf_model_realdata.npz'
+
+# 1. Load and flatten the sklearn model
+model = joblib.load(SOURCE)
+flat = FlatForest.from_sklearn(model)
+
+# 2. Check predictions match sklearn on a spread of realistic inputs
+rng = np.random.default_rng(42)
+X = np.column_stack([
+    rng.uniform(20, 95, 5000),     # age
+    rng.uniform(40, 160, 5000),    # heart rate
+    rng.uniform(85, 100, 5000),    # spo2 / third feature
+    rng.uniform(34, 41, 5000),     # temperature / fourth feature
+])
+expected = model.predict(X)
+actual = flat.predict(X)
+max_error = np.max(np.abs(expected - actual))
+print(f'Max abs difference vs sklearn: {max_error:.2e}')
+if not np.allclose(expected, actual, rtol=0, atol=1e-6):
+    sys.exit('Flattened forest does not match sklearn predictions; not saving')
+
+# 3. Compare latency
+for rows in (1, 100):
+    batch = X[:rows]
+    start = time.perf_counter()
+    for _ in range(20):
+        model.predict(batch)
+    sk = (time.perf_counter() - start) / 20
+    start = time.perf_counter()
+    for _ in range(20):
+        flat.predict(batch)
+    fl = (time.perf_counter() - start) / 20
+    print(f'{rows:>4} rows: sklearn {sk * 1000:.2f} ms, flat {fl * 1000:.2f} ms')
+
+# 4. Save
+flat.save(TARGET)
+print(f'Flattened {len(model.estimators_)} trees ({flat.nbytes / 1024:.0f} KiB of arrays) to {TARGET}')
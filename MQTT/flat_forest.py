@@ -0,0 +1,97 @@
+"""
+Array-backed RandomForestRegressor for the bridge.
+
+All trees of the forest are flattened into one set of parallel NumPy arrays
+(feature, threshold, left, right, value) with each tree's root offset stored
+separately. Prediction walks every (row, tree) pair one level per step with
+vectorised indexing, so many rows are scored at once without importing
+sklearn or unpickling its estimator objects.
+"""
+
+import numpy as np
+
+
+class FlatForest:
+    """Pure-NumPy evaluation of a flattened regression forest"""
+
+    def __init__(self, feature, threshold, left, right, value, roots, max_depth, n_features_in):
+        self.feature = feature
+        self.threshold = threshold
+        self.left = left
+        self.right = right
+        self.value = value
+        self.roots = roots
+        self.max_depth = int(max_depth)
+        # Width of the rows the forest was fitted on; splits may not use every feature
+        self.n_features_in_ = int(n_features_in)
+        # Interleaved [left, right] pairs so one take() picks the next node
+        self._children = np.column_stack([left, right]).ravel()
+
+    @classmethod
+    def from_sklearn(cls, forest):
+        """Flatten a fitted sklearn RandomForestRegressor"""
+        features, thresholds, lefts, rights, values, roots = [], [], [], [], [], []
+        offset = 0
+        max_depth = 0
+        for estimator in forest.estimators_:
+            tree = estimator.tree_
+            n = tree.node_count
+            is_leaf = tree.children_left == -1
+            node_ids = np.arange(n, dtype=np.int32) + offset
+
+            # Leaves point at themselves so extra traversal steps are no-ops
+            lefts.append(np.where(is_leaf, node_ids, tree.children_left + offset).astype(np.int32))
+            rights.append(np.where(is_leaf, node_ids, tree.children_right + offset).astype(np.int32))
+            features.append(np.where(is_leaf, 0, tree.feature).astype(np.int32))
+            thresholds.append(np.where(is_leaf, np.inf, tree.threshold).astype(np.float64))
+            values.append(tree.value.reshape(n).astype(np.float64))
+            roots.append(offset)
+
+            max_depth = max(max_depth, tree.max_depth)
+            offset += n
+
+        return cls(
+            np.concatenate(features), np.concatenate(thresholds),
+            np.concatenate(lefts), np.concatenate(rights),
+            np.concatenate(values), np.array(roots, dtype=np.int32), max_depth,
+            forest.n_features_in_
+        )
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as data:
+            return cls(
+                data['feature'], data['threshold'], data['left'], data['right'],
+                data['value'], data['roots'], data['max_depth'], data['n_features_in']
+            )
+
+    def save(self, path):
+        np.savez_compressed(
+            path, feature=self.feature, threshold=self.threshold, left=self.left,
+            right=self.right, value=self.value, roots=self.roots,
+            max_depth=np.int32(self.max_depth), n_features_in=np.int32(self.n_features_in_)
+        )
+
+    def predict(self, X):
+        # sklearn compares float32 inputs against float64 thresholds
+        X = np.asarray(X, dtype=np.float32).astype(np.float64)
+        if X.ndim == 1:
+            X = X.reshape(1, -1)
+        n_rows, n_features = X.shape
+        if n_features != self.n_features_in_:
+            raise ValueError(f"X has {n_features} features, but FlatForest "
+                             f"is expecting {self.n_features_in_} features as input")
+        flat_X = X.ravel()
+        row_base = np.repeat(np.arange(n_rows) * n_features, len(self.roots))
+        nodes = np.tile(self.roots, n_rows)
+
+        for _ in range(self.max_depth):
+            go_right = flat_X.take(row_base + self.feature.take(nodes)) > self.threshold.take(nodes)
+            nodes = self._children.take(2 * nodes + go_right)
+
+        return self.value.take(nodes).reshape(n_rows, len(self.roots)).mean(axis=1)
+
+    @property
+    def nbytes(self):
+        return sum(a.nbytes for a in (self.feature, self.threshold, self.left,
+                                      self.right, self.value, self.roots))
@@ -0,0 +1,131 @@
+"""
+Batched blood-pressure inference for the MQTT bridge.
+
+Ready reading windows from every device are collected for one short tick and
+scored with a single model.predict() call on a 2-D NumPy array, then each
+prediction is handed back to the callback together with the context it was
+submitted with. The per-call overhead of the forest is paid once per tick
+instead of once per device window.
+
+The scheduler may be started before the model is ready; submitted rows are
+held in the queue until set_model() is called.
+"""
+
+import logging
+import queue
+import threading
+import time
+
+import numpy as np
+
+from metrics import registry
+
+log = logging.getLogger(__name__)
+
+PREDICT_SECONDS = registry.histogram('bridge_predict_seconds', 'model.predict() time per batch')
+PREDICT_BATCH = registry.histogram('bridge_predict_batch_size', 'Windows per predict() batch',
+                                   buckets=(1, 2, 4, 8, 16, 32, 64, 128, 256, 512, 1024))
+
+
+class InferenceScheduler:
+    """Collects feature rows over a time slice and predicts them in one batch"""
+
+    def __init__(self, model, on_result, tick=0.05, max_batch=1024, default=120.0):
+        self.model = None
+        self.on_result = on_result
+        self.tick = tick
+        self.max_batch = max_batch
+        self.default = default
+
+        self._queue = queue.Queue()
+        self._stop = threading.Event()
+        self._ready = threading.Event()
+        self._thread = None
+
+        self.batches = 0
+        self.rows = 0
+        self.last_batch_size = 0
+        self.last_batch_seconds = 0.0
+
+        if model is not None:
+            self.set_model(model)
+
+    def set_model(self, model):
+        """Install the model and release any rows buffered while it was loading"""
+        self.model = model
+        self._ready.set()
+
+    @property
+    def ready(self):
+        return self._ready.is_set()
+
+    def start(self):
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name='bp-inference', daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout=5):
+        self._stop.set()
+        if self._thread:
+            self._thread.join(timeout)
+
+    def submit(self, features, context):
+        """Queue one feature row; on_result(context, prediction) fires after the next tick"""
+        self._queue.put((features, context))
+
+    def stats(self):
+        return {
+            'ready': self.ready,
+            'pending': self._queue.qsize(),
+            'batches': self.batches,
+            'rows': self.rows,
+            'last_batch_size': self.last_batch_size,
+            'last_batch_seconds': self.last_batch_seconds,
+        }
+
+    def _run(self):
+        # Buffer windows until the model has been loaded and warmed up
+        while not self._ready.wait(timeout=0.5):
+            if self._stop.is_set():
+                return
+        while not (self._stop.is_set() and self._queue.empty()):
+            try:
+                first = self._queue.get(timeout=0.5)
+            except queue.Empty:
+                continue
+            batch = [first]
+            deadline = time.monotonic() + self.tick
+            while len(batch) < self.max_batch:
+                remaining = deadline - time.monotonic()
+                try:
+                    if remaining > 0 and not self._stop.is_set():
+                        batch.append(self._queue.get(timeout=remaining))
+                    else:
+                        batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            self._predict_batch(batch)
+
+    def _predict_batch(self, batch):
+        started = time.perf_counter()
+        X = np.array([features for features, _ in batch], dtype=np.float64)
+        try:
+            predictions = self.model.predict(X)
+        except Exception as e:
+            log.error("Blood pressure prediction failed for batch of %d: %s", len(batch), e)
+            predictions = [self.default] * len(batch)
+
+        self.batches += 1
+        self.rows += len(batch)
+        self.last_batch_size = len(batch)
+        self.last_batch_seconds = time.perf_counter() - started
+        PREDICT_SECONDS.observe(self.last_batch_seconds)
+        PREDICT_BATCH.observe(len(batch))
+
+        for (_, context), prediction in zip(batch, predictions):
+            try:
+                self.on_result(context, float(prediction))
+            except Exception as e:
+                log.exception("Error handling prediction result: %s", e)
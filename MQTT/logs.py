@@ -0,0 +1,52 @@
+"""
+Logging setup for the MQTT bridge.
+
+Every bridge module logs through logging.getLogger(...) instead of print().
+The per-message lines (received reading, queued upload, prediction) are at
+DEBUG, so at the default INFO level their %-style arguments are never
+formatted. Device-related calls pass extra={'device_id': ...}; the JSON
+format writes that as its own field for log shippers.
+
+    BRIDGE_LOG_LEVEL=DEBUG|INFO|WARNING|...   (default INFO)
+    BRIDGE_LOG_FORMAT=text|json               (default text)
+"""
+
+import json
+import logging
+import os
+import sys
+
+TEXT_FORMAT = '%(asctime)s %(levelname)-7s %(processName)s %(name)s: %(message)s'
+
+# Attributes every LogRecord has; anything else came in through extra=
+_RESERVED = set(vars(logging.LogRecord('', 0, '', 0, '', (), None))) | {'message', 'asctime'}
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line, including any extra= fields"""
+
+    def format(self, record):
+        entry = {
+            'ts': self.formatTime(record),
+            'level': record.levelname,
+            'logger': record.name,
+            'process': record.processName,
+            'msg': record.getMessage(),
+        }
+        for key, value in vars(record).items():
+            if key not in _RESERVED and not key.startswith('_'):
+                entry[key] = value
+        if record.exc_info:
+            entry['exc'] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+
+def configure(level=None, fmt=None, stream=None):
+    """Install the bridge's root handler; arguments default to the environment"""
+    level = (level or os.environ.get('BRIDGE_LOG_LEVEL', 'INFO')).upper()
+    fmt = fmt or os.environ.get('BRIDGE_LOG_FORMAT', 'text')
+    handler = logging.StreamHandler(stream or sys.stdout)
+    handler.setFormatter(JsonFormatter() if fmt == 'json' else logging.Formatter(TEXT_FORMAT))
+    root = logging.getLogger()
+    root.handlers[:] = [handler]
+    root.setLevel(level)
@@ -1,44 +1,137 @@
 import paho.mqtt.client as mqtt
+import argparse
 import json
-import joblib
+import logging
 import serial
 import time
 import requests
 import random
-from collections import deque
+import os
+import threading
 from apscheduler.schedulers.background import BackgroundScheduler
 from datetime import datetime
+from urllib.parse import quote
+from sessions import SessionRegistry
+from profiles import DEFAULT_PATIENT_INFO, ProfileCache
+from uploader import BackendUploader
+from inference import InferenceScheduler
+from flat_forest import FlatForest
+from startup import StartupReport
+from alerts import AlertDispatcher
+from serial_link import SerialLink
+from sharding import HashRing, RemoteLink, Supervisor, device_id_from_payload
+from payload import Reading, decode_payload
+from topics import (LEGACY_CMD_TOPIC, LEGACY_DATA_TOPIC, LEGACY_MEDICATION_TOPIC,
+                    device_topic, parse_topic, wildcard)
+from metrics import registry
+import metrics
+import logs
+
+log = logging.getLogger('bridge')
 
 # MQTT config
 MQTT_BROKER = 'localhost'
 MQTT_PORT = 1883
-MQTT_TOPIC = 'elder_band/data'
-MEDICATION_TOPIC = 'elder_band/medication'
+DATA_TOPIC = wildcard('data')        # elder_band/<deviceId>/data
+PROFILE_TOPIC = wildcard('profile')  # retained invalidations from the backend
 
 # Serial config
 SERIAL_PORT = '/dev/ttyACM0'
 BAUD_RATE = 9600
+SOS_COALESCE_WINDOW = 60    # seconds a repeated SOS for the same device is merged
+SERIAL_RETRY_MIN = 2        # seconds before retrying a port that failed to open
+SERIAL_RETRY_MAX = 60       # backoff cap between open attempts
 
 # Backend config
 BACKEND_URL = 'http://127.0.0.1:8000/api'
 
-# Load model
-model = joblib.load('sbp_rf_model_realdata.joblib')
+# Upload queue config
+UPLOAD_QUEUE_SIZE = 10000   # readings buffered while the backend is slow/down
+UPLOAD_BATCH_SIZE = 100     # readings coalesced per upload round
+
+# Sharding config
+BRIDGE_WORKERS = int(os.environ.get('BRIDGE_WORKERS', 1))  # >1 runs the sharded supervisor
+
+# Session config
+WINDOW_SIZE = 5             # readings averaged per BP prediction
+SESSION_IDLE_TIMEOUT = 600  # seconds before an idle device session is evicted
+
+# Profile cache config
+PROFILE_TTL = 600           # seconds a fetched patient profile is trusted
+PROFILE_NEGATIVE_TTL = 60   # seconds before retrying a device with no patient
+PROFILE_CACHE_SIZE = 5000   # profiles kept (least recently used evicted)
+PROFILE_FETCH_TIMEOUT = 5
+PROFILE_EMERGENCY_WAIT = 2  # seconds an SOS waits for a profile still being fetched
+
+# Metrics config - /metrics on localhost; shard N of a sharded bridge uses port + 1 + N
+METRICS_PORT = int(os.environ.get('BRIDGE_METRICS_PORT', 9108))  # 0 disables the endpoint
+
+# Inference config
+INFERENCE_TICK = 0.05       # seconds of ready windows batched into one predict()
+
+# Model config
+MODEL_PATH = 'sbp_rf_model_realdata.joblib'
+FLAT_MODEL_PATH = 'sbp_rf_model_realdata.npz'  # produced by export_model.py
+
+# Load model - prefer the flattened NumPy forest, fall back to sklearn
+def load_model():
+    if os.path.exists(FLAT_MODEL_PATH):
+        # A retrained model (model.py) is newer than the last export; don't
+        # silently keep serving the old forest
+        if os.path.exists(MODEL_PATH) and os.path.getmtime(MODEL_PATH) > os.path.getmtime(FLAT_MODEL_PATH):
+            log.warning("%s is older than %s; using the sklearn model until export_model.py is re-run",
+                        FLAT_MODEL_PATH, MODEL_PATH)
+        else:
+            log.info("Loading flattened model from %s", FLAT_MODEL_PATH)
+            return FlatForest.load(FLAT_MODEL_PATH)
+    else:
+        log.info("Loading sklearn model from %s (run export_model.py for faster inference)", MODEL_PATH)
+    import joblib  # deferred: only the fallback path pays for sklearn unpickling
+    return joblib.load(MODEL_PATH)
+
+# Hot-path metrics; queue depths are registered as gauges in register_gauges()
+DECODE_SECONDS = registry.histogram('bridge_decode_seconds', 'Payload decode (binary or JSON) per message')
+BUFFER_SECONDS = registry.histogram('bridge_buffer_seconds', 'Session window append per message')
+MESSAGES = registry.counter('bridge_messages_total', 'Telemetry messages handled by this process')
+DEVICE_MESSAGES = registry.counter('bridge_device_messages_total', 'Telemetry messages per device', ['device'])
+INVALID_PAYLOADS = registry.counter('bridge_invalid_payloads_total', 'Payloads that failed to decode')
+ANOMALIES = registry.counter('bridge_anomalies_total', 'Vitals anomaly transitions', ['kind', 'state'])
 
-# Patient info - will be fetched from backend
-patient_info = {
-    'age': 30,
-    'sex': 1,
-    'device_id': None,
-    'emergency_contact_phone': None,
-    'doctor_phone': None,
-}
+# Startup phases reported once all have completed
+startup = StartupReport(expected=['mqtt_connected', 'model_loaded', 'model_warm', 'serial_open'])
 
-# Buffers and state
-buffer = deque(maxlen=5)
-emergency_count = 0
-call_count = 0
-current_device_id = None
+# Owns the Arduino serial port: one writer, SOS > CALL > STATUS, acknowledged
+link = SerialLink(sos_window=SOS_COALESCE_WINDOW,
+                  on_written=lambda command, seconds: on_command_written(command, seconds))
+
+# This process's shard; set by run_worker, None when one process owns every device
+shard_index = 0
+shard_ring = None
+
+# Per-device state: reading window and counters. Evicted devices also drop
+# their per-device metric series, so the label set stays bounded
+sessions = SessionRegistry(window_size=WINDOW_SIZE, idle_timeout=SESSION_IDLE_TIMEOUT,
+                           on_evict=DEVICE_MESSAGES.remove)
+
+# Device -> patient profile, filled in the background and invalidated over MQTT
+profiles = ProfileCache(lambda device_id: fetch_patient_profile(device_id), ttl=PROFILE_TTL,
+                        negative_ttl=PROFILE_NEGATIVE_TTL, max_entries=PROFILE_CACHE_SIZE)
+
+# Background uploader so a slow backend never blocks the MQTT loop
+uploader = BackendUploader(f"{BACKEND_URL}/health-data/",
+                           bulk_url=f"{BACKEND_URL}/health-data/bulk/",
+                           max_queue=UPLOAD_QUEUE_SIZE, max_batch=UPLOAD_BATCH_SIZE)
+
+# Batches ready windows from all devices into one model.predict() per tick
+inference = InferenceScheduler(None, on_result=lambda context, sbp: on_prediction(context, sbp),
+                               tick=INFERENCE_TICK)
+
+# Emergency / call / fall messages skip the telemetry path entirely
+alerts = AlertDispatcher({
+    'sos': lambda alert: handle_sos(alert),
+    'call': lambda alert: handle_call(alert),
+    'fall': lambda alert: handle_fall(alert),
+})
 
 # Medication schedule
 medications = [
@@ -46,54 +139,62 @@ medications = [
     "Losartan 50mg", "Enalapril 10mg", "Paracetamol 500mg"
 ]
 
-# Initialize serial
-try:
-    ser = serial.Serial(SERIAL_PORT, BAUD_RATE, timeout=1)
-    time.sleep(2)
-    print("Serial connection established")
-except Exception as e:
-    print(f"Failed to establish serial connection: {e}")
-    ser = None
-
-# Fetch patient data from Django backend using device ID
-def fetch_patient_data(device_id):
-    global patient_info
+# Load and warm up the model in the background, then hand it to the scheduler
+def load_model_in_background():
     try:
-        # First, try to get patient data by device ID
-        response = requests.get(f"{BACKEND_URL}/health-data/", 
-                              params={'device_id': device_id})
-        if response.status_code == 200:
-            print(f"Successfully connected to backend for device {device_id}")
-        
-        # Try to get patient contact info (legacy endpoint for fallback)
+        loaded = load_model()
+        startup.mark('model_loaded')
+        # First predict pays one-off allocation costs; keep it off the hot path
+        loaded.predict([[30, 70.0, 98.0, 36.5]])
+        startup.mark('model_warm')
+        inference.set_model(loaded)
+        log.info("Blood pressure model ready")
+    except Exception as e:
+        log.error("Failed to load blood pressure model: %s", e)
+        # Release buffered windows; they'll be posted with the default SBP
+        inference.set_model(None)
+        startup.mark('model_loaded', ok=False)
+        startup.mark('model_warm', ok=False)
+
+# Initialize serial in the background (the Arduino resets when the port opens).
+# If the port can't be opened, commands fail immediately while this keeps retrying
+def open_serial_in_background():
+    delay = SERIAL_RETRY_MIN
+    while True:
         try:
-            response = requests.get(f"{BACKEND_URL}/patient-contact/")
-            if response.status_code == 200:
-                data = response.json()
-                if isinstance(data, list) and data:
-                    contact_data = data[0]
-                    patient_info.update({
-                        'age': contact_data.get('patient_age', patient_info['age']),
-                        'sex': 1 if contact_data.get('patient_sex', '').lower() == 'male' else 0,
-                        'device_id': device_id,
-                        'emergency_contact_phone': contact_data.get('emergency_contact_phone'),
-                        'doctor_phone': contact_data.get('doctor_phone'),
-                    })
-                    print(f"Updated patient info: {patient_info}")
-                    return True
+            port = serial.Serial(SERIAL_PORT, BAUD_RATE, timeout=1)
+            time.sleep(2)
+            link.attach(port)
+            log.info("Serial connection established")
+            startup.mark('serial_open')
+            return
         except Exception as e:
-            print(f"Fallback patient contact fetch failed: {e}")
-        
-        # If no specific patient data found, use defaults but still track device
-        patient_info['device_id'] = device_id
-        print(f"Using default patient info for device {device_id}")
-        return True
-        
-    except Exception as e:
-        print(f"Failed to fetch patient data: {e}")
-        return False
+            if not link.unavailable:
+                log.error("Failed to establish serial connection: %s; retrying in the background", e)
+                link.mark_unavailable()
+                startup.mark('serial_open', ok=False)
+        if link.wait_stopped(delay):
+            return
+        delay = min(delay * 2, SERIAL_RETRY_MAX)
+
+# Fetch a device's patient profile from the per-device backend endpoint
+def fetch_patient_profile(device_id):
+    response = requests.get(f"{BACKEND_URL}/device/{quote(device_id, safe='')}/patient/",
+                            timeout=PROFILE_FETCH_TIMEOUT)
+    if response.status_code == 404:
+        # Unknown device or no patient assigned yet; cached briefly as defaults
+        return {}
+    response.raise_for_status()
+    data = response.json()
+    log.debug("Loaded patient profile for %s", device_id, extra={'device_id': device_id})
+    return {
+        'age': data.get('patient_age') or DEFAULT_PATIENT_INFO['age'],
+        'sex': 1 if (data.get('patient_sex') or '').lower() == 'male' else 0,
+        'emergency_contact_phone': data.get('emergency_contact_phone'),
+        'doctor_phone': data.get('doctor_phone'),
+    }
 
-# Post health data to backend with device ID
+# Queue health data for upload to the backend with device ID
 def post_to_backend(device_id, hr, spo2, temp, fall, bp, emergency=False, call_initiated=False):
     try:
         payload = {
@@ -102,208 +203,283 @@ def post_to_backend(device_id, hr, spo2, temp, fall, bp, emergency=False, call_i
             "spo2": int(spo2) if spo2 and spo2 > 0 else None,
             "body_temp": round(temp, 2) if temp else None,
             "fall_detected": bool(fall),
-            "blood_pressure": str(round(bp, 2)) if bp else None
+            "blood_pressure": round(float(bp), 2) if bp else None
         }
         
-        response = requests.post(f"{BACKEND_URL}/health-data/", json=payload)
-        response.raise_for_status()
-        print(f"Posted to backend: {payload}")
+        uploader.submit(payload)
+        log.debug("Queued for backend: %s", payload, extra={'device_id': device_id})
         
         # Log emergency or call events
         if emergency:
-            print(f"EMERGENCY EVENT logged for device {device_id}")
+            log.warning("EMERGENCY EVENT logged for device %s", device_id, extra={'device_id': device_id})
         if call_initiated:
-            print(f"CALL EVENT logged for device {device_id}")
+            log.info("CALL EVENT logged for device %s", device_id, extra={'device_id': device_id})
             
         return True
     except Exception as e:
-        print(f"Failed to post to backend: {e}")
+        log.error("Failed to queue data for backend: %s", e)
         return False
 
-# Send emergency call command via serial
-def send_emergency_call():
-    global ser, patient_info
-    if not ser:
-        print("Serial connection not available")
-        return False
-        
+# Queue an emergency command for the GSM gateway; returns the GsmCommand or None.
+# `received` is the alert's MQTT receive time, for receive -> serial latency
+def send_emergency_call(patient_info, received=None):
+    if link.unavailable:
+        log.warning("Serial connection unavailable; command will fail")
+    elif not link.attached:
+        log.warning("Serial connection not open yet; command will be queued")
+
+    device_id = patient_info.get('device_id')
     emergency_phone = patient_info.get('emergency_contact_phone')
     doctor_phone = patient_info.get('doctor_phone')
     
     if emergency_phone:
         # Send SOS to emergency contact (includes SMS + call)
-        cmd = f"SOS:{emergency_phone}\n"
-        try:
-            ser.write(cmd.encode())
-            print(f"Sent SOS command: {cmd.strip()}")
-            return True
-        except Exception as e:
-            print(f"Failed to send SOS command: {e}")
+        command = link.submit('sos', f"SOS:{emergency_phone}", key=device_id, received=received)
+        if command is None:
+            log.info("SOS for %s coalesced into the one already in progress", device_id, extra={'device_id': device_id})
+        elif not command.done.is_set():
+            log.warning("Queued SOS command: %s", command.line, extra={'device_id': device_id})
+        return command
     
     elif doctor_phone:
         # Fallback to doctor call
-        cmd = f"CALL:{doctor_phone}\n"
-        try:
-            ser.write(cmd.encode())
-            print(f"Sent CALL command to doctor: {cmd.strip()}")  
-            return True
-        except Exception as e:
-            print(f"Failed to send CALL command: {e}")
+        command = link.submit('call', f"CALL:{doctor_phone}", received=received)
+        if not command.done.is_set():
+            log.warning("Queued CALL command to doctor: %s", command.line, extra={'device_id': device_id})
+        return command
     
     else:
-        print("No emergency contact or doctor phone available")
+        log.error("No emergency contact or doctor phone available for %s", device_id, extra={'device_id': device_id})
     
-    return False
+    return None
 
-# Send regular call command via serial
-def send_call():
-    global ser, patient_info
-    if not ser:
-        print("Serial connection not available")
-        return False
+# Queue a regular call command for the GSM gateway; returns the GsmCommand or None
+def send_call(patient_info, received=None):
+    if link.unavailable:
+        log.warning("Serial connection unavailable; command will fail")
+    elif not link.attached:
+        log.warning("Serial connection not open yet; command will be queued")
         
     # For regular calls, try emergency contact first, then doctor
     phone_to_call = (patient_info.get('emergency_contact_phone') or 
                     patient_info.get('doctor_phone'))
     
     if phone_to_call:
-        cmd = f"CALL:{phone_to_call}\n"
-        try:
-            ser.write(cmd.encode())
-            print(f"Sent CALL command: {cmd.strip()}")
-            return True
-        except Exception as e:
-            print(f"Failed to send CALL command: {e}")
+        command = link.submit('call', f"CALL:{phone_to_call}", received=received)
+        if not command.done.is_set():
+            log.info("Queued CALL command: %s", command.line)
+        return command
     else:
-        print("No phone number available for calling")
+        log.error("No phone number available for calling")
     
-    return False
+    return None
 
-# Process health data and predict blood pressure
-def process_and_predict(messages):
-    if not messages:
+# Process a device's reading window and predict blood pressure
+def process_and_predict(session, readings, patient_info):
+    if not readings:
         return
         
-    # Calculate averages from the message buffer
-    avg_hr = sum(m.get('heartRate', 70) for m in messages) / len(messages)
-    avg_spo2 = sum(m.get('spo2', 98) for m in messages) / len(messages)
-    avg_temp = sum(m.get('temperature', 36.5) for m in messages) / len(messages)
-    fall_any = any(m.get('fall', False) for m in messages)
-    emergency_any = any(m.get('emergency', False) for m in messages)
-    
-    # Get device ID from messages
-    device_id = current_device_id or messages[0].get('deviceId', 'unknown')
+    # Calculate averages from the (hr, spo2, temp, fall, emergency) window
+    n = len(readings)
+    avg_hr = sum(r[0] for r in readings) / n
+    avg_spo2 = sum(r[1] for r in readings) / n
+    avg_temp = sum(r[2] for r in readings) / n
+    fall_any = any(r[3] for r in readings)
+    emergency_any = any(r[4] for r in readings)
     
-    # Predict blood pressure using the model
-    try:
-        X = [[patient_info['age'], avg_hr, avg_spo2, avg_temp]]
-        predicted_sbp = model.predict(X)[0]
-        print(f"Predicted SBP: {predicted_sbp:.2f}")
-    except Exception as e:
-        print(f"Blood pressure prediction failed: {e}")
-        predicted_sbp = 120  # Default value
-    
-    # Post to backend
-    post_to_backend(device_id, avg_hr, avg_spo2, avg_temp, fall_any, 
+    # Queue for the next batched blood pressure prediction
+    features = [patient_info['age'], avg_hr, avg_spo2, avg_temp]
+    inference.submit(features, (session.device_id, avg_hr, avg_spo2, avg_temp,
+                                fall_any, emergency_any))
+
+# Report a vitals anomaly raised or cleared by a device's detector
+def report_anomaly(device_id, kind, state, level, baseline):
+    ANOMALIES.labels(kind, state).inc()
+    extra = {'device_id': device_id, 'anomaly': kind, 'state': state}
+    if state == 'raised':
+        log.warning("ANOMALY %s on %s: level %.1f (baseline %.1f)", kind, device_id, level, baseline, extra=extra)
+    else:
+        log.info("Anomaly %s cleared on %s: level %.1f", kind, device_id, level, extra=extra)
+
+# Fan a batched prediction back out to its device and post it to backend
+def on_prediction(context, predicted_sbp):
+    device_id, avg_hr, avg_spo2, avg_temp, fall_any, emergency_any = context
+    log.debug("Predicted SBP for %s: %.2f", device_id, predicted_sbp, extra={'device_id': device_id})
+    for event in sessions.get(device_id).vitals.update_sbp(predicted_sbp):
+        report_anomaly(device_id, *event)
+    post_to_backend(device_id, avg_hr, avg_spo2, avg_temp, fall_any,
                    predicted_sbp, emergency_any, False)
 
+# The serial link wrote an alert's command; record receive -> serial latency
+def on_command_written(command, seconds):
+    latency_ms = alerts.record_latency(command.kind, seconds * 1000)
+    log.info("%s written %.1f ms after receive", command.line, latency_ms)
+
+# Run handler(alert, patient_info) once the device's profile is known. A
+# first-contact device may still be fetching its phone numbers: that wait
+# happens on its own thread so other devices' alerts are not held up.
+def with_profile(alert, handler):
+    if alert.device_id in profiles:
+        handler(alert, profiles.get(alert.device_id))
+        return
+    threading.Thread(
+        target=lambda: handler(alert, profiles.get(alert.device_id, wait=PROFILE_EMERGENCY_WAIT)),
+        name='alert-profile-wait', daemon=True).start()
+
+# Alert handlers - run on the alert dispatcher's worker, never the MQTT thread;
+# they queue serial commands and return without waiting for the write
+def handle_sos(alert):
+    with_profile(alert, sos_with_profile)
+
+def sos_with_profile(alert, patient_info):
+    command = send_emergency_call(patient_info, alert.received)
+    if command:
+        # Post emergency event to backend
+        data = alert.data
+        post_to_backend(alert.device_id,
+                      data.get('heartRate', 0),
+                      data.get('spo2', 0),
+                      data.get('temperature', 0),
+                      data.get('fall', False),
+                      None, # BP will be predicted
+                      True, # emergency=True
+                      False)
+
+def handle_call(alert):
+    with_profile(alert, call_with_profile)
+
+def call_with_profile(alert, patient_info):
+    command = send_call(patient_info, alert.received)
+    if command:
+        # Post call event to backend
+        data = alert.data
+        post_to_backend(alert.device_id,
+                      data.get('heartRate', 0),
+                      data.get('spo2', 0),
+                      data.get('temperature', 0),
+                      data.get('fall', False),
+                      None, # BP will be predicted
+                      False,
+                      True) # call_initiated=True
+
+def handle_fall(alert):
+    # Falls escalate through the emergency count. Only logged: the firmware
+    # keeps fall=true on every reading until cancelled, and the averaged
+    # window row already carries fall_detected, so posting here would
+    # duplicate rows and inflate the rollups' fall_count.
+    log.warning("FALL DETECTED on %s - checking for emergency response", alert.device_id, extra={'device_id': alert.device_id})
+
 # Handle incoming MQTT messages from ESP32
 def on_message(client, userdata, msg):
-    global buffer, emergency_count, call_count, current_device_id, patient_info
-
+    received = time.perf_counter()
     try:
-        data = json.loads(msg.payload.decode())
-        print(f"Received MQTT data: {data}")
-        
-        # Extract device ID and update global state
-        device_id = data.get('deviceId', 'unknown')
-        if current_device_id != device_id:
-            current_device_id = device_id
-            # Fetch patient data for this device
-            fetch_patient_data(device_id)
-        
-        buffer.append(data)
+        # Per-device topics carry the device id; flat legacy ones need the payload
+        topic_device_id, _ = parse_topic(msg.topic)
+
+        # Another shard owns this device: drop it before paying for json.loads
+        if shard_ring is not None:
+            owner_id = topic_device_id or device_id_from_payload(msg.payload)
+            if shard_ring.owner(owner_id or 'unknown') != shard_index:
+                return
 
-        # Process every 5 messages for blood pressure prediction
-        if len(buffer) == 5:
-            process_and_predict(list(buffer))
-            buffer.clear()
+        # Binary v1 records or JSON, told apart by the first byte
+        started = time.perf_counter()
+        data = decode_payload(msg.payload)
+        DECODE_SECONDS.observe(time.perf_counter() - started)
+        if topic_device_id is None and isinstance(data, Reading):
+            # Binary records carry no device id; on a flat topic every such
+            # band would share one session, emergency count and SOS profile
+            raise ValueError("binary payload on a flat topic has no device id")
+        device_id = topic_device_id or data.get('deviceId', 'unknown')
+        MESSAGES.inc()
+        DEVICE_MESSAGES.labels(device_id).inc()
+        session = sessions.get(device_id)
+        session.per_device_topics = topic_device_id is not None
 
-        # Handle emergency situations (fall, extreme vitals)
+        # Alerts are classified and dispatched before any telemetry work
         if data.get('emergency', False):
-            emergency_count += 1
-            print(f"Emergency detected! Count: {emergency_count}")
-            
+            session.emergency_count += 1
             # Send emergency call after 3 consecutive emergency signals
-            if emergency_count >= 3:
-                print("EMERGENCY THRESHOLD REACHED - Initiating emergency call")
-                if send_emergency_call():
-                    # Post emergency event to backend
-                    post_to_backend(device_id, 
-                                  data.get('heartRate', 0),
-                                  data.get('spo2', 0), 
-                                  data.get('temperature', 0),
-                                  data.get('fall', False),
-                                  None, # BP will be predicted
-                                  True, # emergency=True
-                                  False)
-                emergency_count = 0  # Reset after handling
+            if session.emergency_count >= 3:
+                alerts.submit('sos', device_id, data, received)
+                log.warning("EMERGENCY THRESHOLD REACHED on %s - Initiating emergency call", device_id, extra={'device_id': device_id})
+                session.emergency_count = 0  # Reset after handling
+            else:
+                log.info("Emergency detected on %s! Count: %d", device_id, session.emergency_count, extra={'device_id': device_id})
         else:
-            emergency_count = max(0, emergency_count - 1)  # Gradually decrease if no emergency
+            session.emergency_count = max(0, session.emergency_count - 1)  # Gradually decrease if no emergency
 
-        # Handle manual call button press
+        # Manual call button press calls immediately
         if data.get('call', False):
-            call_count += 1
-            print(f"Call button pressed! Count: {call_count}")
-            
-            # Send call immediately on button press
-            if call_count >= 1:
-                print("CALL BUTTON PRESSED - Initiating call")
-                if send_call():
-                    # Post call event to backend
-                    post_to_backend(device_id,
-                                  data.get('heartRate', 0),
-                                  data.get('spo2', 0),
-                                  data.get('temperature', 0), 
-                                  data.get('fall', False),
-                                  None, # BP will be predicted
-                                  False,
-                                  True) # call_initiated=True
-                call_count = 0  # Reset after handling
-
-        # Handle fall detection specifically
+            alerts.submit('call', device_id, data, received)
+            log.warning("CALL BUTTON PRESSED on %s - Initiating call", device_id, extra={'device_id': device_id})
+
         if data.get('fall', False):
-            print("FALL DETECTED - Checking for emergency response")
-            # Falls are also handled by emergency logic above
-            
+            alerts.submit('fall', device_id, data, received)
+
+        log.debug("Received MQTT data: %s", data, extra={'device_id': device_id})
+
+        # O(1) per reading against this device's own rolling baselines
+        for event in session.vitals.update(data):
+            report_anomaly(device_id, *event)
+
+        # Process every WINDOW_SIZE messages for blood pressure prediction,
+        # using the cached profile (no network calls)
+        patient_info = profiles.get(device_id)
+        started = time.perf_counter()
+        window = session.push(data)
+        BUFFER_SECONDS.observe(time.perf_counter() - started)
+        if window:
+            process_and_predict(session, window, patient_info)
+
         # Handle medication reminder status
         if data.get('medicationReminder', False):
-            print("Device reports active medication reminder")
+            log.debug("Device %s reports active medication reminder", device_id, extra={'device_id': device_id})
 
-    except json.JSONDecodeError as e:
-        print(f"Invalid JSON received: {e}")
+    except ValueError as e:
+        INVALID_PAYLOADS.inc()
+        log.warning("Invalid payload received on %s: %s", msg.topic, e)
     except Exception as e:
-        print(f"Error processing MQTT message: {e}")
+        log.exception("Error processing MQTT message: %s", e)
+
+# Backend published a retained "profile changed" marker for a device
+def on_profile_message(client, userdata, msg):
+    device_id = msg.topic.split('/')[1]
+    if profiles.invalidate(device_id):
+        log.info("Patient profile changed for %s; refreshing", device_id, extra={'device_id': device_id})
 
 # Send medication reminder to ESP32
 def send_medication_reminder(client, medication_time):
     try:
-        # Send simple boolean trigger - ESP32 handles the buzzing/display
-        client.publish(MEDICATION_TOPIC, "true")
-        print(f"Sent medication reminder for {medication_time}")
-        
-        # Also send medication info (optional, for future use)
-        medication_info = {
+        # Medication info (optional, for future use)
+        medication_info = json.dumps({
             "type": "medication",
             "medicine": random.choice(medications),
             "time": medication_time,
             "timestamp": datetime.now().isoformat()
-        }
-        client.publish("elder_band/cmd", json.dumps(medication_info))
-        print(f"Sent medication info: {medication_info}")
+        })
+        
+        # Simple boolean trigger on each band's own topic - ESP32 handles the
+        # buzzing/display. Every shard reminds the bands it owns.
+        targeted = 0
+        for session in sessions.snapshot():
+            if session.per_device_topics:
+                client.publish(device_topic(session.device_id, 'medication'), "true")
+                client.publish(device_topic(session.device_id, 'cmd'), medication_info)
+                targeted += 1
+        
+        # Older firmware only listens on the broadcast topics. A legacy band
+        # may hash to any shard (or not have reported yet), so shard 0 always
+        # broadcasts, exactly once across shards.
+        broadcast = shard_index == 0
+        if broadcast:
+            client.publish(LEGACY_MEDICATION_TOPIC, "true")
+            client.publish(LEGACY_CMD_TOPIC, medication_info)
+        log.info("Sent medication reminder for %s to %d band(s)%s", medication_time, targeted,
+                 ' plus legacy broadcast' if broadcast else '')
         
     except Exception as e:
-        print(f"Failed to send medication reminder: {e}")
+        log.error("Failed to send medication reminder: %s", e)
 
 # Setup medication reminder scheduler
 def setup_medication_schedule(client):
@@ -333,55 +509,146 @@ def setup_medication_schedule(client):
     # )
     
     scheduler.start()
-    print("Medication schedule setup complete")
+    log.info("Medication schedule setup complete")
 
 # MQTT connection handlers
 def on_connect(client, userdata, flags, rc):
     if rc == 0:
-        print("Connected to MQTT broker successfully")
-        client.subscribe(MQTT_TOPIC)
-        print(f"Subscribed to topic: {MQTT_TOPIC}")
+        log.info("Connected to MQTT broker successfully")
+        client.subscribe([(DATA_TOPIC, 0), (LEGACY_DATA_TOPIC, 0)])
+        log.info("Subscribed to topics: %s, %s", DATA_TOPIC, LEGACY_DATA_TOPIC)
+        client.subscribe(PROFILE_TOPIC, qos=1)
+        startup.mark('mqtt_connected')
     else:
-        print(f"Failed to connect to MQTT broker. Return code: {rc}")
+        log.error("Failed to connect to MQTT broker. Return code: %s", rc)
 
 def on_disconnect(client, userdata, rc):
-    print(f"Disconnected from MQTT broker. Return code: {rc}")
+    log.warning("Disconnected from MQTT broker. Return code: %s", rc)
 
-# Main function
-def main():
-    print("Starting Elderly Monitoring MQTT Client...")
+# Queue depths and cache sizes, read from the components when /metrics is scraped
+def register_gauges():
+    registry.gauge('bridge_sessions', 'Active device sessions', lambda: len(sessions))
+    registry.gauge('bridge_profile_cache_entries', 'Cached patient profiles', lambda: len(profiles))
+    registry.gauge('bridge_upload_queue_depth', 'Readings waiting for upload',
+                   lambda: uploader.stats()['queue_depth'])
+    registry.gauge('bridge_inference_queue_depth', 'Windows waiting for predict()',
+                   lambda: inference.stats()['pending'])
+    registry.gauge('bridge_alert_queue_depth', 'Alerts waiting for a handler',
+                   lambda: alerts.stats()['pending'])
+    registry.gauge('bridge_serial_queue_depth', 'GSM commands waiting for the serial writer',
+                   lambda: link.stats().get('pending', 0))
+
+# Serve /metrics for this process; a port already in use only disables metrics
+def start_metrics_server(port):
+    if not port:
+        return None
+    try:
+        server = metrics.serve(port)
+        log.info("Metrics on http://127.0.0.1:%d/metrics", port)
+        return server
+    except OSError as e:
+        log.error("Could not serve metrics on port %d: %s", port, e)
+        return None
+
+# Run one bridge process: the whole bridge, or a single shard of it
+def run_bridge(open_serial=True, metrics_port=METRICS_PORT):
+    log.info("Starting Elderly Monitoring MQTT Client...")
+    register_gauges()
+    start_metrics_server(metrics_port)
     
     # Setup MQTT client
     client = mqtt.Client()
     client.on_connect = on_connect
     client.on_disconnect = on_disconnect
     client.on_message = on_message
+    client.message_callback_add(PROFILE_TOPIC, on_profile_message)
+    
+    alerts.start()
+    uploader.start()
+    profiles.start()
+    inference.start()
+    
+    # Model load and serial open run alongside the broker connection
+    threading.Thread(target=load_model_in_background, name='model-loader', daemon=True).start()
+    if open_serial:
+        threading.Thread(target=open_serial_in_background, name='serial-open', daemon=True).start()
     
     try:
         # Connect to MQTT broker
-        print(f"Connecting to MQTT broker at {MQTT_BROKER}:{MQTT_PORT}")
+        log.info("Connecting to MQTT broker at %s:%s", MQTT_BROKER, MQTT_PORT)
         client.connect(MQTT_BROKER, MQTT_PORT, 60)
         
         # Setup medication reminders
         setup_medication_schedule(client)
         
-        print("System ready. Monitoring elderly band data...")
-        print("Available commands will be sent via serial to Arduino GSM module")
-        print("- CALL:<number> for regular calls")
-        print("- SOS:<number> for emergency (SMS + call)")
+        log.info("System ready. Monitoring elderly band data...")
+        log.info("Available commands will be sent via serial to Arduino GSM module")
+        log.info("- CALL:<number> for regular calls")
+        log.info("- SOS:<number> for emergency (SMS + call)")
         
         # Start the MQTT loop
         client.loop_forever()
         
     except KeyboardInterrupt:
-        print("\nShutting down gracefully...")
+        log.info("Shutting down gracefully...")
         client.disconnect()
-        if ser:
-            ser.close()
+        inference.stop()
+        profiles.stop()
+        uploader.stop()
+        alerts.stop()
+        log.info("Upload stats: %s", uploader.stats())
+        log.info("Alert stats: %s", alerts.stats())
+        log.info("Serial link stats: %s", link.stats())
+        link.stop()
     except Exception as e:
-        print(f"Error in main: {e}")
-        if ser:
-            ser.close()
+        log.exception("Error in main: %s", e)
+        inference.stop()
+        profiles.stop()
+        uploader.stop()
+        alerts.stop()
+        link.stop()
+
+# Entry point of a shard process started by the supervisor
+def run_worker(index, count, commands):
+    global shard_index, shard_ring, link, startup
+    shard_index, shard_ring = index, HashRing(range(count))
+    link = RemoteLink(commands)
+    startup = StartupReport(expected=['mqtt_connected', 'model_loaded', 'model_warm'])
+    logs.configure()
+    log.info("Shard %d/%d starting", index, count)
+    run_bridge(open_serial=False, metrics_port=METRICS_PORT and METRICS_PORT + 1 + index)
+
+# Supervisor: owns the serial port and keeps `count` shard processes running
+def run_supervisor(count):
+    global startup
+    startup = StartupReport(expected=['serial_open'])
+    supervisor = Supervisor(count, run_worker, on_command=link.submit)
+    registry.gauge('bridge_serial_queue_depth', 'GSM commands waiting for the serial writer',
+                   lambda: link.stats()['pending'])
+    registry.gauge('bridge_shard_restarts', 'Shard processes restarted by the supervisor',
+                   lambda: supervisor.restarts)
+    start_metrics_server(METRICS_PORT)
+    supervisor.start()
+    threading.Thread(target=open_serial_in_background, name='serial-open', daemon=True).start()
+    try:
+        supervisor.run()
+    except KeyboardInterrupt:
+        log.info("Shutting down shards...")
+    supervisor.stop()
+    log.info("Serial link stats: %s, shard restarts: %d", link.stats(), supervisor.restarts)
+    link.stop()
+
+# Main function
+def main():
+    parser = argparse.ArgumentParser(description="Elderly band MQTT bridge")
+    parser.add_argument('--workers', type=int, default=BRIDGE_WORKERS,
+                        help="shard devices across this many processes (default: %(default)s)")
+    args = parser.parse_args()
+    logs.configure()
+    if args.workers > 1:
+        run_supervisor(args.workers)
+    else:
+        run_bridge()
 
 if __name__ == '__main__':
     main()
@@ -37,3 +37,8 @@ print(f'RandomForest RMSE: {rmse:.2f}')
 # 7. Save model
 joblib.dump(model, 'sbp_rf_model_realdata.joblib')
 print('Model saved as sbp_rf_model_realdata.joblib')
+
+# 8. Flatten it for the bridge (main.py prefers the .npz while it is current)
+from flat_forest import FlatForest
+FlatForest.from_sklearn(model).save('sbp_rf_model_realdata.npz')
+print('Flattened model saved as sbp_rf_model_realdata.npz')
@@ -0,0 +1,80 @@
+"""
+Telemetry payload decoding: compact binary v1 with JSON fallback.
+
+Bands on per-device topics can send a fixed 15-byte little-endian record
+instead of a ~220-byte JSON object. The device id comes from the topic, so
+the bridge rejects binary records on the flat legacy topic.
+The first byte tells the formats apart: JSON always starts with '{' or
+whitespace, binary records start with a version byte in 0xB0-0xBF.
+
+    offset  type    field
+    0       uint8   0xB1 (format version 1)
+    1       uint8   flags: fall, emergency, fingerDetected, call,
+                    medicationReminder (bit 0..4)
+    2       int16   heartRate
+    4       uint8   spo2
+    5       int16   temperature in hundredths of a degree C
+    7       uint32  timestamp (device millis())
+    11      uint32  freeHeap
+
+decode_payload() returns a Reading for binary records and the parsed dict
+for JSON. Both answer .get(key, default) with the JSON key names, so the
+message handlers do not care which format arrived.
+"""
+
+import json
+import struct
+
+BINARY_V1 = 0xB1
+_BINARY_VERSIONS = range(0xB0, 0xC0)
+_V1 = struct.Struct('<BBhBhII')
+
+FLAGS = ('fall', 'emergency', 'fingerDetected', 'call', 'medicationReminder')
+
+
+class Reading:
+    """One decoded binary reading; attribute names match the JSON keys"""
+
+    __slots__ = ('heartRate', 'spo2', 'temperature', 'fall', 'emergency',
+                 'fingerDetected', 'call', 'medicationReminder', 'timestamp', 'freeHeap')
+
+    def __init__(self, flags, heart_rate, spo2, temperature, timestamp, free_heap):
+        self.heartRate = heart_rate
+        self.spo2 = spo2
+        self.temperature = temperature
+        self.fall = bool(flags & 1)
+        self.emergency = bool(flags & 2)
+        self.fingerDetected = bool(flags & 4)
+        self.call = bool(flags & 8)
+        self.medicationReminder = bool(flags & 16)
+        self.timestamp = timestamp
+        self.freeHeap = free_heap
+
+    def get(self, key, default=None):
+        return getattr(self, key, default)
+
+    def __repr__(self):
+        fields = ', '.join(f'{name}={getattr(self, name)!r}' for name in self.__slots__)
+        return f'Reading({fields})'
+
+
+def decode_payload(payload):
+    """Decode a telemetry payload (bytes) into a Reading or a JSON dict"""
+    if payload and payload[0] in _BINARY_VERSIONS:
+        if payload[0] != BINARY_V1:
+            raise ValueError(f"Unsupported binary payload version 0x{payload[0]:02X}")
+        if len(payload) != _V1.size:
+            raise ValueError(f"Binary payload is {len(payload)} bytes, expected {_V1.size}")
+        _, flags, heart_rate, spo2, temp_centi, timestamp, free_heap = _V1.unpack(payload)
+        return Reading(flags, heart_rate, spo2, temp_centi / 100, timestamp, free_heap)
+    return json.loads(payload)
+
+
+def encode_reading(heartRate=0, spo2=0, temperature=0.0, timestamp=0, freeHeap=0, **flags):
+    """Pack a reading into the v1 binary layout (for simulators and tests)"""
+    bits = 0
+    for i, name in enumerate(FLAGS):
+        if flags.get(name):
+            bits |= 1 << i
+    return _V1.pack(BINARY_V1, bits, heartRate, spo2, round(temperature * 100),
+                    timestamp & 0xFFFFFFFF, freeHeap & 0xFFFFFFFF)
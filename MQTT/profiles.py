@@ -0,0 +1,163 @@
+"""
+Device-ID -> patient profile cache for the MQTT bridge.
+
+Message handling only ever reads from the cache. A miss (or an expired entry)
+returns the defaults (or the stale profile) immediately and queues the device
+for a background fetch, so enriching a reading costs no network round trip.
+Entries expire after a TTL, the least recently used ones are evicted beyond
+max_entries, and invalidate() (driven by the backend's retained profile
+topic) marks an entry stale and refreshes it right away.
+"""
+
+import logging
+import queue
+import threading
+import time
+from collections import OrderedDict
+
+log = logging.getLogger(__name__)
+
+# Default patient profile used until the backend tells us otherwise
+DEFAULT_PATIENT_INFO = {
+    'age': 30,
+    'sex': 1,
+    'device_id': None,
+    'emergency_contact_phone': None,
+    'doctor_phone': None,
+}
+
+
+def default_profile(device_id):
+    return dict(DEFAULT_PATIENT_INFO, device_id=device_id)
+
+
+class ProfileCache:
+    """TTL + LRU cache of patient profiles filled by background fetch threads"""
+
+    def __init__(self, fetch, ttl=600, negative_ttl=60, max_entries=5000, workers=2):
+        # fetch(device_id) -> profile dict, {} when no patient is assigned;
+        # raises on transport errors
+        self._fetch = fetch
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.max_entries = max_entries
+        self.workers = workers
+
+        self._entries = OrderedDict()   # device_id -> (profile, expires_at)
+        self._pending = {}              # device_id -> Event set once fetched
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._threads = []
+
+        self.hits = 0
+        self.misses = 0
+        self.fetches = 0
+        self.failures = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def start(self):
+        if any(t.is_alive() for t in self._threads):
+            return
+        self._stop.clear()
+        self._threads = [
+            threading.Thread(target=self._run, name=f'profile-fetch-{i}', daemon=True)
+            for i in range(self.workers)
+        ]
+        for thread in self._threads:
+            thread.start()
+
+    def stop(self, timeout=5):
+        self._stop.set()
+        for thread in self._threads:
+            thread.join(timeout)
+
+    def get(self, device_id, wait=0):
+        """Cached profile for device_id; never blocks unless `wait` seconds are given"""
+        with self._lock:
+            entry = self._entries.get(device_id)
+            if entry and entry[1] > time.monotonic():
+                self._entries.move_to_end(device_id)
+                self.hits += 1
+                return entry[0]
+            self.misses += 1
+            done = self._schedule(device_id)
+
+        # Stale profiles are still better than defaults while the refresh runs
+        if entry:
+            return entry[0]
+        if wait and done.wait(wait):
+            with self._lock:
+                entry = self._entries.get(device_id)
+                if entry:
+                    return entry[0]
+        return default_profile(device_id)
+
+    def invalidate(self, device_id):
+        """Mark a profile stale and refetch it if it is cached; True if it was"""
+        with self._lock:
+            entry = self._entries.get(device_id)
+            if entry is None:
+                return False
+            self._entries[device_id] = (entry[0], 0)
+            self.invalidations += 1
+            self._schedule(device_id)
+            return True
+
+    def _schedule(self, device_id):
+        # Caller holds the lock; at most one fetch per device is in flight
+        done = self._pending.get(device_id)
+        if done is None:
+            done = self._pending[device_id] = threading.Event()
+            self._queue.put(device_id)
+        return done
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                device_id = self._queue.get(timeout=0.5)
+            except queue.Empty:
+                continue
+
+            try:
+                profile = self._fetch(device_id)
+                ttl = self.ttl if profile else self.negative_ttl
+                failed = False
+            except Exception as e:
+                log.warning("Profile fetch failed for %s: %s", device_id, e, extra={'device_id': device_id})
+                profile, ttl, failed = None, self.negative_ttl, True
+
+            with self._lock:
+                self.fetches += 1
+                if failed:
+                    self.failures += 1
+                    # Keep serving whatever we had; retry after negative_ttl
+                    previous = self._entries.get(device_id)
+                    profile = previous[0] if previous else default_profile(device_id)
+                else:
+                    profile = dict(DEFAULT_PATIENT_INFO, **profile, device_id=device_id)
+                self._entries[device_id] = (profile, time.monotonic() + ttl)
+                self._entries.move_to_end(device_id)
+                while len(self._entries) > self.max_entries:
+                    self._entries.popitem(last=False)
+                    self.evictions += 1
+                self._pending.pop(device_id).set()
+
+    def stats(self):
+        with self._lock:
+            return {
+                'size': len(self._entries),
+                'hits': self.hits,
+                'misses': self.misses,
+                'fetches': self.fetches,
+                'failures': self.failures,
+                'evictions': self.evictions,
+                'invalidations': self.invalidations,
+            }
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, device_id):
+        return device_id in self._entries
@@ -0,0 +1,279 @@
+"""
+Serial link manager for the Arduino GSM gateway.
+
+Arduino/gsm.ino handles one command at a time: it echoes "Received: <cmd>",
+then spends seconds in delay() chains (an SOS sends an SMS and dials every
+number), and while a call is active monitorCall() can swallow serial input
+that is not HANGUP. Writing from several threads therefore loses or
+interleaves commands.
+
+SerialLink owns the port. Callers submit() commands and get back a
+GsmCommand to wait on. A single writer thread sends them one at a time in
+priority order (SOS, then CALL, then STATUS), and waits for the echo (retrying
+if none arrives) and for the sketch's completion line before sending the
+next one. A reader thread parses every line the Arduino prints. Repeated
+SOS commands for the same device within `sos_window` seconds are coalesced
+into the one already queued or sent. Once opening the port has failed the
+link is marked unavailable: queued commands and any submitted until a later
+attach() finish as failed at once instead of waiting on a port that may never
+open (so no SOS is coalesced into one that was never written). A command may carry the perf_counter()
+time its MQTT message arrived; `on_written(command, seconds)` is called at
+its first write, so receive -> serial latency includes every wait, however long.
+"""
+
+import itertools
+import logging
+import queue
+import threading
+import time
+
+from metrics import registry
+
+log = logging.getLogger(__name__)
+
+SERIAL_WRITE_SECONDS = registry.histogram('bridge_serial_write_seconds', 'Serial write + flush per attempt')
+SERIAL_COMMANDS = registry.counter('bridge_serial_commands_total', 'GSM commands by kind and outcome',
+                                   ['kind', 'outcome'])
+
+# Lower value is written first
+PRIORITIES = {'sos': 0, 'call': 1, 'hangup': 1, 'status': 2}
+
+# Lines printed by gsm.ino that finish a command: kind -> [(prefix, ok)]
+COMPLETIONS = {
+    'sos': [('Emergency call initiated', True)],
+    'call': [('Call initiated', True), ('Call already in progress', False)],
+    'hangup': [('Call ended', True), ('Emergency call ended', True), ('No active call', False)],
+    'status': [('SOS active:', True)],
+}
+UNKNOWN_COMMAND = 'Unknown command format.'
+
+# Unsolicited lines worth tracking: prefix -> (attribute, value)
+LINK_EVENTS = [
+    ('Call initiated', ('call_active', True)),
+    ('Call ended', ('call_active', False)),
+    ('Emergency call initiated', ('sos_active', True)),
+    ('Emergency call ended', ('sos_active', False)),
+]
+
+
+def parse_line(line):
+    """Classify one line from the gateway as ('ack', cmd), ('unknown', line) or ('info', line)"""
+    if line.startswith('Received: '):
+        return 'ack', line[len('Received: '):]
+    if line.startswith(UNKNOWN_COMMAND):
+        return 'unknown', line
+    return 'info', line
+
+
+class GsmCommand:
+    """A queued command; wait on written/acked/done for its progress"""
+
+    __slots__ = ('kind', 'line', 'key', 'received', 'attempts', 'ok', 'responses',
+                 'written', 'acked', 'done', 'queued_at')
+
+    def __init__(self, kind, line, key=None, received=None):
+        self.kind = kind
+        self.line = line
+        self.key = key
+        self.received = received    # perf_counter() at MQTT receive, if known
+        self.attempts = 0
+        self.ok = None
+        self.responses = []
+        self.written = threading.Event()
+        self.acked = threading.Event()
+        self.done = threading.Event()
+        self.queued_at = time.monotonic()
+
+    def _finish(self, ok):
+        self.ok = ok
+        self.acked.set()
+        self.done.set()
+
+
+class SerialLink:
+    """Single-writer, priority-ordered, acknowledged command channel to the gateway"""
+
+    def __init__(self, ack_timeout=3.0, done_timeout=30.0, max_attempts=3, sos_window=60.0,
+                 on_written=None):
+        self.ack_timeout = ack_timeout
+        self.done_timeout = done_timeout
+        self.max_attempts = max_attempts
+        self.sos_window = sos_window
+        # on_written(command, seconds since command.received) after its first write
+        self.on_written = on_written
+
+        self.port = None
+        self.unavailable = False   # opening the port failed; commands fail immediately
+        self._queue = queue.PriorityQueue()
+        self._seq = itertools.count()
+        self._lock = threading.Lock()
+        self._current = None
+        self._recent_sos = {}   # key -> GsmCommand
+        self._stop = threading.Event()
+        self._writer = None
+        self._reader = None
+
+        self.call_active = False
+        self.sos_active = False
+        self.sent = 0
+        self.failed = 0
+        self.retries = 0
+        self.coalesced = 0
+
+    @property
+    def attached(self):
+        return self.port is not None
+
+    def attach(self, port):
+        """Start using an opened serial port; queued commands are sent from now on"""
+        self.port = port
+        self.unavailable = False
+        self._stop.clear()
+        self._reader = threading.Thread(target=self._read_loop, name='serial-reader', daemon=True)
+        self._writer = threading.Thread(target=self._write_loop, name='serial-writer', daemon=True)
+        self._reader.start()
+        self._writer.start()
+
+    def mark_unavailable(self):
+        """The port could not be opened: fail everything queued and submitted until attach()"""
+        with self._lock:
+            self.unavailable = True
+            while True:
+                try:
+                    _, _, command = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                self._fail_unavailable(command)
+
+    def wait_stopped(self, timeout):
+        """True once stop() was called, waiting up to `timeout` seconds for it"""
+        return self._stop.wait(timeout)
+
+    def stop(self, timeout=5):
+        self._stop.set()
+        for thread in (self._writer, self._reader):
+            if thread:
+                thread.join(timeout)
+        if self.port:
+            self.port.close()
+
+    def submit(self, kind, line, key=None, received=None):
+        """Queue `line`; returns its GsmCommand, or None when coalesced into a recent SOS"""
+        command = GsmCommand(kind, line, key, received)
+        with self._lock:
+            if self.unavailable:
+                self._fail_unavailable(command)
+                return command
+            if kind == 'sos' and key is not None:
+                previous = self._recent_sos.get(key)
+                # A failed SOS is never coalesced; the next one goes out
+                if previous and (not previous.done.is_set() or (
+                        previous.ok and time.monotonic() - previous.queued_at < self.sos_window)):
+                    self.coalesced += 1
+                    return None
+                self._recent_sos[key] = command
+        self._queue.put((PRIORITIES[kind], next(self._seq), command))
+        return command
+
+    def _fail_unavailable(self, command):
+        # Caller holds the lock
+        command._finish(False)
+        self.failed += 1
+        SERIAL_COMMANDS.labels(command.kind, 'unavailable').inc()
+        log.error("Serial connection unavailable; GSM %s not sent: %s", command.kind, command.line)
+
+    def _write_loop(self):
+        while not self._stop.is_set():
+            try:
+                _, _, command = self._queue.get(timeout=0.5)
+            except queue.Empty:
+                continue
+            self._execute(command)
+
+    def _execute(self, command):
+        with self._lock:
+            self._current = command
+        try:
+            while command.attempts < self.max_attempts and not command.acked.is_set():
+                if command.attempts:
+                    self.retries += 1
+                    log.warning("No ack for %r; retrying", command.line)
+                command.attempts += 1
+                try:
+                    started = time.perf_counter()
+                    self.port.write(f"{command.line}\n".encode())
+                    self.port.flush()
+                    SERIAL_WRITE_SECONDS.observe(time.perf_counter() - started)
+                except Exception as e:
+                    log.error("Serial write failed for %r: %s", command.line, e)
+                    break
+                if not command.written.is_set():
+                    command.written.set()
+                    if command.received is not None and self.on_written:
+                        self.on_written(command, time.perf_counter() - command.received)
+                command.acked.wait(self.ack_timeout)
+
+            if not command.acked.is_set():
+                command._finish(False)
+            elif not command.done.wait(self.done_timeout):
+                # Acknowledged but the sketch never reported completion
+                command._finish(False)
+        finally:
+            with self._lock:
+                self._current = None
+            if command.ok:
+                self.sent += 1
+            else:
+                self.failed += 1
+            SERIAL_COMMANDS.labels(command.kind, 'done' if command.ok else 'failed').inc()
+            if command.ok:
+                log.info("GSM %s done: %s", command.kind, command.line)
+            else:
+                log.error("GSM %s FAILED: %s", command.kind, command.line)
+
+    def _read_loop(self):
+        while not self._stop.is_set():
+            try:
+                raw = self.port.readline()
+            except Exception as e:
+                log.error("Serial read failed: %s", e)
+                time.sleep(1)
+                continue
+            line = raw.decode(errors='replace').strip()
+            if line:
+                self._handle_line(line)
+
+    def _handle_line(self, line):
+        kind, value = parse_line(line)
+        for prefix, (attribute, state) in LINK_EVENTS:
+            if line.startswith(prefix):
+                setattr(self, attribute, state)
+
+        with self._lock:
+            command = self._current
+        if command is None:
+            log.info("GSM: %s", line)
+            return
+        command.responses.append(line)
+        if kind == 'ack' and value == command.line:
+            command.acked.set()
+        elif kind == 'unknown':
+            command._finish(False)
+        else:
+            for prefix, ok in COMPLETIONS[command.kind]:
+                if line.startswith(prefix):
+                    command._finish(ok)
+                    break
+
+    def stats(self):
+        return {
+            'attached': self.attached,
+            'unavailable': self.unavailable,
+            'pending': self._queue.qsize(),
+            'sent': self.sent,
+            'failed': self.failed,
+            'retries': self.retries,
+            'coalesced': self.coalesced,
+            'call_active': self.call_active,
+            'sos_active': self.sos_active,
+        }
@@ -0,0 +1,111 @@
+"""
+Per-device session state for the MQTT bridge.
+
+Every band publishing on the data topic gets its own DeviceSession holding
+its reading window, emergency counter and vitals anomaly detector, so
+interleaved messages from different devices never share state. Patient profiles live in
+profiles.ProfileCache.
+"""
+
+import logging
+import threading
+import time
+from collections import deque
+
+from anomaly import VitalsDetector
+
+log = logging.getLogger(__name__)
+
+class DeviceSession:
+    """Reading window, emergency counter and anomaly detector for a single device"""
+
+    __slots__ = (
+        'device_id', 'readings', 'emergency_count', 'per_device_topics', 'last_seen', 'vitals',
+    )
+
+    def __init__(self, device_id, window_size=5):
+        self.device_id = device_id
+        # Compact ring buffer of (hr, spo2, temp, fall, emergency) tuples
+        self.readings = deque(maxlen=window_size)
+        self.emergency_count = 0
+        # True once the band is seen publishing on elder_band/<id>/data
+        self.per_device_topics = False
+        self.last_seen = time.monotonic()
+        # Rolling per-device baselines; see anomaly.py
+        self.vitals = VitalsDetector()
+
+    def push(self, data):
+        """Append a reading; return the full window once it is ready, else None"""
+        self.last_seen = time.monotonic()
+        self.readings.append((
+            data.get('heartRate', 70),
+            data.get('spo2', 98),
+            data.get('temperature', 36.5),
+            bool(data.get('fall', False)),
+            bool(data.get('emergency', False)),
+        ))
+        if len(self.readings) == self.readings.maxlen:
+            window = list(self.readings)
+            self.readings.clear()
+            return window
+        return None
+
+
+class SessionRegistry:
+    """Thread-safe map of device_id -> DeviceSession with idle eviction"""
+
+    def __init__(self, window_size=5, idle_timeout=600, sweep_interval=60, on_evict=None):
+        self.window_size = window_size
+        self.idle_timeout = idle_timeout
+        self.sweep_interval = sweep_interval
+        # on_evict(device_id) for each evicted session, called outside the lock
+        self.on_evict = on_evict
+        self._sessions = {}
+        self._lock = threading.Lock()
+        self._last_sweep = time.monotonic()
+
+    def get(self, device_id):
+        """Return the session for device_id, creating it on first sight"""
+        now = time.monotonic()
+        with self._lock:
+            session = self._sessions.get(device_id)
+            if session is None:
+                session = DeviceSession(device_id, self.window_size)
+                self._sessions[device_id] = session
+            evicted = self._evict_idle(now) if now - self._last_sweep >= self.sweep_interval else []
+        self._evicted(evicted)
+        return session
+
+    def evict_idle(self):
+        """Drop sessions that have not been seen within idle_timeout"""
+        with self._lock:
+            evicted = self._evict_idle(time.monotonic())
+        self._evicted(evicted)
+        return len(evicted)
+
+    def _evict_idle(self, now):
+        self._last_sweep = now
+        cutoff = now - self.idle_timeout
+        stale = [device_id for device_id, session in self._sessions.items()
+                 if session.last_seen < cutoff]
+        for device_id in stale:
+            del self._sessions[device_id]
+        if stale:
+            log.info("Evicted %d idle device session(s)", len(stale))
+        return stale
+
+    def _evicted(self, device_ids):
+        if self.on_evict:
+            for device_id in device_ids:
+                self.on_evict(device_id)
+
+    def snapshot(self):
+        """List of the current sessions, safe to iterate without the lock"""
+        with self._lock:
+            return list(self._sessions.values())
+
+    def __len__(self):
+        return len(self._sessions)
+
+    def __contains__(self, device_id):
+        return device_id in self._sessions
@@ -0,0 +1,157 @@
+"""
+Device-sharded multi-process mode for the MQTT bridge.
+
+A single bridge process does JSON decoding, session bookkeeping, inference
+and uploads under one GIL. In sharded mode a Supervisor starts N worker
+processes, each with its own MQTT connection, sessions, profile cache,
+inference scheduler and uploader. Every worker receives every reading but
+keeps only the devices a consistent-hash ring assigns to it. It takes the
+device id from the topic (elder_band/<id>/data), or from a byte-level scan
+of the payload for legacy flat-topic firmware, so messages for other shards
+are dropped before the full JSON decode. Each device is handled by exactly one process,
+in broker order, which keeps its window and counters consistent.
+
+MQTT shared subscriptions ($share/...) were not used: they spread a
+device's messages across workers and break per-device ordering.
+
+The serial port can only be opened once, so the supervisor owns the
+SerialLink. Workers hand GSM commands to it over a multiprocessing queue
+through RemoteLink, which has the same submit() interface.
+"""
+
+import bisect
+import hashlib
+import json
+import logging
+import multiprocessing
+import queue
+import re
+import threading
+import time
+
+from serial_link import GsmCommand
+
+log = logging.getLogger(__name__)
+
+_DEVICE_ID = re.compile(rb'"deviceId"\s*:\s*"((?:[^"\\]|\\.)*)"')
+
+
+def device_id_from_payload(payload):
+    """deviceId from a raw JSON payload without decoding it; None if not found"""
+    match = _DEVICE_ID.search(payload)
+    if match is None:
+        return None
+    raw = match.group(1)
+    if b'\\' in raw:
+        return json.loads(b'"' + raw + b'"')
+    return raw.decode()
+
+
+class HashRing:
+    """Consistent hash ring; resizing moves only ~1/N of the devices"""
+
+    def __init__(self, nodes, replicas=160):
+        self.nodes = list(nodes)
+        self._ring = sorted(
+            (self._hash(f"{node}:{i}"), node) for node in self.nodes for i in range(replicas)
+        )
+        self._keys = [h for h, _ in self._ring]
+
+    @staticmethod
+    def _hash(key):
+        return int.from_bytes(hashlib.md5(key.encode()).digest()[:8], 'big')
+
+    def owner(self, key):
+        index = bisect.bisect(self._keys, self._hash(key)) % len(self._keys)
+        return self._ring[index][1]
+
+
+class RemoteLink:
+    """SerialLink stand-in for workers: forwards commands to the supervisor"""
+
+    attached = True
+
+    def __init__(self, commands):
+        self._commands = commands
+        self.forwarded = 0
+        self.dropped = 0
+
+    def submit(self, kind, line, key=None):
+        command = GsmCommand(kind, line, key)
+        try:
+            self._commands.put((kind, line, key), timeout=1)
+        except queue.Full:
+            self.dropped += 1
+            log.error("GSM command queue full; dropped %r", line)
+            return None
+        self.forwarded += 1
+        # "Written" here means handed to the supervisor's serial writer
+        command.written.set()
+        return command
+
+    def stats(self):
+        return {'forwarded': self.forwarded, 'dropped': self.dropped}
+
+    def stop(self, timeout=5):
+        pass
+
+
+class Supervisor:
+    """Runs `target(index, count, commands)` in N processes and restarts any that die"""
+
+    def __init__(self, count, target, on_command, restart_delay=2.0):
+        self.count = count
+        self.target = target
+        self.on_command = on_command
+        self.restart_delay = restart_delay
+        # spawn: workers must not inherit the supervisor's serial threads and locks
+        self._context = multiprocessing.get_context('spawn')
+        self.commands = self._context.Queue(maxsize=1000)
+        self._processes = [None] * count
+        self._stop = threading.Event()
+        self.restarts = 0
+
+    def _spawn(self, index):
+        process = self._context.Process(
+            target=self.target, args=(index, self.count, self.commands),
+            name=f'bridge-shard-{index}', daemon=True,
+        )
+        process.start()
+        self._processes[index] = process
+        log.info("Started shard %d/%d (pid %d)", index, self.count, process.pid)
+
+    def start(self):
+        for index in range(self.count):
+            self._spawn(index)
+        threading.Thread(target=self._drain_commands, name='gsm-forwarder', daemon=True).start()
+
+    def _drain_commands(self):
+        while not self._stop.is_set():
+            try:
+                kind, line, key = self.commands.get(timeout=0.5)
+            except queue.Empty:
+                continue
+            try:
+                self.on_command(kind, line, key)
+            except Exception as e:
+                log.error("Failed to forward GSM command %r: %s", line, e)
+
+    def run(self, poll=1.0):
+        """Block, restarting workers that exit, until stop() or KeyboardInterrupt"""
+        while not self._stop.is_set():
+            for index, process in enumerate(self._processes):
+                if not process.is_alive():
+                    log.warning("Shard %d exited with code %s; restarting", index, process.exitcode)
+                    self.restarts += 1
+                    time.sleep(self.restart_delay)
+                    self._spawn(index)
+            self._stop.wait(poll)
+
+    def stop(self, timeout=10):
+        self._stop.set()
+        deadline = time.monotonic() + timeout
+        for process in self._processes:
+            if process:
+                process.join(max(0, deadline - time.monotonic()))
+                if process.is_alive():
+                    process.terminate()
@@ -0,0 +1,50 @@
+"""
+Startup phase timing for the MQTT bridge.
+
+Each phase (broker connect, model load, warmup, serial open, ...) is marked
+when it finishes, relative to process start, and a one-line report is logged
+once every expected phase has completed so cold-start regressions show up in
+the log.
+"""
+
+import logging
+import threading
+import time
+
+log = logging.getLogger(__name__)
+
+# Captured at import, which is as close to interpreter start as the bridge gets
+PROCESS_START = time.perf_counter()
+
+
+class StartupReport:
+    """Thread-safe record of when each startup phase completed"""
+
+    def __init__(self, expected=()):
+        self.expected = list(expected)
+        self.phases = {}
+        self._lock = threading.Lock()
+        self._reported = False
+
+    def mark(self, phase, ok=True):
+        """Record that `phase` finished now; print the report when all are done"""
+        elapsed = time.perf_counter() - PROCESS_START
+        with self._lock:
+            if phase in self.phases:
+                return
+            self.phases[phase] = (elapsed, ok)
+            done = all(p in self.phases for p in self.expected) and not self._reported
+            if done:
+                self._reported = True
+        if done:
+            log.info("%s", self.summary())
+
+    def elapsed(self, phase):
+        entry = self.phases.get(phase)
+        return entry[0] if entry else None
+
+    def summary(self):
+        with self._lock:
+            ordered = sorted(self.phases.items(), key=lambda item: item[1][0])
+        parts = [f"{name}={at:.3f}s{'' if ok else ' (failed)'}" for name, (at, ok) in ordered]
+        return "Startup timing: " + ", ".join(parts)
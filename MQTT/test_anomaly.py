@@ -0,0 +1,115 @@
+"""
+Scenario tests for anomaly.py; run with `python -m unittest test_anomaly` from MQTT/.
+
+Each scenario feeds a synthetic stream at the band's ~3 s cadence through one
+Signal and checks when (and whether) it raises, so retuning a Rule cannot
+silently trade early warnings for false positives.
+"""
+
+import math
+import random
+import unittest
+
+from anomaly import DESATURATION, FEVER, SBP_EXCURSION, TACHYCARDIA, Signal, VitalsDetector
+
+
+def feed(signal, values):
+    """[(index, state, value)] for every transition while feeding `values`"""
+    events = []
+    for i, value in enumerate(values):
+        state = signal.update(value)
+        if state:
+            events.append((i, state, value))
+    return events
+
+
+def fever_ramp(rng, slope, pre=2000, top=37.95, hold=400, noise=0.05):
+    """Afebrile readings, a linear rise by `slope` per reading, then a plateau"""
+    yield from (36.6 + rng.gauss(0, noise) for _ in range(pre))
+    temp = 36.6
+    while temp < top:
+        temp += slope
+        yield temp + rng.gauss(0, noise)
+    yield from (top + rng.gauss(0, noise) for _ in range(hold))
+
+
+class FeverTests(unittest.TestCase):
+
+    def assertRaisesBelowLimit(self, values):
+        events = feed(Signal(FEVER), values)
+        self.assertTrue(events, 'fever never raised')
+        index, state, value = events[0]
+        self.assertEqual(state, 'raised')
+        # The plateau stays under FEVER.high, so only the relative rise can fire
+        self.assertLess(value, FEVER.high)
+        return index
+
+    def test_slow_and_fast_ramps_raise_before_the_absolute_limit(self):
+        # 0.001/reading is ~0.1 degC per 5 minutes, 0.02 is ~0.4 per minute
+        for slope in (0.001, 0.005, 0.02):
+            with self.subTest(slope=slope):
+                self.assertRaisesBelowLimit(fever_ramp(random.Random(1), slope))
+
+    def test_ramp_soon_after_strap_on(self):
+        # Warm-up ends after FEVER.warmup readings; a rise just past it is still caught
+        for slope in (0.001, 0.005):
+            with self.subTest(slope=slope):
+                self.assertRaisesBelowLimit(fever_ramp(random.Random(1), slope, pre=FEVER.warmup - 100))
+
+    def test_settling_and_circadian_swing_do_not_raise(self):
+        # Skin sensor warms 33 -> 36.5 degC after strap-on, then a day of +-0.4 swing
+        for seed in range(3):
+            rng = random.Random(seed)
+            settle = [33 + 3.5 * (1 - math.exp(-i / 40)) + rng.gauss(0, 0.05) for i in range(200)]
+            day = [36.5 + 0.4 * math.sin(2 * math.pi * i / 28800) + rng.gauss(0, 0.08)
+                   for i in range(28800)]
+            with self.subTest(seed=seed):
+                self.assertEqual(feed(Signal(FEVER), settle + day), [])
+
+    def test_sensor_noise_does_not_raise(self):
+        rng = random.Random(0)
+        self.assertEqual(feed(Signal(FEVER), (36.6 + rng.gauss(0, 0.15) for _ in range(100000))), [])
+
+    def test_absolute_limit_raises_and_clears(self):
+        signal = Signal(FEVER)
+        events = feed(signal, [38.5] * 50 + [36.8] * 100)
+        self.assertEqual([state for _, state, _ in events], ['raised', 'cleared'])
+
+
+class VitalsTests(unittest.TestCase):
+
+    def test_tachycardia(self):
+        rng = random.Random(0)
+        resting = [70 + rng.gauss(0, 2) for _ in range(200)]
+        events = feed(Signal(TACHYCARDIA), resting + [115] * 30 + [70] * 60)
+        self.assertEqual([state for _, state, _ in events], ['raised', 'cleared'])
+        self.assertGreaterEqual(events[0][0], len(resting) + TACHYCARDIA.sustain - 1)
+
+    def test_relative_heart_rate_rise(self):
+        # 55 -> 90 bpm is under the absolute limit but far above this patient's baseline
+        rng = random.Random(0)
+        events = feed(Signal(TACHYCARDIA), [55 + rng.gauss(0, 1.5) for _ in range(200)] + [90] * 30)
+        self.assertEqual([state for _, state, _ in events], ['raised'])
+
+    def test_single_spike_does_not_raise(self):
+        self.assertEqual(feed(Signal(TACHYCARDIA), [70] * 100 + [150] + [70] * 100), [])
+
+    def test_desaturation(self):
+        events = feed(Signal(DESATURATION), [97] * 100 + [88] * 30)
+        self.assertEqual([state for _, state, _ in events], ['raised'])
+
+    def test_sbp_excursion(self):
+        events = feed(Signal(SBP_EXCURSION), [120] * 20 + [170] * 10 + [120] * 20)
+        self.assertEqual([state for _, state, _ in events], ['raised', 'cleared'])
+
+    def test_detector_skips_missing_finger(self):
+        detector = VitalsDetector()
+        for _ in range(100):
+            self.assertEqual(detector.update({'heartRate': 0, 'spo2': 0, 'temperature': 36.6,
+                                              'fingerDetected': False}), [])
+        self.assertIsNone(detector.hr.level)
+        self.assertIsNone(detector.spo2.level)
+
+
+if __name__ == '__main__':
+    unittest.main()
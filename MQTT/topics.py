@@ -0,0 +1,36 @@
+"""
+MQTT topic layout shared by the bridge and the bands.
+
+Bands publish on elder_band/<deviceId>/data and listen on their own
+elder_band/<deviceId>/medication and .../cmd topics, so the bridge routes a
+message by its topic instead of decoding the payload, and a command for
+one band never wakes the others. Older firmware still uses the flat
+elder_band/data and broadcast elder_band/medication topics.
+"""
+
+TOPIC_ROOT = 'elder_band'
+
+# Flat topics used by firmware that predates per-device topics
+LEGACY_DATA_TOPIC = f'{TOPIC_ROOT}/data'
+LEGACY_MEDICATION_TOPIC = f'{TOPIC_ROOT}/medication'
+LEGACY_CMD_TOPIC = f'{TOPIC_ROOT}/cmd'
+
+
+def device_topic(device_id, kind):
+    """elder_band/<device_id>/<kind>"""
+    return f'{TOPIC_ROOT}/{device_id}/{kind}'
+
+
+def wildcard(kind):
+    """Subscription matching `kind` for every device"""
+    return f'{TOPIC_ROOT}/+/{kind}'
+
+
+def parse_topic(topic):
+    """(device_id, kind) for a per-device topic, (None, kind) for a flat one"""
+    parts = topic.split('/')
+    if len(parts) == 3 and parts[0] == TOPIC_ROOT:
+        return parts[1], parts[2]
+    if len(parts) == 2 and parts[0] == TOPIC_ROOT:
+        return None, parts[1]
+    return None, None
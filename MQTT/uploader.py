@@ -0,0 +1,204 @@
+"""
+Background uploader for health data readings.
+
+The MQTT callback only enqueues payloads; a single worker thread drains the
+bounded queue, coalesces whatever is waiting into a batch and posts it over
+a pooled HTTP session. A slow or unreachable backend therefore fills the
+queue (and eventually drops the oldest readings) instead of stalling the
+MQTT network loop.
+"""
+
+import logging
+import queue
+import random
+import threading
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from metrics import registry
+
+log = logging.getLogger(__name__)
+
+UPLOAD_SECONDS = registry.histogram('bridge_upload_seconds', 'Backend POST round trip (single or bulk)')
+UPLOAD_READINGS = registry.counter('bridge_upload_readings_total', 'Readings by upload outcome', ['outcome'])
+
+
+class BackendUploader:
+    """Bounded queue + worker thread posting readings to the Django backend"""
+
+    def __init__(self, url, bulk_url=None, max_queue=10000, max_batch=100,
+                 linger=0.05, max_retries=5, backoff_base=0.5, backoff_cap=30.0,
+                 timeout=5):
+        self.url = url
+        self.bulk_url = bulk_url
+        self.max_batch = max_batch
+        self.linger = linger
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_cap = backoff_cap
+        self.timeout = timeout
+
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._stop = threading.Event()
+        self._thread = None
+        self._stats_lock = threading.Lock()
+        self._high_watermark = max(1, int(max_queue * 0.8))
+        self._warned = False
+
+        # Keep-alive connection pool shared by every request the worker makes
+        self.http = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=4)
+        self.http.mount('http://', adapter)
+        self.http.mount('https://', adapter)
+
+        self.enqueued = 0
+        self.dropped = 0
+        self.sent = 0
+        self.failed = 0
+        self.retries = 0
+        self.batches = 0
+        self.last_batch_seconds = 0.0
+
+    def start(self):
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name='backend-uploader', daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout=10):
+        """Stop the worker, giving it up to `timeout` seconds to flush the queue"""
+        self._stop.set()
+        if self._thread:
+            self._thread.join(timeout)
+
+    def submit(self, payload):
+        """Enqueue a reading without blocking; drops the oldest one when full"""
+        while True:
+            try:
+                self._queue.put_nowait(payload)
+                break
+            except queue.Full:
+                try:
+                    self._queue.get_nowait()
+                    with self._stats_lock:
+                        self.dropped += 1
+                    UPLOAD_READINGS.labels('dropped').inc()
+                except queue.Empty:
+                    pass
+        with self._stats_lock:
+            self.enqueued += 1
+
+        depth = self._queue.qsize()
+        if depth >= self._high_watermark and not self._warned:
+            self._warned = True
+            log.warning("Upload queue backlog high: %d readings pending", depth)
+        elif depth < self._high_watermark // 2:
+            self._warned = False
+        return True
+
+    def stats(self):
+        """Snapshot of queue depth and delivery counters"""
+        with self._stats_lock:
+            return {
+                'queue_depth': self._queue.qsize(),
+                'queue_capacity': self._queue.maxsize,
+                'enqueued': self.enqueued,
+                'dropped': self.dropped,
+                'sent': self.sent,
+                'failed': self.failed,
+                'retries': self.retries,
+                'batches': self.batches,
+                'last_batch_seconds': self.last_batch_seconds,
+            }
+
+    def _run(self):
+        while not (self._stop.is_set() and self._queue.empty()):
+            try:
+                first = self._queue.get(timeout=0.5)
+            except queue.Empty:
+                continue
+            batch = [first]
+            deadline = time.monotonic() + self.linger
+            while len(batch) < self.max_batch:
+                remaining = deadline - time.monotonic()
+                try:
+                    if remaining > 0 and not self._stop.is_set():
+                        batch.append(self._queue.get(timeout=remaining))
+                    else:
+                        batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            self._send_with_retry(batch)
+
+    def _send_with_retry(self, batch):
+        started = time.monotonic()
+        for attempt in range(self.max_retries + 1):
+            try:
+                self._send(batch)
+                break
+            except requests.RequestException as e:
+                log.warning("Backend upload failed (attempt %d): %s", attempt + 1, e)
+            if attempt == self.max_retries or self._stop.is_set():
+                break
+            with self._stats_lock:
+                self.retries += 1
+            # Exponential backoff with full jitter
+            delay = random.uniform(0, min(self.backoff_cap, self.backoff_base * 2 ** attempt))
+            self._stop.wait(delay)
+
+        with self._stats_lock:
+            self.failed += len(batch)
+            self.batches += 1
+            self.last_batch_seconds = time.monotonic() - started
+        if batch:
+            UPLOAD_READINGS.labels('failed').inc(len(batch))
+            log.error("Dropped %d readings after %d attempts", len(batch), attempt + 1)
+
+    def _send(self, batch):
+        """Post a batch, removing readings from it as they are delivered"""
+        if self.bulk_url and len(batch) > 1:
+            response = self._post(self.bulk_url, batch)
+            if not self._client_error(response):
+                response.raise_for_status()
+                with self._stats_lock:
+                    self.sent += len(batch)
+                UPLOAD_READINGS.labels('sent').inc(len(batch))
+                batch.clear()
+                return
+            # The bulk endpoint is all-or-nothing: post this batch one reading
+            # at a time so only the invalid ones are dropped
+            log.warning("Backend rejected a bulk batch of %d readings (%s); posting them individually",
+                        len(batch), response.status_code)
+
+        while batch:
+            response = self._post(self.url, batch[0])
+            if not self._rejected(response, 1):
+                response.raise_for_status()
+                with self._stats_lock:
+                    self.sent += 1
+                UPLOAD_READINGS.labels('sent').inc()
+            batch.pop(0)
+
+    def _post(self, url, body):
+        started = time.perf_counter()
+        try:
+            return self.http.post(url, json=body, timeout=self.timeout)
+        finally:
+            UPLOAD_SECONDS.observe(time.perf_counter() - started)
+
+    @staticmethod
+    def _client_error(response):
+        return 400 <= response.status_code < 500 and response.status_code != 429
+
+    def _rejected(self, response, count):
+        """Client errors will not succeed on retry; count them as failed and move on"""
+        if self._client_error(response):
+            log.error("Backend rejected %d reading(s): %s %s", count, response.status_code, response.text[:200])
+            with self._stats_lock:
+                self.failed += count
+            UPLOAD_READINGS.labels('rejected').inc(count)
+            return True
+        return False
@@ -0,0 +1,95 @@
+"""
+Cheap last-seen tracking for devices.
+
+Recording activity only touches Django's cache and an in-process pending map;
+the pending timestamps are written back to Device.last_activity in a single
+UPDATE at most once every DEVICE_ACTIVITY_FLUSH_SECONDS, so ingesting a
+reading no longer costs a second full-row Device.save().
+
+Pending timestamps are kept per database (alias and NAME) and written by the
+request that makes a flush due, once its transaction commits, only while the
+alias still points at the database they were recorded on. Nothing is
+flushed at process exit: a test run's timestamps can never land in the
+development database after the test database is torn down.
+"""
+
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS, connections, transaction
+from django.db.models import Case, F, Value, When
+
+FLUSH_INTERVAL = getattr(settings, 'DEVICE_ACTIVITY_FLUSH_SECONDS', 30)
+
+_pending = {}   # (alias, database NAME) -> {device pk: timestamp}
+_lock = threading.Lock()
+_last_flush = time.monotonic()
+
+
+def _database(alias):
+    return alias, connections[alias].settings_dict['NAME']
+
+
+def _cache_key(device_pk):
+    return f'device-last-seen:{device_pk}'
+
+
+def record_activity(device, timestamp):
+    """Remember that `device` sent data at `timestamp`; flush when due"""
+    global _last_flush
+    mark_seen(device, timestamp)
+    alias = device._state.db or DEFAULT_DB_ALIAS
+    with _lock:
+        _pending.setdefault(_database(alias), {})[device.pk] = timestamp
+        due = time.monotonic() - _last_flush >= FLUSH_INTERVAL
+        if due:
+            _last_flush = time.monotonic()
+    if due:
+        # Immediately outside a transaction, otherwise once it commits
+        transaction.on_commit(flush_activity, using=alias)
+
+
+def mark_seen(device, timestamp):
+    """Update only the cached last-seen value (the DB row is written elsewhere)"""
+    from .liveness import tracker
+
+    cache.set(_cache_key(device.pk), timestamp, timeout=None)
+    # Publishes the inactive -> active transition when the device comes (back) online
+    tracker.seen(device.pk, device.device_id, timestamp, device.inactive_after)
+
+
+def last_seen_cached(device_pk):
+    """Cached last-seen timestamp for a device pk, or None if not cached"""
+    return cache.get(_cache_key(device_pk))
+
+
+def flush_activity():
+    """Write pending last-seen timestamps back, one UPDATE per database"""
+    from .models import Device
+
+    with _lock:
+        if not _pending:
+            return 0
+        pending = dict(_pending)
+        _pending.clear()
+
+    written = 0
+    for (alias, name), devices in pending.items():
+        if connections[alias].settings_dict['NAME'] != name:
+            continue  # the alias now points elsewhere (e.g. a torn-down test database)
+        Device.objects.using(alias).filter(pk__in=devices.keys()).update(
+            last_activity=Case(
+                *[When(pk=pk, then=Value(ts)) for pk, ts in devices.items()],
+                default=F('last_activity')
+            )
+        )
+        written += len(devices)
+    return written
+
+
+def discard_pending():
+    """Forget unflushed timestamps (the test runner calls this around test databases)"""
+    with _lock:
+        _pending.clear()
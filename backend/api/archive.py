@@ -0,0 +1,215 @@
+"""
+Tiered archival of old HealthData rows.
+
+Raw rows older than HEALTH_DATA_RETENTION_DAYS are moved out of the hot table
+into one compressed columnar file per device and month under
+HEALTH_DATA_ARCHIVE_DIR. Each file is a zip archive holding one
+DEFLATE-compressed packed-binary member per column plus a small meta.json;
+null values are NaN in float columns. Rollups are left in place, and
+archived_rows() lets the raw query paths read archived months back
+transparently.
+"""
+
+import json
+import math
+import os
+import re
+import zipfile
+from array import array
+from datetime import datetime, timedelta, timezone as dt_timezone
+from itertools import islice
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from .models import HealthData, RollupCheckpoint
+from .rollups import CHECKPOINT_NAME, compact, compaction_checkpoint
+
+ARCHIVE_VERSION = 1
+RETENTION_DAYS = getattr(settings, 'HEALTH_DATA_RETENTION_DAYS', 90)
+ARCHIVE_DIR = getattr(settings, 'HEALTH_DATA_ARCHIVE_DIR', os.path.join(settings.BASE_DIR, 'archive'))
+
+# Column name -> array typecode; order matches api.export.EXPORT_FIELDS
+COLUMNS = [
+    ('timestamp', 'q'),       # microseconds since the Unix epoch (UTC)
+    ('heart_rate', 'd'),
+    ('spo2', 'd'),
+    ('body_temp', 'd'),
+    ('fall_detected', 'b'),
+    ('blood_pressure', 'd'),
+]
+_INT_COLUMNS = {'heart_rate', 'spo2'}
+_EPOCH = datetime(1970, 1, 1, tzinfo=dt_timezone.utc)
+
+
+def _device_dir(device_pk, device_id):
+    return os.path.join(ARCHIVE_DIR, f"{device_pk}-{re.sub(r'[^A-Za-z0-9_.-]', '_', device_id)}")
+
+
+def archive_path(device_pk, device_id, month):
+    return os.path.join(_device_dir(device_pk, device_id), f'{month:%Y-%m}.zip')
+
+
+def _month_start(value):
+    return value.astimezone(dt_timezone.utc).replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+
+
+def _next_month(month):
+    return (month + timedelta(days=32)).replace(day=1)
+
+
+def _to_micros(value):
+    delta = value - _EPOCH
+    return (delta.days * 86400 + delta.seconds) * 1_000_000 + delta.microseconds
+
+
+def _from_micros(value):
+    return _EPOCH + timedelta(microseconds=value)
+
+
+def _encode(name, value):
+    if name == 'timestamp':
+        return _to_micros(value)
+    if name == 'fall_detected':
+        return 1 if value else 0
+    return math.nan if value is None else float(value)
+
+
+def _decode(name, value):
+    if name == 'timestamp':
+        return _from_micros(value)
+    if name == 'fall_detected':
+        return bool(value)
+    if math.isnan(value):
+        return None
+    return int(value) if name in _INT_COLUMNS else value
+
+
+def read_archive(path):
+    """Load an archive file into a dict of column arrays"""
+    with zipfile.ZipFile(path) as zf:
+        meta = json.loads(zf.read('meta.json'))
+        columns = {}
+        for name, typecode in COLUMNS:
+            data = array(typecode)
+            data.frombytes(zf.read(f'{name}.bin'))
+            columns[name] = data
+    return meta, columns
+
+
+def write_archive(path, meta, columns):
+    """Atomically write column arrays to `path`"""
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f'{path}.tmp'
+    with open(tmp_path, 'wb') as fh:
+        with zipfile.ZipFile(fh, 'w', compression=zipfile.ZIP_DEFLATED, compresslevel=9) as zf:
+            zf.writestr('meta.json', json.dumps(meta))
+            for name, _ in COLUMNS:
+                zf.writestr(f'{name}.bin', columns[name].tobytes())
+        fh.flush()
+        os.fsync(fh.fileno())
+    os.replace(tmp_path, path)
+
+
+def archived_rows(device_pk, device_id, start=None, end=None):
+    """Yield archived rows as tuples in COLUMNS order, oldest first, within [start, end)"""
+    directory = _device_dir(device_pk, device_id)
+    if not os.path.isdir(directory):
+        return
+    for filename in sorted(os.listdir(directory)):
+        if not filename.endswith('.zip'):
+            continue
+        month = datetime.strptime(filename[:-4], '%Y-%m').replace(tzinfo=dt_timezone.utc)
+        if (end and month >= end) or (start and _next_month(month) <= start):
+            continue
+        _, columns = read_archive(os.path.join(directory, filename))
+        lo = _to_micros(start) if start else None
+        hi = _to_micros(end) if end else None
+        for i, micros in enumerate(columns['timestamp']):
+            if (lo is not None and micros < lo) or (hi is not None and micros >= hi):
+                continue
+            yield tuple(_decode(name, columns[name][i]) for name, _ in COLUMNS)
+
+
+def archive_before(cutoff, dry_run=False, log=print):
+    """Move raw rows older than `cutoff` into per-device monthly archive files"""
+    # Make sure everything being archived is already reflected in the rollups;
+    # a dry run writes nothing and reports against the checkpoint compact() would reach
+    if dry_run:
+        safe_id = compaction_checkpoint()
+    else:
+        compact()
+        checkpoint = RollupCheckpoint.objects.filter(name=CHECKPOINT_NAME).first()
+        safe_id = checkpoint.last_reading_id if checkpoint else 0
+
+    old = HealthData.objects.filter(timestamp__lt=cutoff, pk__lte=safe_id, device__isnull=False)
+    groups = (
+        old.order_by()
+        .values_list('device_id', 'device__device_id')
+        .distinct()
+    )
+    moved = 0
+    for device_pk, device_id in groups:
+        device_rows = old.filter(device_id=device_pk)
+        first = device_rows.order_by('timestamp').values_list('timestamp', flat=True).first()
+        month = _month_start(first)
+        while month < cutoff:
+            upper = min(_next_month(month), cutoff)
+            month_rows = device_rows.filter(timestamp__gte=month, timestamp__lt=upper)
+            moved += _archive_month(device_pk, device_id, month, month_rows, cutoff, dry_run, log)
+            month = _next_month(month)
+    return moved
+
+
+def _archive_month(device_pk, device_id, month, queryset, cutoff, dry_run, log):
+    path = archive_path(device_pk, device_id, month)
+    if os.path.exists(path):
+        meta, columns = read_archive(path)
+    else:
+        meta = {'version': ARCHIVE_VERSION, 'device_id': device_id, 'month': f'{month:%Y-%m}', 'rows': 0}
+        columns = {name: array(typecode) for name, typecode in COLUMNS}
+
+    # The file is written before the rows are deleted. Rows a previous run
+    # already archived (pk <= max_pk and older than its cutoff) may still be
+    # in the table if it died in between: delete them, but don't append twice.
+    covered_pk = meta.get('max_pk', 0)
+    previous_cutoff = datetime.fromisoformat(meta['cutoff']) if 'cutoff' in meta else None
+    covered_before = _to_micros(previous_cutoff) if previous_cutoff else None
+
+    names = [name for name, _ in COLUMNS]
+    pks = []
+    added = 0
+    for row in queryset.order_by('timestamp').values_list('pk', *names).iterator(chunk_size=5000):
+        pks.append(row[0])
+        encoded = [_encode(name, value) for name, value in zip(names, row[1:])]
+        if covered_before is not None and row[0] <= covered_pk and encoded[0] < covered_before:
+            continue
+        for name, value in zip(names, encoded):
+            columns[name].append(value)
+        added += 1
+    if not pks:
+        return 0
+
+    log(f'{device_id} {month:%Y-%m}: {added} rows -> {path}'
+        + (f' ({len(pks) - added} already archived)' if added < len(pks) else ''))
+    if dry_run:
+        return added
+
+    if added:
+        meta['rows'] = len(columns['timestamp'])
+        meta['max_pk'] = max(covered_pk, max(pks))
+        meta['cutoff'] = max(cutoff, previous_cutoff or cutoff).isoformat()
+        meta['updated_at'] = timezone.now().isoformat()
+        write_archive(path, meta, columns)
+    with transaction.atomic():
+        for i in range(0, len(pks), 900):
+            HealthData.objects.filter(pk__in=pks[i:i + 900]).delete()
+    return added
+
+
+def archived_readings(device_pk, device_id, start=None, end=None, limit=None):
+    """Up to `limit` archived rows as unsaved HealthData instances, for the raw query paths"""
+    names = [name for name, _ in COLUMNS]
+    return [HealthData(device_id=device_pk, **dict(zip(names, row)))
+            for row in islice(archived_rows(device_pk, device_id, start, end), limit)]
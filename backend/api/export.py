@@ -0,0 +1,55 @@
+"""
+Constant-memory CSV / NDJSON export of a device's HealthData.
+
+Archived months are read first, then hot rows are pulled with
+values_list().iterator(chunk_size=...) so the database cursor is read in
+chunks (server-side on PostgreSQL); each line is yielded to
+StreamingHttpResponse as soon as it is formatted.
+"""
+
+import csv
+import json
+from itertools import chain
+
+from .archive import archived_rows
+
+EXPORT_FIELDS = ['timestamp', 'heart_rate', 'spo2', 'body_temp', 'fall_detected', 'blood_pressure']
+EXPORT_CHUNK_SIZE = 2000
+
+CONTENT_TYPES = {
+    'csv': 'text/csv',
+    'ndjson': 'application/x-ndjson',
+}
+
+
+class _Echo:
+    """File-like object whose write() just returns the line for the generator"""
+
+    def write(self, value):
+        return value
+
+
+def export_rows(device_pk, device_id, queryset, start=None, end=None):
+    """Archived rows followed by hot rows, as tuples in EXPORT_FIELDS order"""
+    hot = queryset.order_by('timestamp').values_list(*EXPORT_FIELDS).iterator(chunk_size=EXPORT_CHUNK_SIZE)
+    return chain(archived_rows(device_pk, device_id, start, end), hot)
+
+
+def stream_csv(rows):
+    writer = csv.writer(_Echo())
+    yield writer.writerow(EXPORT_FIELDS)
+    for row in rows:
+        yield writer.writerow((row[0].isoformat(),) + tuple(row[1:]))
+
+
+def stream_ndjson(rows):
+    for row in rows:
+        record = dict(zip(EXPORT_FIELDS, row))
+        record['timestamp'] = record['timestamp'].isoformat()
+        yield json.dumps(record) + '\n'
+
+
+STREAMERS = {
+    'csv': stream_csv,
+    'ndjson': stream_ndjson,
+}
@@ -0,0 +1,105 @@
+"""
+Write-through cache of each device's latest reading for dashboard polling.
+
+Ingest stores the serialized newest reading per device in Django's cache, so
+/health-data/latest/ and /device/status/ are answered from the cache with an
+ETag; a client that already has the current reading gets a 304 and the
+database is not touched beyond token authentication.
+"""
+
+import hashlib
+
+from django.core.cache import cache
+from django.utils.http import parse_etags, quote_etag
+from rest_framework import serializers, status
+from rest_framework.response import Response
+
+# Same rendering as HealthDataSerializer's timestamp, without building a serializer per insert
+_TIMESTAMP = serializers.DateTimeField()
+# Field -> the coercion its serializer field applies (values may be unsaved strings)
+_READING_FIELDS = (('heart_rate', int), ('spo2', int), ('body_temp', float),
+                   ('fall_detected', bool), ('blood_pressure', float))
+
+# Patient -> device mappings rarely change; cap how long a stale one can live
+PATIENT_DEVICE_TIMEOUT = 300
+
+
+def _latest_key(device_pk):
+    return f'latest-reading:{device_pk}'
+
+
+def _patient_device_key(user_pk):
+    return f'patient-device:{user_pk}'
+
+
+def reading_data(reading):
+    """HealthDataSerializer(reading).data as a plain dict; runs on every insert"""
+    data = {'id': reading.pk, 'timestamp': _TIMESTAMP.to_representation(reading.timestamp)}
+    for field, coerce in _READING_FIELDS:
+        value = getattr(reading, field)
+        data[field] = None if value is None else coerce(value)
+    return data
+
+
+def store_latest_reading(reading, publish=True):
+    """Cache `reading` as its device's latest unless a newer one is already cached"""
+    from .live import publish_reading
+
+    if not reading.device_id:
+        return
+    current = cache.get(_latest_key(reading.device_id))
+    if current and current['timestamp'] > reading.timestamp:
+        return
+    data = reading_data(reading)
+    cache.set(_latest_key(reading.device_id), {
+        'timestamp': reading.timestamp,
+        'data': data,
+        'etag': f'{reading.pk}-{reading.timestamp.timestamp()}',
+    }, timeout=None)
+    # Every newly ingested latest reading is also pushed to live dashboards
+    if publish:
+        publish_reading(reading, data)
+
+
+def latest_reading(device_pk):
+    """Cached latest reading for a device, loading it from the DB on a miss"""
+    from .models import HealthData
+
+    entry = cache.get(_latest_key(device_pk))
+    if entry is None:
+        reading = HealthData.objects.filter(device_id=device_pk).order_by('-timestamp').first()
+        if reading is None:
+            return None
+        # Reloading an old reading is not news; don't push it to live streams
+        store_latest_reading(reading, publish=False)
+        entry = cache.get(_latest_key(device_pk))
+    return entry
+
+
+def device_for_user(user):
+    """(device pk, device_id) for the user's patient profile, or None"""
+    from .models import Patient
+
+    key = _patient_device_key(user.pk)
+    cached = cache.get(key)
+    if cached is None:
+        try:
+            patient = Patient.objects.select_related('device').get(user=user)
+            cached = (patient.device.pk, patient.device.device_id)
+        except Patient.DoesNotExist:
+            cached = ()
+        cache.set(key, cached, timeout=PATIENT_DEVICE_TIMEOUT)
+    return cached or None
+
+
+def forget_patient_device(user):
+    cache.delete(_patient_device_key(user.pk))
+
+
+def conditional_response(request, payload, etag_source):
+    """200 with an ETag, or 304 when the client already holds this representation"""
+    etag = quote_etag(hashlib.md5(str(etag_source).encode()).hexdigest())
+    headers = {'ETag': etag, 'Cache-Control': 'private, no-cache'}
+    if etag in parse_etags(request.headers.get('If-None-Match', '')):
+        return Response(status=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    return Response(payload, headers=headers)
@@ -0,0 +1,106 @@
+"""
+Server-push fan-out of new readings and device status changes.
+
+Ingest code (sync, possibly on a worker thread) calls publish_reading() /
+publish_status(); every dashboard connected to /api/live/ for that device
+holds a Subscription whose asyncio queue is fed thread-safely on its own
+event loop. The default InProcessBroker only reaches clients served by the
+same process; point LIVE_EVENTS_BROKER at another class with the same
+subscribe/unsubscribe/publish interface (e.g. backed by Redis pub/sub) to
+fan out across processes.
+"""
+
+import asyncio
+import threading
+
+from django.conf import settings
+from django.utils.module_loading import import_string
+
+
+class Subscription:
+    """One connected client: a bounded queue on the client's event loop"""
+
+    def __init__(self, device_pk, max_pending=100):
+        self.device_pk = device_pk
+        self.loop = asyncio.get_running_loop()
+        self.queue = asyncio.Queue(maxsize=max_pending)
+        self.dropped = 0
+
+    def deliver(self, event):
+        """Thread-safe: schedule `event` onto this subscriber's loop"""
+        try:
+            self.loop.call_soon_threadsafe(self._put, event)
+        except RuntimeError:
+            # Loop already closed; the stream is shutting down
+            pass
+
+    def _put(self, event):
+        try:
+            self.queue.put_nowait(event)
+        except asyncio.QueueFull:
+            # Slow client: drop the oldest event rather than block ingest
+            self.queue.get_nowait()
+            self.queue.put_nowait(event)
+            self.dropped += 1
+
+    async def get(self, timeout):
+        return await asyncio.wait_for(self.queue.get(), timeout)
+
+
+class InProcessBroker:
+    """Fans events out to subscribers connected to this process"""
+
+    def __init__(self):
+        self._subscribers = {}
+        self._lock = threading.Lock()
+
+    def subscribe(self, device_pk):
+        subscription = Subscription(device_pk)
+        with self._lock:
+            self._subscribers.setdefault(device_pk, set()).add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            subscribers = self._subscribers.get(subscription.device_pk)
+            if subscribers:
+                subscribers.discard(subscription)
+                if not subscribers:
+                    del self._subscribers[subscription.device_pk]
+
+    def publish(self, device_pk, event):
+        with self._lock:
+            subscribers = list(self._subscribers.get(device_pk, ()))
+        for subscription in subscribers:
+            subscription.deliver(event)
+
+    def subscriber_count(self, device_pk=None):
+        with self._lock:
+            if device_pk is not None:
+                return len(self._subscribers.get(device_pk, ()))
+            return sum(len(s) for s in self._subscribers.values())
+
+
+broker = import_string(getattr(settings, 'LIVE_EVENTS_BROKER', 'api.live.InProcessBroker'))()
+
+
+def publish_reading(reading, data):
+    """Push a newly ingested reading (already serialized as `data`)"""
+    broker.publish(reading.device_id, {'event': 'reading', 'data': data})
+
+
+def status_payload(device_id, is_active, last_activity):
+    return {
+        'device_id': device_id,
+        'is_active': is_active,
+        'last_activity': last_activity,
+        'status': 'active' if is_active else 'inactive',
+    }
+
+
+def publish_status(device_pk, device_id, is_active, last_activity):
+    """Push a device active/inactive transition"""
+    broker.publish(device_pk, {
+        'event': 'status',
+        'data': status_payload(device_id, is_active, last_activity),
+    })
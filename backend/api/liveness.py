@@ -0,0 +1,251 @@
+"""
+In-memory device liveness with timer-driven inactive transitions.
+
+Ingest calls tracker.seen() for every device that sent data. The tracker
+keeps each device's last-seen time and inactivity threshold in a dict, so
+status() is O(1) and never writes. Active devices have one deadline each
+in a min-heap. A single timer thread sleeps until the earliest deadline,
+and only a device whose deadline passed without a newer reading goes
+inactive. That publishes the active -> inactive transition to live
+dashboards, something no request used to trigger.
+
+The threshold is Device.inactive_after (seconds) when set, otherwise
+DEVICE_INACTIVE_SECONDS. Each process has its own tracker. Before reporting
+or emitting "inactive", it re-checks the shared last-seen cache, so a
+reading ingested by another worker process still counts.
+"""
+
+import heapq
+import threading
+import time
+
+from django.conf import settings
+
+DEFAULT_THRESHOLD = getattr(settings, 'DEVICE_INACTIVE_SECONDS', 120)
+
+
+class _Device:
+    __slots__ = ('device_id', 'last_seen', 'threshold', 'expires', 'active', 'scheduled')
+
+    def __init__(self, device_id, threshold):
+        self.device_id = device_id
+        self.last_seen = None
+        self.threshold = threshold
+        self.expires = 0.0
+        self.active = False
+        self.scheduled = None   # deadline of this device's live heap entry
+
+
+class LivenessTracker:
+    """Last-seen map + deadline heap; see module docstring"""
+
+    def __init__(self, default_threshold=DEFAULT_THRESHOLD, on_transition=None, refresh=None, load=None):
+        self.default_threshold = default_threshold
+        # on_transition(device_pk, device_id, is_active, last_seen)
+        self.on_transition = on_transition
+        # refresh(device_pk) -> newer last-seen recorded by another process, or None
+        self.refresh = refresh
+        # load(device_pk, device) -> (device_id, last_seen, threshold) for a device never
+        # seen here; `device` is the Device instance when the caller already has one
+        self.load = load
+        self._devices = {}
+        self._heap = []
+        self._cond = threading.Condition()
+        self._thread = None
+        self._stop = False
+        self.expired = 0
+
+    # -------------------------------------------------------------- updates
+
+    def seen(self, device_pk, device_id, timestamp, threshold=None):
+        """Record activity at `timestamp` (aware datetime)"""
+        became_active = False
+        with self._cond:
+            device = self._devices.get(device_pk)
+            if device is None:
+                device = self._devices[device_pk] = _Device(device_id, threshold or self.default_threshold)
+            elif threshold:
+                device.threshold = threshold
+            if device.last_seen is None or timestamp > device.last_seen:
+                device.last_seen = timestamp
+                device.expires = timestamp.timestamp() + device.threshold
+            if device.expires > time.time() and not device.active:
+                device.active = became_active = True
+                self._schedule(device_pk, device)
+        if became_active:
+            self._ensure_started()
+            self._emit(device_pk, device.device_id, True, device.last_seen)
+        return became_active
+
+    def set_threshold(self, device_pk, seconds):
+        """Change one device's inactivity threshold (None restores the default)"""
+        became_active = False
+        with self._cond:
+            device = self._devices.get(device_pk)
+            if device is None:
+                return
+            device.threshold = seconds or self.default_threshold
+            if device.last_seen is not None:
+                device.expires = device.last_seen.timestamp() + device.threshold
+            if not device.active and device.expires > time.time():
+                device.active = became_active = True
+                self._schedule(device_pk, device)
+            elif device.active and (device.scheduled is None or device.expires < device.scheduled):
+                self._schedule(device_pk, device)
+        if became_active:
+            self._ensure_started()
+            self._emit(device_pk, device.device_id, True, device.last_seen)
+
+    def forget(self, device_pk):
+        with self._cond:
+            self._devices.pop(device_pk, None)
+
+    # -------------------------------------------------------------- reads
+
+    def status(self, device_pk, instance=None):
+        """(is_active, last_seen) for a device; O(1) once the device is known here"""
+        device = self._devices.get(device_pk)
+        if device is None:
+            device = self._bootstrap(device_pk, instance)
+            if device is None:
+                return False, None
+        if device.expires > time.time():
+            return True, device.last_seen
+        # Looks inactive here; another process may have ingested since
+        newer = self.refresh(device_pk) if self.refresh else None
+        if newer and (device.last_seen is None or newer > device.last_seen):
+            self.seen(device_pk, device.device_id, newer)
+            return device.expires > time.time(), device.last_seen
+        return False, device.last_seen
+
+    def stats(self):
+        with self._cond:
+            return {
+                'devices': len(self._devices),
+                'active': sum(1 for d in self._devices.values() if d.active),
+                'scheduled': len(self._heap),
+                'expired': self.expired,
+            }
+
+    # -------------------------------------------------------------- internals
+
+    def _bootstrap(self, device_pk, instance):
+        if self.load is None:
+            return None
+        loaded = self.load(device_pk, instance)
+        if loaded is None:
+            return None
+        device_id, last_seen, threshold = loaded
+        with self._cond:
+            device = self._devices.get(device_pk)
+            if device is None:
+                device = self._devices[device_pk] = _Device(device_id, threshold or self.default_threshold)
+                if last_seen is not None:
+                    device.last_seen = last_seen
+                    device.expires = last_seen.timestamp() + device.threshold
+                    if device.expires > time.time():
+                        device.active = True
+                        self._schedule(device_pk, device)
+        if device.active:
+            self._ensure_started()
+        return device
+
+    def _schedule(self, device_pk, device):
+        device.scheduled = device.expires
+        earliest = not self._heap or device.expires < self._heap[0][0]
+        heapq.heappush(self._heap, (device.expires, device_pk))
+        if earliest:
+            self._cond.notify()
+
+    def _emit(self, device_pk, device_id, is_active, last_seen):
+        if self.on_transition:
+            self.on_transition(device_pk, device_id, is_active, last_seen)
+
+    def _ensure_started(self):
+        if self._thread is None:
+            with self._cond:
+                if self._thread is None:
+                    self._thread = threading.Thread(target=self._run, name='device-liveness', daemon=True)
+                    self._thread.start()
+
+    def stop(self, timeout=5):
+        with self._cond:
+            self._stop = True
+            self._cond.notify()
+        if self._thread:
+            self._thread.join(timeout)
+
+    def _due(self):
+        """Block until at least one deadline has passed; pop and return those devices"""
+        with self._cond:
+            while not self._stop:
+                if not self._heap:
+                    self._cond.wait()
+                    continue
+                delay = self._heap[0][0] - time.time()
+                if delay > 0:
+                    self._cond.wait(delay)
+                    continue
+                due, now = [], time.time()
+                while self._heap and self._heap[0][0] <= now:
+                    deadline, device_pk = heapq.heappop(self._heap)
+                    device = self._devices.get(device_pk)
+                    if device is None or not device.active or device.scheduled != deadline:
+                        continue  # forgotten, or superseded by a later schedule
+                    if device.expires > now:
+                        self._schedule(device_pk, device)  # seen again since; push back
+                        continue
+                    device.scheduled = None
+                    due.append((device_pk, device))
+                return due
+            return []
+
+    def _run(self):
+        while not self._stop:
+            for device_pk, device in self._due():
+                newer = self.refresh(device_pk) if self.refresh else None
+                with self._cond:
+                    if newer and newer > device.last_seen:
+                        device.last_seen = newer
+                        device.expires = newer.timestamp() + device.threshold
+                    if device.expires > time.time():
+                        self._schedule(device_pk, device)
+                        continue
+                    device.active = False
+                    self.expired += 1
+                self._emit(device_pk, device.device_id, False, device.last_seen)
+
+
+def _load_device(device_pk, instance=None):
+    from .activity import last_seen_cached
+    from .models import Device, HealthData
+
+    if instance is not None:
+        row = (instance.device_id, instance.last_activity, instance.inactive_after)
+    else:
+        row = (Device.objects.filter(pk=device_pk)
+               .values_list('device_id', 'last_activity', 'inactive_after').first())
+    if row is None:
+        return None
+    device_id, last_activity, threshold = row
+    cached = last_seen_cached(device_pk)
+    if cached and (last_activity is None or cached > last_activity):
+        last_activity = cached
+    if last_activity is None:
+        # Devices that predate last-seen tracking: once per process, read-only
+        last_activity = (HealthData.objects.filter(device_id=device_pk)
+                         .order_by('-timestamp').values_list('timestamp', flat=True).first())
+    return device_id, last_activity, threshold
+
+
+def _refresh(device_pk):
+    from .activity import last_seen_cached
+    return last_seen_cached(device_pk)
+
+
+def _publish(device_pk, device_id, is_active, last_seen):
+    from .live import publish_status
+    publish_status(device_pk, device_id, is_active, last_seen)
+
+
+tracker = LivenessTracker(on_transition=_publish, refresh=_refresh, load=_load_device)
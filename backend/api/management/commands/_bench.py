@@ -0,0 +1,48 @@
+"""Shared helpers for the benchmark management commands."""
+
+import os
+import tempfile
+import time
+from contextlib import contextmanager
+
+from django.db import connection
+
+
+@contextmanager
+def scratch_database(in_memory=False):
+    """
+    Run against a freshly migrated throwaway copy of the default database so
+    benchmarks never touch real patient data. SQLite uses an on-disk file by
+    default so fsync and locking costs are part of the measurement.
+    """
+    old_name = connection.settings_dict['NAME']
+    tmpdir = None
+    if connection.vendor == 'sqlite' and not in_memory:
+        tmpdir = tempfile.mkdtemp(prefix='bench-')
+        connection.settings_dict.setdefault('TEST', {})['NAME'] = os.path.join(tmpdir, 'bench.sqlite3')
+    connection.creation.create_test_db(verbosity=0, autoclobber=True, keepdb=False)
+    try:
+        yield connection
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=0, keepdb=False)
+        if tmpdir:
+            os.rmdir(tmpdir)
+
+
+@contextmanager
+def timer():
+    """Yield a dict whose 'seconds' key is filled in when the block exits"""
+    result = {}
+    started = time.perf_counter()
+    try:
+        yield result
+    finally:
+        result['seconds'] = time.perf_counter() - started
+
+
+def percentile(samples, pct):
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
@@ -0,0 +1,28 @@
+import time
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from api.archive import RETENTION_DAYS, archive_before
+
+
+class Command(BaseCommand):
+    help = 'Move raw HealthData older than the retention window into monthly archive files'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=RETENTION_DAYS,
+                            help=f'Raw rows to keep, in days (default {RETENTION_DAYS})')
+        parser.add_argument('--dry-run', action='store_true', help='Report what would be archived')
+        parser.add_argument('--loop', type=float, metavar='SECONDS',
+                            help='Keep running, archiving every SECONDS')
+
+    def handle(self, *args, **options):
+        while True:
+            cutoff = timezone.now() - timedelta(days=options['days'])
+            moved = archive_before(cutoff, dry_run=options['dry_run'], log=self.stdout.write)
+            verb = 'Would archive' if options['dry_run'] else 'Archived'
+            self.stdout.write(f'{verb} {moved} readings older than {cutoff:%Y-%m-%d %H:%M}')
+            if not options['loop']:
+                break
+            time.sleep(options['loop'])
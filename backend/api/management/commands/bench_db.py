@@ -0,0 +1,90 @@
+import random
+import threading
+
+from django.core.management.base import BaseCommand
+from django.db import OperationalError, connection, transaction
+
+from api import db
+from api.models import Device, HealthData
+
+from ._bench import percentile, scratch_database, timer
+
+# SQLite's stock behaviour, for comparison with settings.SQLITE_PRAGMAS
+SQLITE_DEFAULT_PRAGMAS = {'journal_mode': 'DELETE', 'synchronous': 'FULL', 'busy_timeout': 5000}
+
+
+class Command(BaseCommand):
+    help = 'Benchmark concurrent HealthData ingest against the configured database engine'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--writers', type=int, default=8, help='Concurrent writer threads')
+        parser.add_argument('--requests', type=int, default=250, help='Write transactions per writer')
+        parser.add_argument('--batch', type=int, default=1, help='Readings per transaction')
+        parser.add_argument('--reconnect', action='store_true',
+                            help='Close the connection after every request (CONN_MAX_AGE=0)')
+
+    def handle(self, *args, **options):
+        modes = [('configured', None)]
+        if connection.vendor == 'sqlite':
+            modes = [('sqlite default pragmas', SQLITE_DEFAULT_PRAGMAS),
+                     ('sqlite tuned (WAL, NORMAL)', db.SQLITE_PRAGMAS)]
+
+        self.stdout.write(
+            f'{connection.vendor}: {options["writers"]} writers x {options["requests"]} requests '
+            f'x {options["batch"]} readings'
+            + (', reconnecting per request' if options['reconnect'] else '')
+        )
+        configured = db.SQLITE_PRAGMAS
+        try:
+            for label, pragmas in modes:
+                if pragmas is not None:
+                    db.SQLITE_PRAGMAS = pragmas
+                connection.close()
+                with scratch_database():
+                    self._run(label, options)
+        finally:
+            db.SQLITE_PRAGMAS = configured
+
+    def _run(self, label, options):
+        devices = [Device.objects.create(device_id=f'BENCH:{i:04d}') for i in range(options['writers'])]
+        latencies, errors = [], []
+        lock = threading.Lock()
+
+        def writer(device):
+            samples, failed = [], 0
+            try:
+                for _ in range(options['requests']):
+                    readings = [
+                        HealthData(device=device, heart_rate=random.randint(55, 110),
+                                   spo2=random.randint(90, 100), body_temp=round(random.uniform(36.0, 38.0), 2),
+                                   blood_pressure=round(random.uniform(100, 150), 2))
+                        for _ in range(options['batch'])
+                    ]
+                    with timer() as t:
+                        try:
+                            with transaction.atomic():
+                                HealthData.objects.bulk_create(readings)
+                        except OperationalError:
+                            failed += 1
+                        if options['reconnect']:
+                            connection.close()
+                    samples.append(t['seconds'] * 1000)
+            finally:
+                connection.close()
+                with lock:
+                    latencies.extend(samples)
+                    errors.append(failed)
+
+        threads = [threading.Thread(target=writer, args=(device,)) for device in devices]
+        with timer() as t:
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+
+        written = HealthData.objects.count()
+        self.stdout.write(
+            f'  {label:<28} {written / t["seconds"]:>9.0f} readings/s  '
+            f'p50 {percentile(latencies, 50):.2f} ms  p99 {percentile(latencies, 99):.2f} ms  '
+            f'errors {sum(errors)}'
+        )
@@ -0,0 +1,72 @@
+import random
+
+from django.core.management.base import BaseCommand
+from django.db import models
+from django.utils import timezone
+
+from api.activity import flush_activity
+from api.models import Device, HealthData
+from api.serializers import HealthDataSerializer
+
+from ._bench import scratch_database, timer
+
+
+def _reading(device_id=None):
+    reading = {
+        'heart_rate': random.randint(55, 110),
+        'spo2': random.randint(90, 100),
+        'body_temp': round(random.uniform(36.0, 38.0), 2),
+        'fall_detected': False,
+        'blood_pressure': f'{random.uniform(100, 150):.2f}',
+    }
+    if device_id is not None:
+        reading['device_id'] = device_id
+    return reading
+
+
+class Command(BaseCommand):
+    help = 'Benchmark HealthData ingest throughput (legacy double write vs. last-seen map vs. bulk)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--readings', type=int, default=2000)
+        parser.add_argument('--devices', type=int, default=20)
+        parser.add_argument('--batch', type=int, default=100, help='Readings per bulk request')
+
+    def handle(self, *args, **options):
+        readings, batch = options['readings'], options['batch']
+
+        with scratch_database():
+            devices = [Device.objects.create(device_id=f'BENCH:{i:04d}') for i in range(options['devices'])]
+            results = []
+
+            # Previous behaviour: insert, then a full-row Device.save() per reading
+            with timer() as t:
+                for i in range(readings):
+                    device = devices[i % len(devices)]
+                    models.Model.save(HealthData(device=device, **_reading()))
+                    device.last_activity = timezone.now()
+                    device.save()
+            results.append(('legacy insert + Device.save()', t['seconds']))
+
+            # Current single-reading path: insert + cached last-seen, batched flush
+            with timer() as t:
+                for i in range(readings):
+                    HealthData.objects.create(device=devices[i % len(devices)], **_reading())
+                flush_activity()
+            results.append(('insert + last-seen map', t['seconds']))
+
+            # Bulk endpoint path
+            with timer() as t:
+                for start in range(0, readings, batch):
+                    payload = [_reading(devices[i % len(devices)].device_id)
+                               for i in range(start, min(start + batch, readings))]
+                    serializer = HealthDataSerializer(data=payload, many=True)
+                    serializer.is_valid(raise_exception=True)
+                    serializer.save()
+            results.append((f'bulk_create ({batch}/request)', t['seconds']))
+
+        baseline = readings / results[0][1]
+        self.stdout.write(f'{readings} readings across {len(devices)} devices')
+        for label, seconds in results:
+            rate = readings / seconds
+            self.stdout.write(f'  {label:<32} {rate:>10.0f} inserts/s  ({rate / baseline:.1f}x)')
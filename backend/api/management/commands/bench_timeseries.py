@@ -0,0 +1,109 @@
+import random
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.utils import timezone
+
+from api.models import Device, HealthData
+
+from ._bench import percentile, scratch_database, timer
+
+INDEX_NAME = 'healthdata_device_ts_idx'
+
+
+class Command(BaseCommand):
+    help = 'Benchmark latest/history HealthData lookups on a large synthetic table'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=10_000_000)
+        parser.add_argument('--devices', type=int, default=1000)
+        parser.add_argument('--lookups', type=int, default=2000)
+        parser.add_argument('--interval', type=int, default=5, help='Seconds between readings per device')
+        parser.add_argument('--compare', action='store_true',
+                            help=f'Also measure with {INDEX_NAME} dropped')
+
+    def handle(self, *args, **options):
+        with scratch_database():
+            devices = self._populate(options['rows'], options['devices'], options['interval'])
+            self._explain(devices[0])
+            self._measure('with (device, -timestamp) index', devices, options['lookups'])
+
+            if options['compare']:
+                with connection.cursor() as cursor:
+                    cursor.execute(f'DROP INDEX {connection.ops.quote_name(INDEX_NAME)}')
+                self._measure('without composite index', devices, max(1, options['lookups'] // 20))
+
+    def _populate(self, rows, device_count, interval):
+        Device.objects.bulk_create(
+            [Device(device_id=f'BENCH:{i:05d}', device_name=f'Bench {i}') for i in range(device_count)]
+        )
+        devices = list(Device.objects.order_by('pk'))
+        device_pks = [d.pk for d in devices]
+
+        table = connection.ops.quote_name(HealthData._meta.db_table)
+        columns = ['device_id', 'timestamp', 'heart_rate', 'spo2', 'body_temp', 'fall_detected', 'blood_pressure']
+        placeholders = ', '.join(['%s'] * len(columns))
+        sql = f'INSERT INTO {table} ({", ".join(columns)}) VALUES ({placeholders})'
+
+        per_device = max(1, rows // device_count)
+        start = timezone.now() - timedelta(seconds=per_device * interval)
+        adapt = connection.ops.adapt_datetimefield_value
+        chunk = 50_000
+
+        self.stdout.write(f'Loading {rows:,} rows for {device_count} devices...')
+        with timer() as t, transaction.atomic(), connection.cursor() as cursor:
+            batch = []
+            for i in range(rows):
+                step, device_index = divmod(i, device_count)
+                batch.append((
+                    device_pks[device_index],
+                    adapt(start + timedelta(seconds=step * interval)),
+                    random.randint(55, 110), random.randint(90, 100),
+                    round(random.uniform(36.0, 38.0), 2), False,
+                    round(random.uniform(100, 150), 2),
+                ))
+                if len(batch) >= chunk:
+                    cursor.executemany(sql, batch)
+                    batch = []
+            if batch:
+                cursor.executemany(sql, batch)
+        self.stdout.write(f'  loaded in {t["seconds"]:.1f}s')
+
+        if connection.vendor == 'sqlite':
+            with connection.cursor() as cursor:
+                cursor.execute('ANALYZE')
+        return devices
+
+    def _explain(self, device):
+        query = HealthData.objects.filter(device=device).order_by('-timestamp')[:50]
+        self.stdout.write('Query plan for history lookup:')
+        for line in query.explain().splitlines():
+            self.stdout.write(f'  {line}')
+
+    def _measure(self, label, devices, lookups):
+        samples = {'latest': [], 'history[:50]': [], 'latest sql': [], 'history sql': []}
+        for _ in range(lookups):
+            device = random.choice(devices)
+            by_device = HealthData.objects.filter(device=device).order_by('-timestamp')
+            with timer() as t:
+                by_device.first()
+            samples['latest'].append(t['seconds'] * 1000)
+            with timer() as t:
+                list(by_device[:50])
+            samples['history[:50]'].append(t['seconds'] * 1000)
+
+            # Same queries without ORM model instantiation: pure database time
+            for name, query in (('latest sql', by_device[:1]), ('history sql', by_device[:50])):
+                sql, params = query.query.sql_with_params()
+                with timer() as t, connection.cursor() as cursor:
+                    cursor.execute(sql, params)
+                    cursor.fetchall()
+                samples[name].append(t['seconds'] * 1000)
+
+        self.stdout.write(f'{label} ({lookups} lookups):')
+        for name, values in samples.items():
+            self.stdout.write(
+                f'  {name:<13} p50 {percentile(values, 50):.3f} ms  '
+                f'p99 {percentile(values, 99):.3f} ms'
+            )
@@ -0,0 +1,22 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from api.rollups import compact
+
+
+class Command(BaseCommand):
+    help = 'Fold new HealthData readings into the 1m/1h/1d rollup tables'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--loop', type=float, metavar='SECONDS',
+                            help='Keep running, compacting every SECONDS')
+
+    def handle(self, *args, **options):
+        while True:
+            started = time.perf_counter()
+            touched = compact()
+            self.stdout.write(f'Compacted into {touched} rollup buckets in {time.perf_counter() - started:.2f}s')
+            if not options['loop']:
+                break
+            time.sleep(options['loop'])
@@ -0,0 +1,85 @@
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.test import Client, override_settings
+from django.utils import timezone
+from rest_framework.authtoken.models import Token
+
+from api import profiling
+from api.models import Device, HealthData, Patient
+
+from ._bench import scratch_database
+
+DEVICE_ID = 'PROFILE:0001'
+
+
+def _reading(i, device_id=None):
+    reading = {'heart_rate': 60 + i % 40, 'spo2': 95 + i % 5, 'body_temp': 36.5,
+               'fall_detected': False, 'blood_pressure': 120.0}
+    if device_id is not None:
+        reading['device_id'] = device_id
+    return reading
+
+
+# (method, path, body, authenticated)
+REQUESTS = [
+    ('get', f'/api/device/{DEVICE_ID}/patient/', None, False),
+    ('get', f'/api/device/{DEVICE_ID}/status/', None, False),
+    ('get', '/api/device/status/', None, True),
+    ('get', '/api/health-data/latest/', None, True),
+    ('get', '/api/health-data/history/', None, True),
+    ('get', '/api/health-data/range/', None, True),
+    ('get', '/api/patient/profile/', None, True),
+    ('get', '/api/patient/contact/', None, True),
+    ('post', '/api/health-data/', _reading(0, DEVICE_ID), False),
+    ('post', '/api/health-data/bulk/', [_reading(i, DEVICE_ID) for i in range(50)], False),
+    ('post', '/api/emergency/log/', {'device_id': DEVICE_ID, 'event_type': 'fall',
+                                     'details': {'fall_detected': True}}, False),
+]
+
+
+class Command(BaseCommand):
+    help = 'Report per-endpoint query counts, SQL and serializer time against declared query budgets'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--repeat', type=int, default=20, help='Requests per endpoint')
+        parser.add_argument('--readings', type=int, default=500, help='Readings seeded for the device')
+        parser.add_argument('--strict', action='store_true', help='Fail on the first exceeded budget')
+
+    def handle(self, *args, **options):
+        with scratch_database(), override_settings(
+                API_PROFILING=True, API_QUERY_BUDGET_STRICT=options['strict'],
+                ALLOWED_HOSTS=['testserver'], DEBUG=False):
+            device = Device.objects.create(device_id=DEVICE_ID, device_name='Profiled band',
+                                           last_activity=timezone.now())
+            HealthData.objects.bulk_create(
+                HealthData(device=device, **_reading(i)) for i in range(options['readings']))
+            user = User.objects.create_user('profiler', password='profiler')
+            Patient.objects.create(user=user, device=device, patient_name='Profiled Patient',
+                                   patient_age=80, doctor_name='Dr. Who', doctor_phone='15550100',
+                                   emergency_contact_name='Contact', emergency_contact_phone='15550101')
+            token = Token.objects.create(user=user)
+
+            client = Client()
+            profiling.reset()
+            for method, path, body, authenticated in REQUESTS:
+                headers = {'HTTP_AUTHORIZATION': f'Token {token.key}'} if authenticated else {}
+                for _ in range(options['repeat']):
+                    try:
+                        if method == 'get':
+                            client.get(path, **headers)
+                        else:
+                            client.post(path, body, content_type='application/json', **headers)
+                    except profiling.QueryBudgetExceeded as e:
+                        raise CommandError(str(e))
+
+            rows = profiling.report()
+
+        self.stdout.write(f'{"view":<38} {"queries":>8} {"max":>4} {"budget":>6} '
+                          f'{"p50 ms":>8} {"p99 ms":>8} {"sql ms":>8} {"ser ms":>8}')
+        for row in sorted(rows, key=lambda row: row['view']):
+            budget = row['query_budget']
+            flag = ' OVER' if row['over_budget'] else ''
+            self.stdout.write(
+                f'{row["view"]:<38} {row["queries"]["mean"]:>8.1f} {row["queries"]["max"]:>4} '
+                f'{"-" if budget is None else budget:>6} {row["wall_ms"]["p50"]:>8.2f} '
+                f'{row["wall_ms"]["p99"]:>8.2f} {row["sql_ms_mean"]:>8.2f} {row["serializer_ms_mean"]:>8.2f}{flag}')
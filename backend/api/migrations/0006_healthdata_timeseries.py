@@ -0,0 +1,37 @@
+# Generated by Django 5.2.1 on 2026-10-17 02:49
+
+from django.db import migrations, models
+
+
+def normalize_blood_pressure(apps, schema_editor):
+    """Rewrite stored strings as plain systolic numbers so the column can become numeric"""
+    HealthData = apps.get_model('api', 'HealthData')
+    rows = HealthData.objects.exclude(blood_pressure__isnull=True).values_list('pk', 'blood_pressure')
+    for pk, value in rows.iterator(chunk_size=2000):
+        try:
+            # Accept "120.5" as well as "120/80" (systolic/diastolic)
+            normalized = str(float(str(value).split('/')[0].strip()))
+        except ValueError:
+            normalized = None
+        if normalized != value:
+            HealthData.objects.filter(pk=pk).update(blood_pressure=normalized)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0005_device_last_activity'),
+    ]
+
+    operations = [
+        migrations.RunPython(normalize_blood_pressure, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='healthdata',
+            name='blood_pressure',
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='healthdata',
+            index=models.Index(fields=['device', '-timestamp'], name='healthdata_device_ts_idx'),
+        ),
+    ]
@@ -0,0 +1,54 @@
+# Generated by Django 5.2.1 on 2026-10-17 03:01
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0006_healthdata_timeseries'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RollupCheckpoint',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=50, unique=True)),
+                ('last_reading_id', models.BigIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='HealthDataRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('resolution', models.CharField(choices=[('1m', '1 minute'), ('1h', '1 hour'), ('1d', '1 day')], max_length=2)),
+                ('bucket_start', models.DateTimeField()),
+                ('count', models.IntegerField(default=0)),
+                ('fall_count', models.IntegerField(default=0)),
+                ('heart_rate_min', models.FloatField(blank=True, null=True)),
+                ('heart_rate_max', models.FloatField(blank=True, null=True)),
+                ('heart_rate_sum', models.FloatField(default=0)),
+                ('heart_rate_count', models.IntegerField(default=0)),
+                ('spo2_min', models.FloatField(blank=True, null=True)),
+                ('spo2_max', models.FloatField(blank=True, null=True)),
+                ('spo2_sum', models.FloatField(default=0)),
+                ('spo2_count', models.IntegerField(default=0)),
+                ('body_temp_min', models.FloatField(blank=True, null=True)),
+                ('body_temp_max', models.FloatField(blank=True, null=True)),
+                ('body_temp_sum', models.FloatField(default=0)),
+                ('body_temp_count', models.IntegerField(default=0)),
+                ('blood_pressure_min', models.FloatField(blank=True, null=True)),
+                ('blood_pressure_max', models.FloatField(blank=True, null=True)),
+                ('blood_pressure_sum', models.FloatField(default=0)),
+                ('blood_pressure_count', models.IntegerField(default=0)),
+                ('device', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='rollups', to='api.device')),
+            ],
+            options={
+                'ordering': ['bucket_start'],
+                'constraints': [models.UniqueConstraint(fields=('device', 'resolution', 'bucket_start'), name='unique_rollup_bucket')],
+            },
+        ),
+    ]
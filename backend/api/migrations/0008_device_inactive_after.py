@@ -0,0 +1,18 @@
+# Generated by Django 5.2.1 on 2026-10-17 03:22
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0007_healthdata_rollups'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='device',
+            name='inactive_after',
+            field=models.PositiveIntegerField(blank=True, null=True),
+        ),
+    ]
@@ -1,37 +1,40 @@
 from django.db import models
 from django.contrib.auth.models import User
 from django.utils import timezone
-from datetime import timedelta
 import uuid
 
+from .activity import record_activity
+from .latest import store_latest_reading
+
 class Device(models.Model):
     device_id = models.CharField(max_length=100, unique=True)
     device_name = models.CharField(max_length=100, blank=True, null=True)
     is_active = models.BooleanField(default=True)
     last_activity = models.DateTimeField(null=True, blank=True)
+    # Seconds without data before the device counts as inactive (default DEVICE_INACTIVE_SECONDS)
+    inactive_after = models.PositiveIntegerField(null=True, blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
     
     def __str__(self):
         return f"Device {self.device_id}"
     
+    def save(self, *args, **kwargs):
+        super().save(*args, **kwargs)
+        from .liveness import tracker
+        tracker.set_threshold(self.pk, self.inactive_after)
+    
     def is_device_active(self):
-        """Check if device is active based on last data timestamp"""
-        if not self.last_activity:
-            # Check if there's any health data for this device
-            latest_data = self.health_data.first()
-            if not latest_data:
-                return False
-            self.last_activity = latest_data.timestamp
-            self.save()
-        
-        # Device is inactive if no data for more than 2 minutes
-        inactive_threshold = timezone.now() - timedelta(minutes=2)
-        return self.last_activity > inactive_threshold
+        """Check if device is active, from the in-memory liveness tracker (never writes)"""
+        from .liveness import tracker
+        is_active, last_activity = tracker.status(self.pk, self)
+        if last_activity:
+            self.last_activity = last_activity
+        return is_active
     
-    def update_activity(self):
-        """Update last activity timestamp"""
-        self.last_activity = timezone.now()
-        self.save()
+    def update_activity(self, timestamp=None):
+        """Record activity in the last-seen map; written to the DB in periodic batches"""
+        self.last_activity = timestamp or timezone.now()
+        record_activity(self, self.last_activity)
 
 class Patient(models.Model):
     user = models.OneToOneField(User, on_delete=models.CASCADE)
@@ -58,7 +61,7 @@ class HealthData(models.Model):
     spo2 = models.IntegerField(null=True, blank=True)
     body_temp = models.FloatField(null=True, blank=True)
     fall_detected = models.BooleanField(default=False)
-    blood_pressure = models.CharField(max_length=25, blank=True, null=True)
+    blood_pressure = models.FloatField(blank=True, null=True)  # predicted systolic, mmHg
 
     def __str__(self):
         device_id = self.device.device_id if self.device else "Unknown"
@@ -66,12 +69,64 @@ class HealthData(models.Model):
 
     def save(self, *args, **kwargs):
         super().save(*args, **kwargs)
-        # Update device activity when new health data is saved
+        # Update device activity and the latest-reading cache when new health data is saved
         if self.device:
-            self.device.update_activity()
+            self.device.update_activity(self.timestamp)
+            store_latest_reading(self)
 
     class Meta:
         ordering = ['-timestamp']
+        indexes = [
+            # Latest/history/liveness lookups all filter by device and walk timestamp backwards
+            models.Index(fields=['device', '-timestamp'], name='healthdata_device_ts_idx'),
+        ]
+
+class HealthDataRollup(models.Model):
+    """Per-device min/max/sum/count of each vital over a 1-minute, 1-hour or 1-day bucket"""
+    RESOLUTION_CHOICES = [('1m', '1 minute'), ('1h', '1 hour'), ('1d', '1 day')]
+
+    device = models.ForeignKey(Device, on_delete=models.CASCADE, related_name='rollups')
+    resolution = models.CharField(max_length=2, choices=RESOLUTION_CHOICES)
+    bucket_start = models.DateTimeField()
+    count = models.IntegerField(default=0)
+    fall_count = models.IntegerField(default=0)
+
+    # Sums and counts (not means) so partial buckets can be merged exactly
+    heart_rate_min = models.FloatField(null=True, blank=True)
+    heart_rate_max = models.FloatField(null=True, blank=True)
+    heart_rate_sum = models.FloatField(default=0)
+    heart_rate_count = models.IntegerField(default=0)
+    spo2_min = models.FloatField(null=True, blank=True)
+    spo2_max = models.FloatField(null=True, blank=True)
+    spo2_sum = models.FloatField(default=0)
+    spo2_count = models.IntegerField(default=0)
+    body_temp_min = models.FloatField(null=True, blank=True)
+    body_temp_max = models.FloatField(null=True, blank=True)
+    body_temp_sum = models.FloatField(default=0)
+    body_temp_count = models.IntegerField(default=0)
+    blood_pressure_min = models.FloatField(null=True, blank=True)
+    blood_pressure_max = models.FloatField(null=True, blank=True)
+    blood_pressure_sum = models.FloatField(default=0)
+    blood_pressure_count = models.IntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.resolution} rollup for {self.device_id} at {self.bucket_start:%Y-%m-%d %H:%M}"
+
+    class Meta:
+        ordering = ['bucket_start']
+        constraints = [
+            models.UniqueConstraint(fields=['device', 'resolution', 'bucket_start'],
+                                    name='unique_rollup_bucket'),
+        ]
+
+class RollupCheckpoint(models.Model):
+    """Highest HealthData id already folded into the rollups"""
+    name = models.CharField(max_length=50, unique=True)
+    last_reading_id = models.BigIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"Checkpoint {self.name} at {self.last_reading_id}"
 
 # Keep for backward compatibility - will be deprecated
 class PatientContact(models.Model):
@@ -0,0 +1,55 @@
+"""
+Retained MQTT notifications from the backend to the bridge.
+
+When a patient profile changes, the bridge's cached copy for that device is
+stale. publish_profile_changed() publishes a small retained marker on
+elder_band/<device_id>/profile once the transaction commits; a bridge that
+is connected refreshes immediately, and one that reconnects later still
+receives the latest marker. Only the fact of the change is published: the
+bridge refetches the profile (with its phone numbers) over HTTP.
+"""
+
+import json
+import logging
+import threading
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+MQTT_HOST = getattr(settings, 'MQTT_BROKER_HOST', 'localhost')
+MQTT_PORT = getattr(settings, 'MQTT_BROKER_PORT', 1883)
+PROFILE_TOPIC = getattr(settings, 'MQTT_PROFILE_TOPIC', 'elder_band/{device_id}/profile')
+
+
+def _publish(messages):
+    try:
+        from paho.mqtt import publish
+    except ImportError:
+        logger.warning('paho-mqtt is not installed; profile change notifications are disabled')
+        return
+    try:
+        publish.multiple(messages, hostname=MQTT_HOST, port=MQTT_PORT)
+    except Exception as e:
+        logger.warning('Could not publish profile change notification: %s', e)
+
+
+def publish_profile_changed(*device_ids):
+    """Tell bridges that the profile behind these device ids changed"""
+    updated_at = timezone.now().isoformat()
+    messages = [
+        {
+            'topic': PROFILE_TOPIC.format(device_id=device_id),
+            'payload': json.dumps({'device_id': device_id, 'updated_at': updated_at}),
+            'qos': 1,
+            'retain': True,
+        }
+        for device_id in dict.fromkeys(device_ids) if device_id
+    ]
+    if messages:
+        # Off the request thread: an unreachable broker must not stall the API
+        transaction.on_commit(
+            lambda: threading.Thread(target=_publish, args=(messages,), daemon=True).start()
+        )
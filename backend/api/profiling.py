@@ -0,0 +1,207 @@
+"""
+Opt-in request profiling and per-view query budgets.
+
+ProfilingMiddleware is enabled with the API_PROFILING setting. It times each
+request, and it counts and times the SQL it runs through
+connection.execute_wrapper. It also records time spent in DRF serializers
+(validation plus .data). Aggregates are kept per view in this process and
+served to staff users at /api/profiling/. With several worker processes,
+each one reports its own traffic.
+
+Views declare how many queries they expect with @query_budget(n), or with a
+`query_budget` attribute on class-based views. Requests over budget are
+counted and logged. With API_QUERY_BUDGET_STRICT they raise
+QueryBudgetExceeded, so a test (or `manage.py profile_endpoints --strict`)
+fails as soon as an endpoint regresses.
+"""
+
+import logging
+import threading
+import time
+from collections import deque
+from functools import wraps
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connection
+
+logger = logging.getLogger(__name__)
+
+_local = threading.local()
+_lock = threading.Lock()
+_views = {}
+
+
+class QueryBudgetExceeded(AssertionError):
+    """A view ran more queries than its declared budget (strict mode only)"""
+
+
+def query_budget(queries):
+    """Declare the most queries a view may run; goes above @api_view"""
+    def decorator(view):
+        view.query_budget = queries
+        return view
+    return decorator
+
+
+def budget_for(view):
+    """Declared budget of a resolved view function, or None"""
+    budget = getattr(view, 'query_budget', None)
+    if budget is None:
+        budget = getattr(getattr(view, 'cls', None), 'query_budget', None)
+    return budget
+
+
+class RequestProfile:
+    """Counters for the request being handled on this thread"""
+
+    __slots__ = ('queries', 'sql_seconds', 'serializer_seconds', 'serializer_depth')
+
+    def __init__(self):
+        self.queries = 0
+        self.sql_seconds = 0.0
+        self.serializer_seconds = 0.0
+        self.serializer_depth = 0
+
+
+class ViewStats:
+    """Running aggregates for one (method, view) pair"""
+
+    def __init__(self, samples):
+        self.requests = 0
+        self.errors = 0
+        self.over_budget = 0
+        self.wall_seconds = 0.0
+        self.max_wall_seconds = 0.0
+        self.queries = 0
+        self.max_queries = 0
+        self.sql_seconds = 0.0
+        self.serializer_seconds = 0.0
+        self.recent = deque(maxlen=samples)
+
+    def add(self, wall, profile, status_code, over_budget):
+        self.requests += 1
+        self.errors += status_code >= 500
+        self.over_budget += over_budget
+        self.wall_seconds += wall
+        self.max_wall_seconds = max(self.max_wall_seconds, wall)
+        self.queries += profile.queries
+        self.max_queries = max(self.max_queries, profile.queries)
+        self.sql_seconds += profile.sql_seconds
+        self.serializer_seconds += profile.serializer_seconds
+        self.recent.append(wall)
+
+    def as_dict(self):
+        ordered = sorted(self.recent)
+
+        def pct(p):
+            return round(ordered[min(len(ordered) - 1, int(p / 100 * len(ordered)))] * 1000, 3) if ordered else None
+
+        n = self.requests or 1
+        return {
+            'requests': self.requests,
+            'errors': self.errors,
+            'over_budget': self.over_budget,
+            'wall_ms': {'mean': round(self.wall_seconds / n * 1000, 3), 'p50': pct(50),
+                        'p95': pct(95), 'p99': pct(99), 'max': round(self.max_wall_seconds * 1000, 3)},
+            'queries': {'mean': round(self.queries / n, 2), 'max': self.max_queries},
+            'sql_ms_mean': round(self.sql_seconds / n * 1000, 3),
+            'serializer_ms_mean': round(self.serializer_seconds / n * 1000, 3),
+        }
+
+
+def report():
+    """Per-view aggregates, slowest total time first"""
+    with _lock:
+        rows = [(key, stats.wall_seconds, stats.as_dict(), budget) for key, (stats, budget) in _views.items()]
+    rows.sort(key=lambda row: row[1], reverse=True)
+    return [dict(view=key, query_budget=budget, **stats) for key, _, stats, budget in rows]
+
+
+def reset():
+    with _lock:
+        _views.clear()
+
+
+def _record(key, budget, wall, profile, status_code, over_budget):
+    with _lock:
+        entry = _views.get(key)
+        if entry is None:
+            entry = _views[key] = (ViewStats(getattr(settings, 'API_PROFILING_SAMPLES', 1000)), budget)
+        entry[0].add(wall, profile, status_code, over_budget)
+
+
+def _count_query(execute, sql, params, many, context):
+    profile = getattr(_local, 'profile', None)
+    if profile is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        profile.sql_seconds += time.perf_counter() - started
+        profile.queries += 1
+
+
+def _timed(func):
+    @wraps(func)
+    def wrapper(*args, **kwargs):
+        profile = getattr(_local, 'profile', None)
+        if profile is None or profile.serializer_depth:
+            # Not profiling, or nested inside an already-timed serializer call
+            return func(*args, **kwargs)
+        profile.serializer_depth += 1
+        started = time.perf_counter()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            profile.serializer_seconds += time.perf_counter() - started
+            profile.serializer_depth -= 1
+    wrapper._profiled = True
+    return wrapper
+
+
+def install_serializer_timing():
+    """Wrap DRF's serializer entry points once per process"""
+    from rest_framework import serializers
+
+    if getattr(serializers.BaseSerializer.is_valid, '_profiled', False):
+        return
+    serializers.BaseSerializer.is_valid = _timed(serializers.BaseSerializer.is_valid)
+    for cls in (serializers.Serializer, serializers.ListSerializer):
+        cls.data = property(_timed(cls.data.fget))
+
+
+class ProfilingMiddleware:
+    """Per-view wall time, SQL count/time and serializer time; see module docstring"""
+
+    def __init__(self, get_response):
+        if not getattr(settings, 'API_PROFILING', False):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.strict = getattr(settings, 'API_QUERY_BUDGET_STRICT', False)
+        install_serializer_timing()
+
+    def __call__(self, request):
+        profile = _local.profile = RequestProfile()
+        started = time.perf_counter()
+        try:
+            with connection.execute_wrapper(_count_query):
+                response = self.get_response(request)
+        finally:
+            _local.profile = None
+        wall = time.perf_counter() - started
+
+        match = request.resolver_match
+        if match is None:
+            return response
+        budget = budget_for(match.func)
+        over = budget is not None and profile.queries > budget
+        _record(f'{request.method} {match.view_name}', budget, wall, profile, response.status_code, over)
+        if over:
+            message = (f'{request.method} {request.path} ran {profile.queries} queries '
+                       f'(budget {budget}) for view {match.view_name}')
+            if self.strict:
+                raise QueryBudgetExceeded(message)
+            logger.warning(message)
+        return response
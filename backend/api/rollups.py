@@ -0,0 +1,197 @@
+"""
+Downsampled 1-minute / 1-hour / 1-day rollups of HealthData.
+
+compact() folds raw readings newer than the checkpoint into
+HealthDataRollup rows with one grouped query per resolution, merging into
+buckets that already exist. Readings are only compacted once they are a few
+seconds old so rows still committing behind a higher id aren't skipped.
+range_series() answers a time-range query from the coarsest useful
+resolution and fills the not-yet-compacted tail straight from raw rows.
+"""
+
+from datetime import timedelta, timezone as dt_timezone
+
+from django.db import transaction
+from django.db.models import Count, Max, Min, Q, Sum
+from django.db.models.functions import TruncDay, TruncHour, TruncMinute
+from django.utils import timezone
+
+from .models import HealthData, HealthDataRollup, RollupCheckpoint
+
+METRICS = ['heart_rate', 'spo2', 'body_temp', 'blood_pressure']
+
+RESOLUTIONS = {
+    '1m': (TruncMinute, timedelta(minutes=1)),
+    '1h': (TruncHour, timedelta(hours=1)),
+    '1d': (TruncDay, timedelta(days=1)),
+}
+
+# Ranges up to this long are served as raw readings
+RAW_MAX_SPAN = timedelta(minutes=30)
+# Pick the finest resolution that keeps a series under this many points
+MAX_POINTS = 1000
+# Cap on rows returned for an explicit resolution=raw request, hot and archived combined
+RAW_MAX_POINTS = MAX_POINTS * 10
+# Raw rows are compacted once they are at least this old
+COMPACTION_LAG = timedelta(seconds=10)
+CHECKPOINT_NAME = 'health-data'
+
+_ROLLUP_VALUE_FIELDS = ['count', 'fall_count'] + [
+    f'{metric}_{part}' for metric in METRICS for part in ('min', 'max', 'sum', 'count')
+]
+
+
+def aggregate_readings(queryset, resolution):
+    """Group raw readings into (device, bucket) aggregates at `resolution`"""
+    trunc, _ = RESOLUTIONS[resolution]
+    aggregates = {
+        'count': Count('pk'),
+        'fall_count': Count('pk', filter=Q(fall_detected=True)),
+    }
+    for metric in METRICS:
+        aggregates[f'{metric}_min'] = Min(metric)
+        aggregates[f'{metric}_max'] = Max(metric)
+        aggregates[f'{metric}_sum'] = Sum(metric)
+        aggregates[f'{metric}_count'] = Count(metric)
+    return (
+        queryset.order_by()
+        .annotate(bucket_start=trunc('timestamp', tzinfo=dt_timezone.utc))
+        .values('device_id', 'bucket_start')
+        .annotate(**aggregates)
+    )
+
+
+def _merge(rollup, row):
+    rollup.count += row['count']
+    rollup.fall_count += row['fall_count']
+    for metric in METRICS:
+        if not row[f'{metric}_count']:
+            continue
+        for bound, pick in (('min', min), ('max', max)):
+            field = f'{metric}_{bound}'
+            current = getattr(rollup, field)
+            setattr(rollup, field, row[field] if current is None else pick(current, row[field]))
+        setattr(rollup, f'{metric}_sum', getattr(rollup, f'{metric}_sum') + (row[f'{metric}_sum'] or 0))
+        setattr(rollup, f'{metric}_count', getattr(rollup, f'{metric}_count') + row[f'{metric}_count'])
+
+
+def _compaction_upper(last_reading_id, now):
+    # Highest id compact() would fold in right now, or None when nothing is due
+    pending = HealthData.objects.filter(pk__gt=last_reading_id, device__isnull=False)
+    return pending.filter(timestamp__lt=now - COMPACTION_LAG).aggregate(Max('pk'))['pk__max']
+
+
+def compaction_checkpoint(now=None):
+    """The checkpoint compact() would advance to now, computed without writing anything"""
+    checkpoint = RollupCheckpoint.objects.filter(name=CHECKPOINT_NAME).first()
+    last_reading_id = checkpoint.last_reading_id if checkpoint else 0
+    upper = _compaction_upper(last_reading_id, now or timezone.now())
+    return last_reading_id if upper is None else upper
+
+
+def compact(now=None):
+    """Fold newly arrived raw readings into every rollup resolution"""
+    now = now or timezone.now()
+    with transaction.atomic():
+        checkpoint, _ = RollupCheckpoint.objects.select_for_update().get_or_create(name=CHECKPOINT_NAME)
+        pending = HealthData.objects.filter(pk__gt=checkpoint.last_reading_id, device__isnull=False)
+        upper = _compaction_upper(checkpoint.last_reading_id, now)
+        if upper is None:
+            return 0
+        batch = pending.filter(pk__lte=upper)
+
+        touched = 0
+        for resolution in RESOLUTIONS:
+            rows = list(aggregate_readings(batch, resolution))
+            if not rows:
+                continue
+            existing = {
+                (r.device_id, r.bucket_start): r
+                for r in HealthDataRollup.objects.filter(
+                    resolution=resolution,
+                    device_id__in={row['device_id'] for row in rows},
+                    bucket_start__in={row['bucket_start'] for row in rows},
+                )
+            }
+            to_create, to_update = [], []
+            for row in rows:
+                key = (row['device_id'], row['bucket_start'])
+                rollup = existing.get(key)
+                if rollup is None:
+                    rollup = HealthDataRollup(device_id=row['device_id'], resolution=resolution,
+                                              bucket_start=row['bucket_start'])
+                    existing[key] = rollup
+                    to_create.append(rollup)
+                else:
+                    to_update.append(rollup)
+                _merge(rollup, row)
+            HealthDataRollup.objects.bulk_create(to_create, batch_size=500)
+            HealthDataRollup.objects.bulk_update(to_update, _ROLLUP_VALUE_FIELDS, batch_size=500)
+            touched += len(to_create) + len(to_update)
+
+        checkpoint.last_reading_id = upper
+        checkpoint.save(update_fields=['last_reading_id', 'updated_at'])
+    return touched
+
+
+def choose_resolution(start, end):
+    """'raw' for short ranges, otherwise the finest rollup under MAX_POINTS buckets"""
+    span = end - start
+    if span <= RAW_MAX_SPAN:
+        return 'raw'
+    for resolution, (_, width) in RESOLUTIONS.items():
+        if span / width <= MAX_POINTS:
+            return resolution
+    return '1d'
+
+
+def _point(bucket_start, values):
+    point = {
+        'bucket_start': bucket_start,
+        'count': values['count'],
+        'fall_count': values['fall_count'],
+    }
+    for metric in METRICS:
+        count = values[f'{metric}_count']
+        point[metric] = {
+            'min': values[f'{metric}_min'],
+            'max': values[f'{metric}_max'],
+            'mean': values[f'{metric}_sum'] / count if count else None,
+            'count': count,
+        }
+    return point
+
+
+def range_series(device_pk, start, end, resolution='auto'):
+    """Readings or rollup points for one device between start and end"""
+    if resolution == 'auto':
+        resolution = choose_resolution(start, end)
+
+    raw = HealthData.objects.filter(device_id=device_pk, timestamp__gte=start, timestamp__lt=end)
+    if resolution == 'raw':
+        return resolution, list(raw.order_by('timestamp')[:RAW_MAX_POINTS])
+
+    _, width = RESOLUTIONS[resolution]
+    points = {}
+    for rollup in HealthDataRollup.objects.filter(
+        device_id=device_pk, resolution=resolution,
+        bucket_start__gt=start - width, bucket_start__lt=end,
+    ):
+        points[rollup.bucket_start] = rollup
+
+    # Readings the compactor hasn't reached yet are aggregated on the fly
+    checkpoint = RollupCheckpoint.objects.filter(name=CHECKPOINT_NAME).first()
+    tail = raw.filter(pk__gt=checkpoint.last_reading_id if checkpoint else 0)
+    for row in aggregate_readings(tail, resolution):
+        rollup = points.get(row['bucket_start'])
+        if rollup is None:
+            rollup = points[row['bucket_start']] = HealthDataRollup(
+                device_id=device_pk, resolution=resolution, bucket_start=row['bucket_start']
+            )
+        _merge(rollup, row)
+
+    series = [
+        _point(bucket_start, {f: getattr(rollup, f) for f in _ROLLUP_VALUE_FIELDS})
+        for bucket_start, rollup in sorted(points.items())
+    ]
+    return resolution, series
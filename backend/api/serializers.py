@@ -1,6 +1,10 @@
 from rest_framework import serializers
 from django.contrib.auth.models import User
+from django.db import transaction
+from django.utils import timezone
 from .models import HealthData, PatientContact, Patient, Device
+from .activity import mark_seen
+from .latest import store_latest_reading
 
 class UserSerializer(serializers.ModelSerializer):
     password = serializers.CharField(write_only=True)
@@ -67,6 +71,45 @@ class PatientSerializer(serializers.ModelSerializer):
         
         return patient
 
+class HealthDataBulkSerializer(serializers.ListSerializer):
+    """Insert many readings, for any number of devices, in a handful of queries"""
+
+    def create(self, validated_data):
+        device_ids = {item['device_id'] for item in validated_data}
+
+        with transaction.atomic():
+            # Resolve every device in one query, creating unknown ones in bulk
+            devices = {d.device_id: d for d in Device.objects.filter(device_id__in=device_ids)}
+            missing = device_ids - devices.keys()
+            if missing:
+                Device.objects.bulk_create(
+                    [Device(device_id=d, device_name=f'Device {d}') for d in missing],
+                    ignore_conflicts=True
+                )
+                devices.update({d.device_id: d for d in Device.objects.filter(device_id__in=missing)})
+
+            readings = []
+            for item in validated_data:
+                item = dict(item)
+                readings.append(HealthData(device=devices[item.pop('device_id')], **item))
+            readings = HealthData.objects.bulk_create(readings)
+
+            # One UPDATE for all devices instead of a full save() per reading
+            now = timezone.now()
+            Device.objects.filter(pk__in=[d.pk for d in devices.values()]).update(
+                last_activity=now
+            )
+
+        # Newest reading per device feeds the dashboard's latest-reading cache
+        newest = {}
+        for reading in readings:
+            newest[reading.device_id] = reading
+        for reading in newest.values():
+            mark_seen(reading.device, now)
+            store_latest_reading(reading)
+
+        return readings
+
 class HealthDataSerializer(serializers.ModelSerializer):
     device_id = serializers.CharField(write_only=True, required=True)
     
@@ -74,6 +117,7 @@ class HealthDataSerializer(serializers.ModelSerializer):
         model = HealthData
         fields = ['id', 'timestamp', 'heart_rate', 'spo2', 'body_temp', 'fall_detected', 'blood_pressure', 'device_id']
         read_only_fields = ['timestamp', 'id']
+        list_serializer_class = HealthDataBulkSerializer
     
     def create(self, validated_data):
         device_id = validated_data.pop('device_id')
@@ -0,0 +1,15 @@
+from django.test.runner import DiscoverRunner
+
+from .activity import discard_pending
+
+
+class TestRunner(DiscoverRunner):
+    """Drops unflushed last-seen timestamps whenever test databases are created or destroyed"""
+
+    def setup_databases(self, **kwargs):
+        discard_pending()
+        return super().setup_databases(**kwargs)
+
+    def teardown_databases(self, old_config, **kwargs):
+        discard_pending()
+        super().teardown_databases(old_config, **kwargs)
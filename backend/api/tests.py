@@ -1,3 +1,88 @@
-from django.test import TestCase
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.test import TransactionTestCase, override_settings
+from django.utils import timezone
+from rest_framework.authtoken.models import Token
 
-# Create your tests here.
+from .models import Device, HealthData, Patient
+
+DEVICE_ID = 'BUDGET:0001'
+
+
+def _reading(i, device_id=DEVICE_ID):
+    return {'device_id': device_id, 'heart_rate': 60 + i % 40, 'spo2': 95 + i % 5,
+            'body_temp': 36.5, 'fall_detected': False, 'blood_pressure': 120.0}
+
+
+@override_settings(API_PROFILING=True, API_QUERY_BUDGET_STRICT=True)
+class QueryBudgetTests(TransactionTestCase):
+    """
+    Every budgeted endpoint stays within its @query_budget (QueryBudgetExceeded otherwise).
+    Not a TestCase: its wrapping transaction turns each atomic() into extra
+    SAVEPOINT/RELEASE queries that production requests don't run.
+    """
+
+    def setUp(self):
+        # Cold caches first; the second request of each pair is the warm path
+        cache.clear()
+        device = Device.objects.create(device_id=DEVICE_ID, device_name='Budget band',
+                                       last_activity=timezone.now())
+        HealthData.objects.bulk_create(
+            HealthData(device=device, **{k: v for k, v in _reading(i).items() if k != 'device_id'})
+            for i in range(100))
+        user = User.objects.create_user('budget', password='budget-pass')
+        Patient.objects.create(user=user, device=device, patient_name='Budget Patient',
+                               patient_age=80, doctor_name='Dr. Who', doctor_phone='15550100',
+                               emergency_contact_name='Contact', emergency_contact_phone='15550101')
+        self.token = Token.objects.create(user=user)
+
+    def _get(self, path, authenticated=True):
+        headers = {'HTTP_AUTHORIZATION': f'Token {self.token.key}'} if authenticated else {}
+        for _ in range(2):
+            response = self.client.get(path, **headers)
+            self.assertEqual(response.status_code, 200, path)
+
+    def _post(self, path, body):
+        for _ in range(2):
+            response = self.client.post(path, body, content_type='application/json')
+            self.assertEqual(response.status_code, 201, path)
+
+    def test_device_endpoints(self):
+        self._get(f'/api/device/{DEVICE_ID}/patient/', authenticated=False)
+        self._get(f'/api/device/{DEVICE_ID}/status/', authenticated=False)
+        self._get('/api/device/status/')
+
+    def test_health_data_reads(self):
+        self._get('/api/health-data/latest/')
+        self._get('/api/health-data/history/')
+        self._get('/api/health-data/range/')
+
+    def test_patient_endpoints(self):
+        self._get('/api/patient/profile/')
+        self._get('/api/patient/contact/')
+
+    def test_ingest(self):
+        self._post('/api/health-data/', _reading(0))
+        self._post('/api/health-data/bulk/', [_reading(i) for i in range(50)])
+        self._post('/api/emergency/log/', {'device_id': DEVICE_ID, 'event_type': 'fall',
+                                           'details': {'fall_detected': True}})
+
+
+class EmergencyLogTests(TransactionTestCase):
+    """Legacy "systolic/diastolic" strings are stored as the systolic, not a 500"""
+
+    def _log(self, blood_pressure):
+        return self.client.post('/api/emergency/log/', {
+            'device_id': DEVICE_ID, 'event_type': 'emergency',
+            'details': {'heart_rate': 130, 'blood_pressure': blood_pressure},
+        }, content_type='application/json')
+
+    def test_legacy_blood_pressure(self):
+        for value in (120.5, '120.5', '120.5/80'):
+            response = self._log(value)
+            self.assertEqual(response.status_code, 201, value)
+            self.assertEqual(HealthData.objects.get(pk=response.data['id']).blood_pressure, 120.5)
+
+    def test_invalid_blood_pressure(self):
+        self.assertEqual(self._log('high').status_code, 400)
+        self.assertFalse(HealthData.objects.exists())
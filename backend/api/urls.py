@@ -3,7 +3,9 @@ from .views import (
     HealthDataPostView, LatestHealthDataView, PatientContactView,
     register_patient, login, logout, PatientHealthHistoryView,
     PatientProfileView, AuthenticatedPatientContactView, device_status,
-    get_patient_by_device, log_emergency_event, device_status_by_id
+    get_patient_by_device, log_emergency_event, device_status_by_id,
+    bulk_health_data, live_stream, health_data_range, export_health_data,
+    profiling_report
 )
 
 urlpatterns = [
@@ -14,8 +16,14 @@ urlpatterns = [
     
     # Health Data
     path('health-data/', HealthDataPostView.as_view(), name='health-data-post'),
+    path('health-data/bulk/', bulk_health_data, name='health-data-bulk'),
     path('health-data/latest/', LatestHealthDataView.as_view(), name='latest-health-data'),
     path('health-data/history/', PatientHealthHistoryView.as_view(), name='health-data-history'),
+    path('health-data/range/', health_data_range, name='health-data-range'),
+    path('health-data/export/<str:fmt>/', export_health_data, name='health-data-export'),
+    
+    # Live push (server-sent events, ASGI only)
+    path('live/', live_stream, name='live-stream'),
     
     # Device Status
     path('device/status/', device_status, name='device-status'),
@@ -29,6 +37,9 @@ urlpatterns = [
     path('patient/profile/', PatientProfileView.as_view(), name='patient-profile'),
     path('patient/contact/', AuthenticatedPatientContactView.as_view(), name='authenticated-patient-contact'),
     
+    # Request profiling aggregates (staff only)
+    path('profiling/', profiling_report, name='profiling-report'),
+    
     # Legacy endpoints (for backward compatibility)
     path('patient-contact/', PatientContactView.as_view(), name='patient-contact'),
 ]
\ No newline at end of file
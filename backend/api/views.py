@@ -1,16 +1,43 @@
+import asyncio
+import json
+from datetime import timedelta
+
+from asgiref.sync import sync_to_async
 from rest_framework import generics, status
 from rest_framework.response import Response
 from rest_framework.decorators import api_view, permission_classes
-from rest_framework.permissions import IsAuthenticated, AllowAny
+from rest_framework.permissions import IsAuthenticated, IsAdminUser, AllowAny
 from rest_framework.authtoken.models import Token
+from django.conf import settings
 from django.contrib.auth import authenticate
 from django.contrib.auth.models import User
+from django.core.handlers.asgi import ASGIRequest
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import JsonResponse, StreamingHttpResponse
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
 from .models import HealthData, PatientContact, Patient, Device
+from .liveness import tracker as liveness
+from .live import broker, status_payload
+from .rollups import RAW_MAX_POINTS, RESOLUTIONS, range_series
+from .export import CONTENT_TYPES, STREAMERS, export_rows
+from .archive import archived_readings
+from .notify import publish_profile_changed
+from .profiling import query_budget, report as profiling_report_rows, reset as reset_profiling
+from .latest import (
+    conditional_response, device_for_user, forget_patient_device, latest_reading
+)
 from .serializers import (
     HealthDataSerializer, PatientContactSerializer, 
     PatientSerializer, DeviceSerializer, UserSerializer
 )
 
+# Upper bound on readings accepted by a single bulk ingest request
+BULK_MAX_READINGS = 1000
+
+# Seconds between keep-alive comments (and inactivity checks) on live streams
+LIVE_HEARTBEAT_SECONDS = 15
+
 @api_view(['POST'])
 @permission_classes([AllowAny])
 def register_patient(request):
@@ -68,24 +95,44 @@ class HealthDataPostView(generics.CreateAPIView):
     queryset = HealthData.objects.all()
     serializer_class = HealthDataSerializer
     permission_classes = [AllowAny]  # Allow devices to post data without authentication
+    query_budget = 2
+
+@query_budget(4)
+@api_view(['POST'])
+@permission_classes([AllowAny])  # Allow MQTT bridges to post batches without authentication
+def bulk_health_data(request):
+    """Ingest an array of readings for one or more devices in a single request"""
+    if not isinstance(request.data, list):
+        return Response({
+            'error': 'Expected a list of readings'
+        }, status=status.HTTP_400_BAD_REQUEST)
+
+    serializer = HealthDataSerializer(data=request.data, many=True, max_length=BULK_MAX_READINGS)
+    if serializer.is_valid():
+        readings = serializer.save()
+        return Response({
+            'created': len(readings)
+        }, status=status.HTTP_201_CREATED)
+    return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
 class LatestHealthDataView(generics.ListAPIView):
     serializer_class = HealthDataSerializer
     permission_classes = [IsAuthenticated]
+    # Token only when warm; a cold cache also loads the patient's device and newest reading
+    query_budget = 3
 
-    def get_queryset(self):
-        try:
-            patient = Patient.objects.get(user=self.request.user)
-            latest_data = HealthData.objects.filter(device=patient.device).order_by('-timestamp').first()
-            if latest_data:
-                return HealthData.objects.filter(pk=latest_data.pk)
-            return HealthData.objects.none()
-        except Patient.DoesNotExist:
-            return HealthData.objects.none()
+    def list(self, request, *args, **kwargs):
+        # Served from the write-through latest-reading cache with ETag support
+        device = device_for_user(request.user)
+        entry = latest_reading(device[0]) if device else None
+        if entry is None:
+            return conditional_response(request, [], 'empty')
+        return conditional_response(request, [entry['data']], entry['etag'])
 
 class PatientHealthHistoryView(generics.ListAPIView):
     serializer_class = HealthDataSerializer
     permission_classes = [IsAuthenticated]
+    query_budget = 4
     
     def get_queryset(self):
         try:
@@ -94,13 +141,104 @@ class PatientHealthHistoryView(generics.ListAPIView):
         except Patient.DoesNotExist:
             return HealthData.objects.none()
 
+def _parse_range_bound(value, default):
+    if not value:
+        return default
+    parsed = parse_datetime(value)
+    if parsed is None:
+        raise ValueError(f'Invalid datetime: {value}')
+    if timezone.is_naive(parsed):
+        parsed = timezone.make_aware(parsed, timezone.get_current_timezone())
+    return parsed
+
+@query_budget(4)
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def health_data_range(request):
+    """Vitals for a time range, from raw rows or 1m/1h/1d rollups (picked automatically)"""
+    device = device_for_user(request.user)
+    if device is None:
+        return Response({
+            'error': 'Patient profile not found'
+        }, status=status.HTTP_404_NOT_FOUND)
+
+    try:
+        end = _parse_range_bound(request.query_params.get('end'), timezone.now())
+        start = _parse_range_bound(request.query_params.get('start'), end - timedelta(days=1))
+    except ValueError as e:
+        return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+    if start >= end:
+        return Response({
+            'error': 'start must be before end'
+        }, status=status.HTTP_400_BAD_REQUEST)
+
+    resolution = request.query_params.get('resolution', 'auto')
+    if resolution not in ('auto', 'raw', *RESOLUTIONS):
+        return Response({
+            'error': f"resolution must be one of auto, raw, {', '.join(RESOLUTIONS)}"
+        }, status=status.HTTP_400_BAD_REQUEST)
+
+    resolution, series = range_series(device[0], start, end, resolution)
+    if resolution == 'raw':
+        # Raw rows past the retention window live in the archive files;
+        # they come first, so the row cap applies to both tiers together
+        archived = archived_readings(device[0], device[1], start, end, limit=RAW_MAX_POINTS)
+        series = (archived + series)[:RAW_MAX_POINTS]
+        series = HealthDataSerializer(series, many=True).data
+    return Response({
+        'device_id': device[1],
+        'start': start,
+        'end': end,
+        'resolution': resolution,
+        'points': series,
+    })
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def export_health_data(request, fmt):
+    """Stream the user's full (optionally time-filtered) history as CSV or NDJSON"""
+    if fmt not in STREAMERS:
+        return Response({
+            'error': f"format must be one of {', '.join(STREAMERS)}"
+        }, status=status.HTTP_400_BAD_REQUEST)
+
+    device = device_for_user(request.user)
+    if device is None:
+        return Response({
+            'error': 'Patient profile not found'
+        }, status=status.HTTP_404_NOT_FOUND)
+
+    queryset = HealthData.objects.filter(device_id=device[0])
+    try:
+        start = _parse_range_bound(request.query_params.get('start'), None)
+        end = _parse_range_bound(request.query_params.get('end'), None)
+    except ValueError as e:
+        return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+    if start:
+        queryset = queryset.filter(timestamp__gte=start)
+    if end:
+        queryset = queryset.filter(timestamp__lt=end)
+
+    rows = export_rows(device[0], device[1], queryset, start, end)
+    response = StreamingHttpResponse(STREAMERS[fmt](rows), content_type=CONTENT_TYPES[fmt])
+    filename = f"health-data-{device[1].replace(':', '')}.{fmt}"
+    response['Content-Disposition'] = f'attachment; filename="{filename}"'
+    return response
+
 class PatientProfileView(generics.RetrieveUpdateAPIView):
     serializer_class = PatientSerializer
     permission_classes = [IsAuthenticated]
+    query_budget = 3
     
     def get_object(self):
         return Patient.objects.get(user=self.request.user)
 
+    def perform_update(self, serializer):
+        previous_device = serializer.instance.device.device_id
+        super().perform_update(serializer)
+        forget_patient_device(self.request.user)
+        publish_profile_changed(previous_device, serializer.instance.device.device_id)
+
 class PatientContactView(generics.ListAPIView):
     serializer_class = PatientContactSerializer
     permission_classes = [AllowAny]
@@ -136,10 +274,12 @@ class PatientContactView(generics.ListAPIView):
 class AuthenticatedPatientContactView(generics.RetrieveAPIView):
     serializer_class = PatientSerializer
     permission_classes = [IsAuthenticated]
+    query_budget = 3
     
     def get_object(self):
         return Patient.objects.get(user=self.request.user)
 
+@query_budget(2)
 @api_view(['GET'])
 @permission_classes([AllowAny])
 def get_patient_by_device(request, device_id):
@@ -147,6 +287,7 @@ def get_patient_by_device(request, device_id):
     try:
         device = Device.objects.get(device_id=device_id)
         patient = Patient.objects.get(device=device)
+        is_active, last_activity = liveness.status(device.pk, device)
         
         return Response({
             'device_id': device.device_id,
@@ -156,8 +297,8 @@ def get_patient_by_device(request, device_id):
             'emergency_contact_phone': patient.emergency_contact_phone,
             'doctor_phone': patient.doctor_phone,
             'doctor_name': patient.doctor_name,
-            'last_activity': device.last_activity,
-            'is_active': device.is_device_active()
+            'is_active': is_active,
+            'last_activity': last_activity
         })
     except Device.DoesNotExist:
         return Response({
@@ -168,6 +309,7 @@ def get_patient_by_device(request, device_id):
             'error': 'Patient not found for this device'
         }, status=status.HTTP_404_NOT_FOUND)
 
+@query_budget(3)
 @api_view(['POST'])
 @permission_classes([AllowAny])  
 def log_emergency_event(request):
@@ -182,6 +324,16 @@ def log_emergency_event(request):
                 'error': 'device_id is required'
             }, status=status.HTTP_400_BAD_REQUEST)
         
+        # Older clients send "120/80"; keep the systolic like migration 0006 did
+        blood_pressure = details.get('blood_pressure')
+        if blood_pressure is not None:
+            try:
+                blood_pressure = float(str(blood_pressure).split('/')[0].strip())
+            except ValueError:
+                return Response({
+                    'error': 'blood_pressure must be a number or "systolic/diastolic"'
+                }, status=status.HTTP_400_BAD_REQUEST)
+        
         device, created = Device.objects.get_or_create(
             device_id=device_id,
             defaults={'device_name': f'Device {device_id}'}
@@ -194,7 +346,7 @@ def log_emergency_event(request):
             spo2=details.get('spo2'),
             body_temp=details.get('body_temp'),
             fall_detected=details.get('fall_detected', False),
-            blood_pressure=details.get('blood_pressure')
+            blood_pressure=blood_pressure
         )
         
         return Response({
@@ -209,6 +361,7 @@ def log_emergency_event(request):
         }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
 # Updated device status view to accept device_id parameter
+@query_budget(2)
 @api_view(['GET'])
 @permission_classes([AllowAny])  # Allow MQTT client to check any device
 def device_status_by_id(request, device_id):
@@ -216,8 +369,7 @@ def device_status_by_id(request, device_id):
     try:
         device = Device.objects.get(device_id=device_id)
         
-        is_active = device.is_device_active()
-        last_activity = device.last_activity
+        is_active, last_activity = liveness.status(device.pk, device)
         
         # Get associated patient info if available
         patient_info = None
@@ -244,24 +396,103 @@ def device_status_by_id(request, device_id):
         }, status=status.HTTP_404_NOT_FOUND)
 
 # Keep the original device_status view for authenticated users
+@query_budget(3)
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
 def device_status(request):
     """Check if the user's device is active (received data in last 2 minutes)"""
-    try:
-        patient = Patient.objects.get(user=request.user)
-        device = patient.device
-        
-        is_active = device.is_device_active()
-        last_activity = device.last_activity
-        
-        return Response({
-            'device_id': device.device_id,
-            'is_active': is_active,
-            'last_activity': last_activity,
-            'status': 'active' if is_active else 'inactive'
-        })
-    except Patient.DoesNotExist:
+    device = device_for_user(request.user)
+    if device is None:
         return Response({
             'error': 'Patient profile not found'
-        }, status=status.HTTP_404_NOT_FOUND)
\ No newline at end of file
+        }, status=status.HTTP_404_NOT_FOUND)
+    
+    device_pk, device_id = device
+    is_active, last_activity = liveness.status(device_pk)
+    
+    return conditional_response(request, {
+        'device_id': device_id,
+        'is_active': is_active,
+        'last_activity': last_activity,
+        'status': 'active' if is_active else 'inactive'
+    }, (device_id, is_active, last_activity))
+
+def _sse(event, data):
+    return f"event: {event}\ndata: {json.dumps(data, cls=DjangoJSONEncoder)}\n\n"
+
+async def live_stream(request):
+    """
+    Server-sent events stream of the user's latest readings and device status.
+    EventSource can't set headers, so the token may also be passed as ?token=.
+    Must be served by an ASGI server (e.g. uvicorn backend.asgi:application):
+    under WSGI Django buffers the whole async stream before sending anything,
+    so it answers 501 and the dashboard keeps polling instead.
+    """
+    if not isinstance(request, ASGIRequest):
+        return JsonResponse({'error': 'Live stream requires an ASGI server'},
+                            status=status.HTTP_501_NOT_IMPLEMENTED)
+    key = request.GET.get('token')
+    auth = request.headers.get('Authorization', '')
+    if not key and auth.startswith('Token '):
+        key = auth[len('Token '):]
+    try:
+        token = await Token.objects.select_related('user').aget(key=key or '')
+    except Token.DoesNotExist:
+        return JsonResponse({'error': 'Invalid token'}, status=status.HTTP_401_UNAUTHORIZED)
+
+    device = await sync_to_async(device_for_user)(token.user)
+    if device is None:
+        return JsonResponse({'error': 'Patient profile not found'}, status=status.HTTP_404_NOT_FOUND)
+    device_pk, device_id = device
+
+    async def events():
+        subscription = broker.subscribe(device_pk)
+        try:
+            # Start with the current state so the dashboard renders immediately.
+            # Subscribing first means nothing ingested meanwhile is missed; a
+            # reading both in the initial state and on the queue is sent once.
+            entry = await sync_to_async(latest_reading)(device_pk)
+            sent_id = None
+            if entry:
+                sent_id = entry['data'].get('id')
+                yield _sse('reading', entry['data'])
+            is_active, last_activity = await sync_to_async(liveness.status)(device_pk)
+            yield _sse('status', status_payload(device_id, is_active, last_activity))
+
+            while True:
+                try:
+                    message = await subscription.get(LIVE_HEARTBEAT_SECONDS)
+                    if message['event'] == 'status':
+                        is_active = message['data']['is_active']
+                    elif sent_id is not None and message['data'].get('id') == sent_id:
+                        continue
+                    yield _sse(message['event'], message['data'])
+                except asyncio.TimeoutError:
+                    yield ': keep-alive\n\n'
+
+                # The liveness timer publishes going inactive, but only to
+                # subscribers in its own process; re-check in case it ran elsewhere
+                if is_active:
+                    still_active, last_activity = await sync_to_async(liveness.status)(device_pk)
+                    if not still_active:
+                        is_active = False
+                        yield _sse('status', status_payload(device_id, False, last_activity))
+        finally:
+            broker.unsubscribe(subscription)
+
+    response = StreamingHttpResponse(events(), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'
+    return response
+
+@api_view(['GET', 'DELETE'])
+@permission_classes([IsAdminUser])
+def profiling_report(request):
+    """Per-view wall time, query and serializer aggregates (API_PROFILING); DELETE resets them"""
+    if request.method == 'DELETE':
+        reset_profiling()
+        return Response(status=status.HTTP_204_NO_CONTENT)
+    return Response({
+        'enabled': getattr(settings, 'API_PROFILING', False),
+        'views': profiling_report_rows(),
+    })
@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.2/ref/settings/
 """
 
+import os
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -44,6 +45,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'api.profiling.ProfilingMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -56,6 +58,28 @@ MIDDLEWARE = [
 
 CORS_ALLOW_ALL_ORIGINS = True
 
+# How often pending device last-seen timestamps are written back to the DB
+DEVICE_ACTIVITY_FLUSH_SECONDS = 30
+
+# Keeps timestamps recorded during `manage.py test` out of the development DB
+TEST_RUNNER = 'api.test_runner.TestRunner'
+
+# Seconds without data before a device is reported inactive (Device.inactive_after overrides)
+DEVICE_INACTIVE_SECONDS = 120
+
+# MQTT broker the backend publishes retained profile-change markers to
+MQTT_BROKER_HOST = os.environ.get('MQTT_BROKER_HOST', 'localhost')
+MQTT_BROKER_PORT = int(os.environ.get('MQTT_BROKER_PORT', 1883))
+
+# Raw HealthData older than this moves to compressed monthly archive files
+HEALTH_DATA_RETENTION_DAYS = 90
+HEALTH_DATA_ARCHIVE_DIR = BASE_DIR / 'archive'
+
+# Per-view request profiling (served at /api/profiling/ to staff users);
+# strict mode turns an exceeded @query_budget into an exception for tests
+API_PROFILING = os.environ.get('API_PROFILING', '') in ('1', 'true', 'yes')
+API_QUERY_BUDGET_STRICT = os.environ.get('API_QUERY_BUDGET_STRICT', '') in ('1', 'true', 'yes')
+
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': [
         'rest_framework.authentication.TokenAuthentication',
@@ -88,14 +112,79 @@ WSGI_APPLICATION = 'backend.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/5.2/ref/settings/#databases
 
-DATABASES = {
-    'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
+# DB_ENGINE=postgres switches to PostgreSQL (needs psycopg 3, plus psycopg-pool
+# for DB_POOL=1). SQLite stays the default for local development; its WAL /
+# synchronous / busy_timeout pragmas are applied per connection in api.db.
+
+DB_ENGINE = os.environ.get('DB_ENGINE', 'sqlite')
+
+if DB_ENGINE == 'postgres':
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.postgresql',
+            'NAME': os.environ.get('DB_NAME', 'elderly_monitoring'),
+            'USER': os.environ.get('DB_USER', 'postgres'),
+            'PASSWORD': os.environ.get('DB_PASSWORD', ''),
+            'HOST': os.environ.get('DB_HOST', 'localhost'),
+            'PORT': os.environ.get('DB_PORT', '5432'),
+            'CONN_HEALTH_CHECKS': True,
+            'OPTIONS': {},
+        }
+    }
+    if os.environ.get('DB_POOL', '') in ('1', 'true', 'yes'):
+        # Django's built-in psycopg pool; it replaces persistent connections
+        DATABASES['default']['CONN_MAX_AGE'] = 0
+        DATABASES['default']['OPTIONS']['pool'] = {
+            'min_size': int(os.environ.get('DB_POOL_MIN_SIZE', 2)),
+            'max_size': int(os.environ.get('DB_POOL_MAX_SIZE', 20)),
+            'timeout': 10,
+        }
+    else:
+        DATABASES['default']['CONN_MAX_AGE'] = int(os.environ.get('DB_CONN_MAX_AGE', 600))
+else:
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': os.environ.get('DB_NAME', BASE_DIR / 'db.sqlite3'),
+            'CONN_MAX_AGE': int(os.environ.get('DB_CONN_MAX_AGE', 0)),
+            'OPTIONS': {
+                # Take the write lock at BEGIN so concurrent writers queue on
+                # busy_timeout instead of failing on a read->write upgrade
+                'transaction_mode': 'IMMEDIATE',
+            },
+        }
     }
+
+SQLITE_PRAGMAS = {
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',
+    'busy_timeout': int(os.environ.get('SQLITE_BUSY_TIMEOUT_MS', 5000)),
 }
 
 
+# Cache
+# Holds device last-seen timestamps and the latest-reading projection. locmem is
+# per-process; set HEALTH_CACHE_DIR to share it between workers on one host.
+# https://docs.djangoproject.com/en/5.2/topics/cache/
+
+if os.environ.get('HEALTH_CACHE_DIR'):
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+            'LOCATION': os.environ['HEALTH_CACHE_DIR'],
+            'OPTIONS': {'MAX_ENTRIES': 100000},
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            'LOCATION': 'health-data',
+            'OPTIONS': {'MAX_ENTRIES': 100000},
+        }
+    }
+
+
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
 
@@ -28,6 +28,25 @@ function LatestHealthData() {
     };
 
     useEffect(() => {
+        const applyReading = (latestData) => {
+            setData(latestData);
+
+            const newDataPoint = {
+                time: new Date(latestData.timestamp).toLocaleTimeString('en-IN', {
+                    hour: '2-digit',
+                    minute: '2-digit'
+                }),
+                spO2: latestData.spo2,
+                heartRate: latestData.heart_rate,
+                bodyTemp: latestData.body_temp
+            };
+
+            setHistoricalData(prev => {
+                const updated = [...prev, newDataPoint];
+                return updated.slice(-10);
+            });
+        };
+
         const fetchData = async () => {
             setLoading(true);
             setError(null);
@@ -61,23 +80,7 @@ function LatestHealthData() {
                 }
 
                 if (responseData && responseData.length > 0) {
-                    const latestData = responseData[0];
-                    setData(latestData);
-
-                    const newDataPoint = {
-                        time: new Date(latestData.timestamp).toLocaleTimeString('en-IN', {
-                            hour: '2-digit',
-                            minute: '2-digit'
-                        }),
-                        spO2: latestData.spo2,
-                        heartRate: latestData.heart_rate,
-                        bodyTemp: latestData.body_temp
-                    };
-
-                    setHistoricalData(prev => {
-                        const updated = [...prev, newDataPoint];
-                        return updated.slice(-10);
-                    });
+                    applyReading(responseData[0]);
                 } else {
                     setData(null);
                 }
@@ -91,8 +94,31 @@ function LatestHealthData() {
 
         if (token) {
             fetchData();
-            const intervalId = setInterval(fetchData, 30000);
-            return () => clearInterval(intervalId);
+            let intervalId = setInterval(fetchData, 30000);
+
+            // Prefer server push; polling only runs while the live stream is down
+            const source = new EventSource(`/api/live/?token=${encodeURIComponent(token)}`);
+            source.onopen = () => {
+                clearInterval(intervalId);
+                intervalId = null;
+            };
+            source.onerror = () => {
+                // A non-200 answer (e.g. 501 when the backend runs under WSGI)
+                // closes the stream for good; stay on polling in that case
+                if (source.readyState === EventSource.CLOSED) {
+                    source.close();
+                }
+                if (!intervalId) {
+                    intervalId = setInterval(fetchData, 30000);
+                }
+            };
+            source.addEventListener('reading', (event) => applyReading(JSON.parse(event.data)));
+            source.addEventListener('status', (event) => setDeviceStatus(JSON.parse(event.data)));
+
+            return () => {
+                source.close();
+                if (intervalId) clearInterval(intervalId);
+            };
         }
     }, [token]);
 